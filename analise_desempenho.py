@@ -0,0 +1,183 @@
+"""Análises da série diária de um aluno: médias móveis, sequências, semanas, tendência e percentil.
+
+Tudo roda em arrays NumPy sobre a série densa (um ponto por dia do calendário, zero nos dias
+sem registro): o custo não cresce com laços em Python, então períodos de anos e comparações
+com todos os alunos continuam rápidos.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+JANELAS = (7, 30)
+# Dias carregados antes do início do período para as médias móveis já começarem com a janela cheia
+AQUECIMENTO = max(JANELAS) - 1
+# Inclinação (pontos percentuais por semana) abaixo da qual a tendência é considerada estável
+LIMIAR_TENDENCIA = 0.5
+
+
+def _arredondar(valores, casas=2):
+    """Array -> lista JSON: arredonda e troca NaN (janela sem questões) por None."""
+    arredondado = np.round(valores, casas)
+    return [None if v != v else v for v in arredondado.tolist()]
+
+
+def _percentual(acertos, questoes):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(questoes > 0, acertos * 100.0 / questoes, np.nan)
+
+
+class SerieDiaria:
+    """Questões e acertos por dia entre `inicio` e `fim` (inclusive), em arrays densos."""
+
+    def __init__(self, inicio, fim, linhas):
+        """`linhas`: sequência de (dia, questoes, acertos), dias dentro do intervalo."""
+        self.inicio, self.fim = inicio, fim
+        n = (fim - inicio).days + 1
+        self.questoes = np.zeros(n, dtype=np.int64)
+        self.acertos = np.zeros(n, dtype=np.int64)
+        if linhas:
+            dias, questoes, acertos = zip(*linhas)
+            indices = (np.array(dias, dtype='datetime64[D]') - np.datetime64(inicio, 'D')).astype(np.int64)
+            np.add.at(self.questoes, indices, questoes)
+            np.add.at(self.acertos, indices, acertos)
+
+    def recorte(self, inicio):
+        """Índice do primeiro dia a partir de `inicio` (o que vem antes é só aquecimento)."""
+        return max((inicio - self.inicio).days, 0)
+
+    def datas(self, desde=0):
+        return np.arange(np.datetime64(self.inicio, 'D') + desde, np.datetime64(self.fim, 'D') + 1)
+
+    def soma_movel(self, valores, janela):
+        acumulado = np.concatenate(([0], np.cumsum(valores)))
+        fim = np.arange(1, len(valores) + 1)
+        return acumulado[fim] - acumulado[np.maximum(fim - janela, 0)]
+
+    def media_movel(self, janela):
+        """Questões por dia na janela (dias sem registro contam como zero)."""
+        dias_na_janela = np.minimum(np.arange(1, len(self.questoes) + 1), janela)
+        return self.soma_movel(self.questoes, janela) / dias_na_janela
+
+    def percentual_movel(self, janela):
+        """Acertos / questões somados na janela: dias com mais questões pesam mais."""
+        return _percentual(self.soma_movel(self.acertos, janela), self.soma_movel(self.questoes, janela))
+
+
+def dias_com_registro(serie, desde):
+    """Formato de `dados_diarios` da consulta: só os dias com questões, a partir de `desde`."""
+    questoes, acertos = serie.questoes[desde:], serie.acertos[desde:]
+    indices = np.flatnonzero(questoes)
+    datas = serie.datas(desde)[indices].astype(str).tolist()
+    percentuais = np.round(acertos[indices] * 100.0 / questoes[indices], 2).tolist()
+    return [{'data': d, 'questoes': q, 'acertos': a, 'percentual': p}
+            for d, q, a, p in zip(datas, questoes[indices].tolist(), acertos[indices].tolist(), percentuais)]
+
+
+def sequencias(estudou, hoje_no_fim=False):
+    """(sequência atual, maior sequência) de dias seguidos com questões.
+
+    Se o último dia é hoje e ainda não teve registro, a sequência atual conta até ontem:
+    o dia não acabou.
+    """
+    if hoje_no_fim and len(estudou) and not estudou[-1]:
+        atual_ate = estudou[:-1]
+    else:
+        atual_ate = estudou
+    bordas = np.diff(np.concatenate(([0], estudou.astype(np.int8), [0])))
+    comecos, fins = np.flatnonzero(bordas == 1), np.flatnonzero(bordas == -1)
+    maior = int((fins - comecos).max()) if len(comecos) else 0
+    atual = 0
+    if len(atual_ate) and atual_ate[-1]:
+        zeros = np.flatnonzero(~atual_ate)
+        atual = len(atual_ate) - (int(zeros[-1]) + 1 if len(zeros) else 0)
+    return atual, maior
+
+
+def semanas(serie, desde):
+    """Totais por semana (domingo a sábado) e a variação em relação à semana anterior."""
+    primeiro_dia = serie.inicio + timedelta(days=desde)
+    domingo = primeiro_dia - timedelta(days=(primeiro_dia.weekday() + 1) % 7)
+    deslocamento = (primeiro_dia - domingo).days
+    semana_de_cada_dia = (np.arange(len(serie.questoes) - desde) + deslocamento) // 7
+    questoes = np.bincount(semana_de_cada_dia, weights=serie.questoes[desde:]).astype(np.int64)
+    acertos = np.bincount(semana_de_cada_dia, weights=serie.acertos[desde:]).astype(np.int64)
+    percentual = _percentual(acertos, questoes)
+    delta_questoes = np.concatenate(([np.nan], np.diff(questoes)))
+    delta_percentual = np.concatenate(([np.nan], np.diff(percentual)))
+    inicios = np.datetime64(domingo, 'D') + np.arange(len(questoes)) * 7
+    return [
+        {'inicio': i, 'questoes': q, 'acertos': a, 'percentual': p,
+         'delta_questoes': None if dq is None else int(dq), 'delta_percentual': dp}
+        for i, q, a, p, dq, dp in zip(inicios.astype(str).tolist(), questoes.tolist(), acertos.tolist(),
+                                      _arredondar(percentual), _arredondar(delta_questoes, 0),
+                                      _arredondar(delta_percentual))
+    ]
+
+
+def tendencia(questoes, acertos):
+    """Reta dos mínimos quadrados do percentual diário, ponderada pelas questões do dia.
+
+    Precisa de pelo menos dois dias com registro; devolve a inclinação em pontos
+    percentuais por semana e a direção.
+    """
+    dias = np.flatnonzero(questoes)
+    if len(dias) < 2:
+        return None
+    percentual = acertos[dias] * 100.0 / questoes[dias]
+    inclinacao, _ = np.polyfit(dias, percentual, 1, w=np.sqrt(questoes[dias]))
+    por_semana = float(inclinacao) * 7
+    if por_semana > LIMIAR_TENDENCIA:
+        direcao = 'subindo'
+    elif por_semana < -LIMIAR_TENDENCIA:
+        direcao = 'caindo'
+    else:
+        direcao = 'estavel'
+    return {'pp_por_semana': round(por_semana, 2), 'direcao': direcao, 'dias_considerados': int(len(dias))}
+
+
+def percentil(valor, valores):
+    """Percentil de `valor` dentro de `valores` (empates contam pela metade), de 0 a 100."""
+    abaixo = np.count_nonzero(valores < valor)
+    iguais = np.count_nonzero(valores == valor)
+    return round(float((abaixo + iguais / 2) * 100.0 / len(valores)), 1)
+
+
+def percentil_no_grupo(aluno_id, totais_grupo):
+    """Percentis de questões e de percentual do aluno no período.
+
+    `totais_grupo`: (aluno_id, questoes, acertos) de todos os alunos com registro no período.
+    """
+    if not totais_grupo:
+        return None
+    ids, questoes, acertos = (np.asarray(coluna, dtype=np.int64) for coluna in zip(*totais_grupo))
+    posicao = np.flatnonzero(ids == aluno_id)
+    if not len(posicao):
+        return None
+    i = int(posicao[0])
+    resultado = {'questoes': percentil(questoes[i], questoes), 'percentual': None,
+                 'alunos_no_grupo': int(len(ids))}
+    if questoes[i] > 0:
+        com_questoes = questoes > 0
+        percentuais = acertos[com_questoes] * 100.0 / questoes[com_questoes]
+        resultado['percentual'] = percentil(acertos[i] * 100.0 / questoes[i], percentuais)
+    return resultado
+
+
+def analisar(serie, inicio, aluno_id=None, totais_grupo=None, hoje=None):
+    """Bloco `analise` da consulta de desempenho. `serie` começa AQUECIMENTO dias antes de `inicio`."""
+    desde = serie.recorte(inicio)
+    medias = {'datas': serie.datas(desde).astype(str).tolist()}
+    for janela in JANELAS:
+        medias[f'questoes_{janela}d'] = _arredondar(serie.media_movel(janela)[desde:])
+        medias[f'percentual_{janela}d'] = _arredondar(serie.percentual_movel(janela)[desde:])
+
+    estudou = serie.questoes[desde:] > 0
+    atual, maior = sequencias(estudou, hoje_no_fim=(hoje == serie.fim))
+    return {
+        'medias_moveis': medias,
+        'sequencias': {'atual': atual, 'maior': maior, 'dias_estudados': int(estudou.sum()),
+                       'dias_no_periodo': int(len(estudou))},
+        'semanas': semanas(serie, desde),
+        'tendencia': tendencia(serie.questoes[desde:], serie.acertos[desde:]),
+        'percentil': percentil_no_grupo(aluno_id, totais_grupo) if aluno_id is not None else None,
+    }
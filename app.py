@@ -1,11 +1,29 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
 import os
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for
+import queue
+import threading
+import time
+import click
+from collections import OrderedDict, namedtuple
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, g, has_app_context, has_request_context, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text, func, Date
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text, func, Date, event, bindparam, select, case, inspect
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import joinedload
-from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+from werkzeug.utils import safe_join
+from functools import partial, wraps
+
+import analise_desempenho
+import brotli
 
 app = Flask(__name__)
 
@@ -20,39 +38,296 @@ if not db_url:
 
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {"pool_pre_ping": True}
+def opcoes_engine(url):
+    """Opções do pool vindas do ambiente (ver gunicorn.conf.py para o dimensionamento).
+
+    Conexão que o servidor ou um proxy (PgBouncer, balanceador) fechou por ociosidade: as do
+    pool são recicladas antes dos 5 min de ociosidade comuns nesses proxies, o TCP keepalive
+    derruba as mortas, e a leitura que ainda assim pegar uma é repetida noutra conexão (ver
+    SessaoRoteada). pool_pre_ping (um SELECT 1 a mais em cada checkout) fica desligado;
+    DB_POOL_PRE_PING=1 liga, se o proxy derrubar conexões antes do pool_recycle.
+    """
+    if url.startswith('sqlite'):
+        return {}
+    opcoes = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', 5))),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 2)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),  # segundos; menor que o idle timeout do servidor
+        'pool_use_lifo': True,  # Reusa as conexões quentes; as ociosas envelhecem e são recicladas
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '0') == '1',
+    }
+    if url.startswith('postgresql'):
+        opcoes['connect_args'] = {
+            'keepalives': 1,
+            'keepalives_idle': int(os.environ.get('DB_KEEPALIVE_IDLE', 30)),
+            'keepalives_interval': 10,
+            'keepalives_count': 3,
+        }
+    return opcoes
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(db_url)
+
+# Réplica de leitura opcional: os GET /api/... leem dela (ver ReplicaLeitura). Para testar local,
+# aponte para uma cópia do arquivo SQLite ou para um segundo banco Postgres.
+db_read_url = os.environ.get("DATABASE_READ_URL")
+if db_read_url and db_read_url.startswith("postgres://"):
+    db_read_url = db_read_url.replace("postgres://", "postgresql://", 1)
+BIND_LEITURA = 'leitura'
+if db_read_url:
+    opcoes_leitura = opcoes_engine(db_read_url)
+    if db_read_url.startswith('postgresql'):
+        opcoes_leitura['connect_args'] = {**opcoes_leitura['connect_args'], 'connect_timeout': 3}
+    app.config['SQLALCHEMY_BINDS'] = {BIND_LEITURA: {'url': db_read_url, **opcoes_leitura}}
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-db = SQLAlchemy(app)
+# Custo do hash de senha (formato do werkzeug). O padrão do werkzeug é scrypt:32768:8:1
+# (~140ms por verificação); 16384 corta pela metade o tempo de CPU/memória por login das senhas
+# novas. Senhas gravadas com parâmetros mais fracos são refeitas no próximo login bem-sucedido;
+# as gravadas com parâmetros mais fortes ficam como estão (rehash não pode enfraquecer a senha).
+app.config['SENHA_HASH_METODO'] = os.environ.get('SENHA_HASH_METODO', 'scrypt:16384:8:1')
+app.config['SENHA_REHASH_NO_LOGIN'] = os.environ.get('SENHA_REHASH_NO_LOGIN', '1') == '1'
+app.config['RANKING_CACHE_TTL'] = int(os.environ.get('RANKING_CACHE_TTL', 60))  # segundos
+app.config['RANKING_CACHE_MAX'] = int(os.environ.get('RANKING_CACHE_MAX', 64))  # entradas
+# 'local' (um processo só / testes) ou 'postgres' (LISTEN/NOTIFY, atravessa os workers do gunicorn).
+# Vale para o placar ao vivo e para a invalidação do cache de identidade.
+app.config['PLACAR_BROKER'] = os.environ.get('PLACAR_BROKER', 'postgres' if db_url.startswith('postgresql') else 'local')
+app.config['IDENTIDADE_CACHE_TTL'] = int(os.environ.get('IDENTIDADE_CACHE_TTL', 300))  # segundos
+# Sem o broker 'postgres': de quanto em quanto tempo cada processo confere se outro worker mudou
+# alguma identidade (uma leitura de mudancas_dados por intervalo, não por request).
+app.config['IDENTIDADE_VERIFICACAO'] = float(os.environ.get('IDENTIDADE_VERIFICACAO', 5))  # segundos
+app.config['PLACAR_SSE_HEARTBEAT'] = int(os.environ.get('PLACAR_SSE_HEARTBEAT', 15))  # segundos
+# Cada stream SSE prende uma thread do worker: acima disto a aba volta para o polling (o
+# gunicorn.conf.py deriva o valor das threads/conexões do worker). Cada stream dura no máximo
+# PLACAR_SSE_DURACAO e o EventSource reconecta sozinho, o que reparte as vagas entre as abas.
+app.config['PLACAR_SSE_MAX_ASSINANTES'] = int(os.environ.get('PLACAR_SSE_MAX_ASSINANTES', 2))
+app.config['PLACAR_SSE_DURACAO'] = int(os.environ.get('PLACAR_SSE_DURACAO', 300))  # segundos
+app.config['METRICAS_SQL'] = os.environ.get('METRICAS_SQL', '1') == '1'  # Server-Timing + /api/_metrics
+# Fuso dos alunos: define o dia de cada registro (data_local), a virada da semana e os rankings.
+# Mudou? Rode `flask recalcular-data-local` (ou /_migrar_data_local?todas=1).
+app.config['FUSO_HORARIO'] = os.environ.get('FUSO_HORARIO', 'America/Sao_Paulo')
+app.config['COMPRESSAO_MINIMO'] = int(os.environ.get('COMPRESSAO_MINIMO', 1024))  # bytes; abaixo disso não comprime
+# Segundos depois de uma escrita em que o mesmo navegador (cookie de sessão) ainda lê do primário,
+# para não ver a réplica atrasada (mínimo 1); e de quanto em quanto tempo a réplica caída é testada.
+app.config['REPLICA_JANELA_ESCRITA'] = float(os.environ.get('REPLICA_JANELA_ESCRITA', 5))
+app.config['REPLICA_VERIFICACAO'] = float(os.environ.get('REPLICA_VERIFICACAO', 30))
+
+class SessaoRoteada(Session):
+    """Sessão que manda as leituras dos GET /api/... para a réplica, quando houver uma, e repete
+    uma vez a leitura que pegou uma conexão derrubada ou que falhou na réplica (no primário)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_leitura.usar(self, clause):
+            return replica_leitura.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def execute(self, statement, *args, **kwargs):
+        return self._repetindo_leitura(super().execute, statement, *args, **kwargs)
+
+    def scalar(self, statement, *args, **kwargs):
+        return self._repetindo_leitura(super().scalar, statement, *args, **kwargs)
+
+    def scalars(self, statement, *args, **kwargs):
+        return self._repetindo_leitura(super().scalars, statement, *args, **kwargs)
+
+    def _repetindo_leitura(self, executar, statement, *args, **kwargs):
+        if has_request_context():
+            g.pop('replica_falhou', None)  # Só conta o erro deste statement (ver marcar_indisponivel)
+        try:
+            return executar(statement, *args, **kwargs)
+        except DBAPIError as e:
+            # Só é seguro repetir um SELECT de uma transação que ainda não escreveu: o rollback
+            # que troca a conexão não desfaz nada. O pool já descartou a conexão (e as ociosas
+            # da mesma leva) quando o handle_error marcou a desconexão.
+            na_replica = has_request_context() and g.pop('replica_falhou', False)
+            if not (e.connection_invalidated or na_replica) or self.info.get('escreveu') or not eh_leitura(statement):
+                raise
+            if na_replica:
+                # Qualquer erro da réplica (queda, atraso de schema...): o resto do request vai ao primário
+                g.leitura_no_primario = True
+                app.logger.warning(f"Leitura falhou na réplica, repetindo no primário: {e.orig}")
+            else:
+                app.logger.warning(f"Conexão com o banco caiu, repetindo a leitura: {e.orig}")
+            self.rollback()
+            return executar(statement, *args, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': SessaoRoteada})
+
+@event.listens_for(SessaoRoteada, 'before_flush')
+def _marcar_escrita_na_sessao(sessao, contexto, instancias):
+    sessao.info['escreveu'] = True
+
+@event.listens_for(SessaoRoteada, 'do_orm_execute')
+def _marcar_escrita_em_lote(contexto):
+    if not eh_leitura(contexto.statement):
+        contexto.session.info['escreveu'] = True
+
+@event.listens_for(SessaoRoteada, 'after_transaction_end')
+def _limpar_escrita_na_sessao(sessao, transacao):
+    if transacao.parent is None:
+        sessao.info.pop('escreveu', None)
+
+# Erros de proxy (PgBouncer) que fecham a conexão mas que o dialeto não reconhece como queda
+MENSAGENS_DESCONEXAO = ('server conn crashed', 'query_wait_timeout', 'client_idle_timeout')
+
+def marcar_desconexao(contexto):
+    """handle_error: marca a queda para o pool descartar a conexão e a sessão poder repetir a leitura."""
+    if not contexto.is_disconnect and any(m in str(contexto.original_exception) for m in MENSAGENS_DESCONEXAO):
+        contexto.is_disconnect = True
+
+with app.app_context():
+    for engine in db.engines.values():
+        event.listen(engine, 'handle_error', marcar_desconexao)
 
 # --- CONSTANTES ---
 ADMIN_NAME = 'João Vithor'
 DEFAULT_PASSWORD = 'senha123'
 DATE_FORMAT = '%d/%m/%Y'
+MAX_LINHAS_BULK = 50000
+LINHAS_POR_LOTE_EXPORT = 1000
+SEM_TIME = 'Sem Time'
+EMOJI_TIMES = {'GUI': '🔵', 'ENZO': '🔴'}
+
+# --- HASH DE SENHA ---
+
+def gerar_hash_senha(senha, metodo=None):
+    return generate_password_hash(senha, method=metodo or app.config['SENHA_HASH_METODO'])
+
+# Entre algoritmos diferentes, o scrypt (que também gasta memória) vale mais que o pbkdf2
+ALGORITMOS_HASH = ('pbkdf2', 'scrypt')
+
+def custo_hash_senha(metodo):
+    """(algoritmo, custos) de um método do werkzeug com os padrões dele preenchidos, ou None.
+
+    Custos, todos crescendo com a força: scrypt (memória n*r, CPU n*r*p); pbkdf2 (tamanho do
+    digest, iterações).
+    """
+    nome, *args = metodo.split(':')
+    try:
+        if nome == 'scrypt':
+            n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+            return nome, (n * r, n * r * p)
+        if nome == 'pbkdf2':
+            iteracoes = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+            return nome, (hashlib.new(args[0] if args else 'sha256').digest_size, iteracoes)
+    except (ValueError, IndexError):
+        pass
+    return None
+
+def hash_mais_fraco(gravado, alvo):
+    """True se o método `gravado` é mais fraco que `alvo` em tudo (e diferente dele).
+
+    Hash mais forte, ou mais forte numa dimensão e mais fraco em outra, não é refeito: trocar
+    por `alvo` enfraqueceria a senha. Método que não dá para comparar também fica como está.
+    """
+    gravado, alvo = custo_hash_senha(gravado), custo_hash_senha(alvo)
+    if gravado is None or alvo is None:
+        return False
+    if gravado[0] != alvo[0]:
+        return ALGORITMOS_HASH.index(gravado[0]) < ALGORITMOS_HASH.index(alvo[0])
+    return gravado[1] != alvo[1] and all(g <= a for g, a in zip(gravado[1], alvo[1]))
+
+def executar_fora_do_loop(funcao, *args):
+    """Roda uma função de CPU (hash de senha) sem travar o worker.
+
+    Sob gevent, vai para o threadpool nativo do hub e o loop continua atendendo outros
+    requests. Em workers sync/gthread chama direto: o hashlib solta o GIL durante o hash,
+    então as outras threads do worker seguem rodando.
+    """
+    try:
+        from gevent import get_hub, monkey
+        if monkey.is_module_patched('threading'):
+            return get_hub().threadpool.apply(funcao, args)
+    except ImportError:
+        pass
+    return funcao(*args)
+
+def gerar_hashes_em_lote(senhas):
+    """Gera um hash por senha usando um pool de processos (migrações com muitos alunos)."""
+    if len(senhas) < 8:
+        return [gerar_hash_senha(senha) for senha in senhas]
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    gerar = partial(generate_password_hash, method=app.config['SENHA_HASH_METODO'])
+    # 'spawn' porque o processo do worker tem threads (SSE, LISTEN) e fork com threads é arriscado
+    try:
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as pool:
+            return list(pool.map(gerar, senhas, chunksize=4))
+    except Exception as e:
+        print(f"Aviso: pool de processos indisponível ({e}), gerando hashes em sequência.")
+        return [gerar(senha) for senha in senhas]
+
 
 # --- MODELOS DO BANCO DE DADOS ---
 class Alunos(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
     username = db.Column(db.String(50), unique=True, nullable=True)  # Nullable para permitir migrações
-    time = db.Column(db.String(20), nullable=True, default='Sem Time')
+    time = db.Column(db.String(20), nullable=True, default=SEM_TIME)
     senha_hash = db.Column(db.String(200), nullable=True)
     tipo_usuario = db.Column(db.String(10), default='aluno')
     primeira_vez = db.Column(db.Integer, default=1)
     
     def set_senha(self, senha):
-        self.senha_hash = generate_password_hash(senha)
+        self.senha_hash = executar_fora_do_loop(gerar_hash_senha, senha)
     
     def check_senha(self, senha):
-        return check_password_hash(self.senha_hash, senha) 
+        return executar_fora_do_loop(check_password_hash, self.senha_hash, senha)
+
+    def precisa_rehash(self):
+        """True se o hash gravado é mais fraco que o configurado (nunca rebaixa um hash mais forte)."""
+        return bool(self.senha_hash) and hash_mais_fraco(self.senha_hash.split('$', 1)[0],
+                                                         app.config['SENHA_HASH_METODO'])
 
 class RegistrosQuestoes(db.Model):
+    __table_args__ = (
+        db.Index('ix_registros_questoes_data_registro', 'data_registro'),
+        db.Index('ix_registros_questoes_aluno_data', 'aluno_id', 'data_registro'),
+        db.Index('ix_registros_questoes_data_local', 'data_local'),
+        db.Index('ix_registros_questoes_aluno_data_local', 'aluno_id', 'data_local'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     aluno_id = db.Column(db.Integer, db.ForeignKey('alunos.id'), nullable=False)
     quantidade_questoes = db.Column(db.Integer, nullable=False)
     acertos = db.Column(db.Integer, nullable=False)
     data_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Dia do registro no FUSO_HORARIO, gravado no insert: agrupar por dia vira range scan no índice.
+    # NULL só em linhas anteriores à coluna, até rodar /_migrar_data_local.
+    data_local = db.Column(db.Date, nullable=True)
     aluno = db.relationship('Alunos', backref=db.backref('registros_questoes', lazy=True))
 
+class RegistrosDiarios(db.Model):
+    # Rollup por aluno e por dia (data_local) de registros_questoes.
+    # Mantido por add_registro/delete_registro; é daqui que os rankings e a consulta leem.
+    __tablename__ = 'registros_diarios'
+    __table_args__ = (db.UniqueConstraint('aluno_id', 'dia', name='uq_registros_diarios_aluno_dia'),)
+    id = db.Column(db.Integer, primary_key=True)
+    aluno_id = db.Column(db.Integer, db.ForeignKey('alunos.id'), nullable=False)
+    dia = db.Column(db.Date, nullable=False, index=True)
+    quantidade_questoes = db.Column(db.Integer, nullable=False, default=0)
+    acertos = db.Column(db.Integer, nullable=False, default=0)
+    num_registros = db.Column(db.Integer, nullable=False, default=0)
+
+class RankingsSemanais(db.Model):
+    # Retrato final de cada semana fechada (domingo a sábado, no FUSO_HORARIO): rankings e batalha de times.
+    # Gravado na primeira consulta depois da virada; só é refeito se um registro daquela semana mudar.
+    __tablename__ = 'rankings_semanais'
+    id = db.Column(db.Integer, primary_key=True)
+    semana_inicio = db.Column(db.Date, nullable=False, unique=True)  # Domingo que abre a semana
+    vencedor = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    gerado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class MudancasDados(db.Model):
+    # Uma linha por commit que mexeu num domínio (alunos, registros...), gravada logo depois
+    # dele; a versão do domínio é o maior id. Inserir não disputa lock entre escritores, ao
+    # contrário de um contador numa linha só. É a base dos ETags das rotas de leitura (ver
+    # resposta_condicional); as linhas antigas de cada domínio são podadas (ver subir_versoes).
+    __tablename__ = 'mudancas_dados'
+    __table_args__ = (db.Index('ix_mudancas_dados_dominio_id', 'dominio', 'id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    dominio = db.Column(db.String(20), nullable=False)
+    em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class Empresas(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), unique=True, nullable=False)
@@ -67,6 +342,11 @@ class Simulados(db.Model):
     empresa = db.relationship('Empresas', backref=db.backref('simulados', lazy=True))
 
 class ResultadosSimulados(db.Model):
+    __table_args__ = (
+        db.Index('ix_resultados_simulados_simulado_nota', 'simulado_id', 'nota'),
+        # Um aluno só tem uma nota por simulado (garantido pelo banco, não por SELECT antes do INSERT)
+        db.Index('uq_resultados_simulados_aluno_simulado', 'aluno_id', 'simulado_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     aluno_id = db.Column(db.Integer, db.ForeignKey('alunos.id'), nullable=False)
     simulado_id = db.Column(db.Integer, db.ForeignKey('simulados.id'), nullable=False)
@@ -76,20 +356,193 @@ class ResultadosSimulados(db.Model):
     aluno = db.relationship('Alunos', backref=db.backref('resultados_simulados', lazy=True))
     simulado = db.relationship('Simulados', backref=db.backref('resultados_simulados', lazy=True))
 
+class EstatisticasSimulados(db.Model):
+    # Agregados das notas de cada simulado, recalculados (só daquele simulado) a cada nota
+    # gravada ou apagada. Servem as estatísticas e o leaderboard sem ler todas as notas.
+    __tablename__ = 'estatisticas_simulados'
+    simulado_id = db.Column(db.Integer, db.ForeignKey('simulados.id'), primary_key=True)
+    participantes = db.Column(db.Integer, nullable=False)
+    media = db.Column(db.Float, nullable=False)
+    desvio = db.Column(db.Float, nullable=False)  # Desvio padrão populacional
+    minimo = db.Column(db.Float, nullable=False)
+    p25 = db.Column(db.Float, nullable=False)
+    mediana = db.Column(db.Float, nullable=False)
+    p75 = db.Column(db.Float, nullable=False)
+    p90 = db.Column(db.Float, nullable=False)
+    maximo = db.Column(db.Float, nullable=False)
+    histograma = db.Column(db.JSON, nullable=False)  # Contagem por faixa de FAIXAS_HISTOGRAMA_NOTAS
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+# --- PUB/SUB ENTRE WORKERS (POSTGRES) ---
+
+class OuvintePostgres:
+    """Uma conexão LISTEN por processo que repassa cada NOTIFY ao callback do canal.
+
+    Os canais são registrados no import; a thread só sobe no primeiro `iniciar()`
+    (já dentro do worker, depois do fork do gunicorn).
+    """
+
+    def __init__(self):
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def registrar(self, canal, callback):
+        self._callbacks[canal] = callback
+
+    def notificar(self, canal, payload=''):
+        with db.engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:canal, :payload)"), {'canal': canal, 'payload': payload})
+            conn.commit()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop_listen, name='pg-listen', daemon=True)
+                self._thread.start()
+
+    def _loop_listen(self):
+        import select
+        import psycopg2
+        while True:
+            try:
+                conn = psycopg2.connect(db.engine.url.render_as_string(hide_password=False))
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                for canal in self._callbacks:
+                    conn.cursor().execute(f"LISTEN {canal}")
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        aviso = conn.notifies.pop(0)
+                        self._callbacks[aviso.channel](aviso.payload)
+            except Exception as e:
+                print(f"Aviso no LISTEN do Postgres, reconectando: {e}")
+                time.sleep(5)
+
+ouvinte_postgres = OuvintePostgres()
+
 
 # --- AUTENTICAÇÃO ---
 
+class CacheIdentidades:
+    """Cache (por processo) de quem é cada user_id: evita ir ao banco em todo request.
+
+    Cada usuário tem uma versão em memória; `invalidar()` sobe a versão e descarta a
+    entrada, e uma carga que começou antes da invalidação não é guardada. Com o broker
+    'postgres' a invalidação é repassada aos outros workers por NOTIFY; o TTL é a rede
+    de segurança caso algum aviso se perca. Sem ele, quem muda uma identidade sobe a versão
+    'identidades' em mudancas_dados (`publicar_mudanca`), e cada processo a confere no máximo
+    uma vez a cada `verificacao` segundos: se mudou, descarta tudo. Aluno apagado, rebaixado ou
+    renomeado em outro worker perde o acesso em segundos, sem esperar o TTL; troca de senha ou
+    de time não mexe nessa versão.
+    """
+
+    CANAL = 'identidades'
+
+    def __init__(self, ttl, verificacao):
+        self.ttl = ttl
+        self.verificacao = verificacao
+        self._dados = {}  # user_id -> (expira_em, identidade)
+        self._versoes = {}
+        self._geracao = 0  # Sobe a cada invalidação geral ('*')
+        self._lock = threading.Lock()
+        self._distribuido = False
+        self._versao_publicada = None  # Última versão 'identidades' lida
+        self._verificada_ate = 0.0
+
+    def obter(self, user_id):
+        agora = time.monotonic()
+        if self._distribuido:
+            ouvinte_postgres.iniciar()
+        elif agora >= self._verificada_ate:
+            self._conferir_versao_publicada(agora)
+        with self._lock:
+            entrada = self._dados.get(user_id)
+            if entrada and entrada[0] > agora:
+                return entrada[1]
+            versao = (self._versoes.get(user_id, 0), self._geracao)
+
+        aluno = db.session.get(Alunos, user_id)
+        identidade = Identidade(aluno.id, aluno.nome, aluno.username, aluno.tipo_usuario) if aluno else None
+
+        with self._lock:
+            if (self._versoes.get(user_id, 0), self._geracao) == versao:
+                self._dados[user_id] = (agora + self.ttl, identidade)
+        return identidade
+
+    def _conferir_versao_publicada(self, agora):
+        versao, = versoes_dos_dominios((DOMINIO_IDENTIDADES,)) or (None,)
+        with self._lock:
+            self._verificada_ate = agora + self.verificacao
+            if versao != self._versao_publicada:
+                self._versao_publicada = versao
+                self._geracao += 1
+                self._dados.clear()
+
+    def invalidar(self, user_id, propagar=True):
+        """Descarta um usuário; `user_id='*'` descarta todos (ex.: migrações que mexem em perfis)."""
+        with self._lock:
+            if user_id == '*':
+                self._geracao += 1
+                self._dados.clear()
+            else:
+                self._versoes[user_id] = self._versoes.get(user_id, 0) + 1
+                self._dados.pop(user_id, None)
+        if not propagar:
+            return
+        if self._distribuido:
+            try:
+                ouvinte_postgres.notificar(self.CANAL, str(user_id))
+            except Exception as e:
+                print(f"Aviso ao propagar invalidação de identidade: {e}")
+        else:
+            self.publicar_mudanca()
+
+    def publicar_mudanca(self):
+        """Sobe a versão 'identidades' (chamar depois do commit da mudança)."""
+        subir_versoes({DOMINIO_IDENTIDADES})
+
+    def distribuir_via_postgres(self):
+        self._distribuido = True
+        ouvinte_postgres.registrar(self.CANAL, lambda payload: self.invalidar(
+            payload if payload == '*' else int(payload), propagar=False))
+
+Identidade = namedtuple('Identidade', 'id nome username tipo_usuario')
+
+cache_identidades = CacheIdentidades(app.config['IDENTIDADE_CACHE_TTL'], app.config['IDENTIDADE_VERIFICACAO'])
+if app.config['PLACAR_BROKER'] == 'postgres':
+    cache_identidades.distribuir_via_postgres()
+
 def get_usuario_atual():
-    """Retorna o aluno logado ou None."""
+    """Retorna a identidade (id, nome, username, tipo_usuario) do usuário logado ou None.
+
+    Fica guardada em `g` durante o request e em cache no processo entre requests.
+    Usuário apagado vira None e a sessão é limpa.
+    """
     if 'user_id' not in session:
         return None
-    return Alunos.query.get(session['user_id'])
+    if 'usuario_atual' not in g:
+        g.usuario_atual = cache_identidades.obter(session['user_id'])
+        if g.usuario_atual is None:
+            session.clear()
+        elif session.get('tipo_usuario') != g.usuario_atual.tipo_usuario or session.get('nome') != g.usuario_atual.nome:
+            session['nome'] = g.usuario_atual.nome
+            session['tipo_usuario'] = g.usuario_atual.tipo_usuario
+    return g.usuario_atual
+
+def invalidar_usuario(user_id):
+    """Chamar depois de commitar mudança no que a identidade guarda (nome, username, perfil) ou a
+    exclusão do aluno. Senha e time não fazem parte dela."""
+    cache_identidades.invalidar(user_id)
 
 def login_required(f):
     """Decorador para rotas que exigem autenticação."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if get_usuario_atual() is None:
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
@@ -98,14 +551,245 @@ def admin_required(f):
     """Decorador para rotas que exigem perfil de admin."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        usuario = get_usuario_atual()
+        if usuario is None:
             return redirect(url_for('login'))
-        if session.get('tipo_usuario') != 'admin':
+        if usuario.tipo_usuario != 'admin':
             return jsonify({'erro': 'Acesso negado. Apenas administradores.'}), 403
         return f(*args, **kwargs)
     return decorated_function
 
 
+# --- INSTRUMENTAÇÃO DE SQL POR REQUEST ---
+# Eventos do engine contam statements e tempo de banco em `g`; os hooks do Flask fecham a
+# conta no fim do request, mandam o header Server-Timing e acumulam histogramas por rota
+# (por processo) que o admin consulta em /api/_metrics.
+
+FAIXAS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]  # Limites superiores dos buckets
+
+class MetricasRotas:
+    """Histogramas de latência e tempo de banco, e a query mais lenta, por rota."""
+
+    def __init__(self):
+        self._rotas = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(ms):
+        for limite in FAIXAS_MS:
+            if ms <= limite:
+                return f'<={limite}'
+        return f'>{FAIXAS_MS[-1]}'
+
+    def registrar(self, rota, total_ms, db_ms, queries, mais_lenta):
+        with self._lock:
+            m = self._rotas.get(rota)
+            if m is None:
+                m = self._rotas[rota] = {
+                    'requests': 0, 'queries_total': 0, 'queries_max': 0, 'total_ms': 0.0, 'db_ms': 0.0,
+                    'histograma_ms': {}, 'histograma_db_ms': {}, 'query_mais_lenta': None,
+                }
+            m['requests'] += 1
+            m['queries_total'] += queries
+            m['queries_max'] = max(m['queries_max'], queries)
+            m['total_ms'] += total_ms
+            m['db_ms'] += db_ms
+            faixa = self._bucket(total_ms)
+            m['histograma_ms'][faixa] = m['histograma_ms'].get(faixa, 0) + 1
+            faixa = self._bucket(db_ms)
+            m['histograma_db_ms'][faixa] = m['histograma_db_ms'].get(faixa, 0) + 1
+            if mais_lenta and (m['query_mais_lenta'] is None or mais_lenta[0] > m['query_mais_lenta']['ms']):
+                m['query_mais_lenta'] = {'ms': round(mais_lenta[0], 3), 'sql': mais_lenta[1][:500]}
+
+    def resumo(self):
+        with self._lock:
+            rotas = {}
+            for rota, m in self._rotas.items():
+                n = m['requests']
+                rotas[rota] = dict(m, queries_media=round(m['queries_total'] / n, 2),
+                                   total_ms_medio=round(m['total_ms'] / n, 3), db_ms_medio=round(m['db_ms'] / n, 3),
+                                   total_ms=round(m['total_ms'], 3), db_ms=round(m['db_ms'], 3),
+                                   histograma_ms=dict(m['histograma_ms']), histograma_db_ms=dict(m['histograma_db_ms']))
+            return rotas
+
+    def zerar(self):
+        with self._lock:
+            self._rotas.clear()
+
+metricas_rotas = MetricasRotas()
+
+def _sql_antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('inicio_sql', []).append(time.perf_counter())
+
+def _sql_depois(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info['inicio_sql'].pop()
+    if not has_request_context() or 'sql_queries' not in g:
+        return
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    g.sql_queries += 1
+    g.sql_ms += duracao_ms
+    if g.sql_mais_lenta is None or duracao_ms > g.sql_mais_lenta[0]:
+        g.sql_mais_lenta = (duracao_ms, statement)
+
+def _sql_erro(contexto):
+    # Statement que falhou não passa pelo after_cursor_execute
+    if contexto.connection is not None and contexto.connection.info.get('inicio_sql'):
+        contexto.connection.info['inicio_sql'].pop()
+
+def instrumentar_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _sql_antes)
+    event.listen(engine, 'after_cursor_execute', _sql_depois)
+    event.listen(engine, 'handle_error', _sql_erro)
+
+if app.config['METRICAS_SQL']:
+    with app.app_context():
+        for engine in db.engines.values():
+            instrumentar_engine(engine)
+
+    @app.before_request
+    def iniciar_metricas_request():
+        g.inicio_request = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_ms = 0.0
+        g.sql_mais_lenta = None
+
+    @app.after_request
+    def registrar_metricas_request(response):
+        if 'inicio_request' not in g:
+            return response
+        total_ms = (time.perf_counter() - g.inicio_request) * 1000
+        response.headers.add('Server-Timing', f'db;dur={g.sql_ms:.2f};desc="{g.sql_queries} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total_ms:.2f}')
+        if request.url_rule is not None and request.endpoint != 'static':
+            rota = f'{request.method} {request.url_rule.rule}'
+            metricas_rotas.registrar(rota, total_ms, g.sql_ms, g.sql_queries, g.sql_mais_lenta)
+        return response
+
+@app.route('/api/_metrics', methods=['GET', 'DELETE'])
+@admin_required
+def metricas_sql():
+    """Métricas deste processo (cada worker do gunicorn tem as suas). DELETE zera."""
+    if request.method == 'DELETE':
+        metricas_rotas.zerar()
+        return jsonify({'status': 'sucesso', 'mensagem': 'Métricas zeradas.'})
+    return jsonify({'pid': os.getpid(), 'faixas_ms': FAIXAS_MS, 'rotas': metricas_rotas.resumo()})
+
+
+# --- COMPRESSÃO E ARQUIVOS ESTÁTICOS ---
+
+TIPOS_COMPRIMIVEIS = {'application/json', 'text/html', 'text/css', 'text/javascript', 'application/javascript'}
+
+def comprimir(dados, codificacao, maximo=False):
+    # Nível médio para respostas dinâmicas (CPU por request); máximo para estáticos (comprimidos uma vez)
+    if codificacao == 'br':
+        return brotli.compress(dados, quality=11 if maximo else 5)
+    return gzip.compress(dados, compresslevel=9 if maximo else 6, mtime=0)
+
+def escolher_codificacao(aceitas):
+    """'br', 'gzip' ou None a partir do Accept-Encoding (já parseado, como request.accept_encodings)."""
+    if aceitas['br']:
+        return 'br'
+    if aceitas['gzip']:
+        return 'gzip'
+    return None
+
+class ArquivosEstaticos:
+    """Hash do conteúdo (vai na URL como ?v=) e versões comprimidas dos arquivos de static/.
+
+    Tudo em memória por processo, recalculado se o mtime do arquivo mudar.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = pasta
+        self._hashes = {}  # filename -> (mtime, hash)
+        self._comprimidos = {}  # (filename, codificacao) -> (mtime, bytes ou None se não compensa)
+        self._lock = threading.Lock()
+
+    def _ler(self, filename):
+        caminho = safe_join(self.pasta, filename or '')
+        if caminho is None or not os.path.isfile(caminho):
+            return None, None
+        return os.path.getmtime(caminho), caminho
+
+    def hash(self, filename):
+        mtime, caminho = self._ler(filename)
+        if caminho is None:
+            return None
+        atual = self._hashes.get(filename)
+        if atual and atual[0] == mtime:
+            return atual[1]
+        with open(caminho, 'rb') as f:
+            versao = hashlib.md5(f.read()).hexdigest()[:10]
+        with self._lock:
+            self._hashes[filename] = (mtime, versao)
+        return versao
+
+    def comprimido(self, filename, codificacao):
+        mtime, caminho = self._ler(filename)
+        if caminho is None:
+            return None
+        atual = self._comprimidos.get((filename, codificacao))
+        if atual and atual[0] == mtime:
+            return atual[1]
+        with open(caminho, 'rb') as f:
+            dados = f.read()
+        comprimido = comprimir(dados, codificacao, maximo=True) if len(dados) >= app.config['COMPRESSAO_MINIMO'] else None
+        with self._lock:
+            self._comprimidos[(filename, codificacao)] = (mtime, comprimido)
+        return comprimido
+
+arquivos_estaticos = ArquivosEstaticos(app.static_folder)
+
+@app.url_defaults
+def versionar_estaticos(endpoint, values):
+    # url_for('static', filename=...) ganha ?v=<hash>: mudou o arquivo, mudou a URL
+    if endpoint == 'static' and 'v' not in values:
+        versao = arquivos_estaticos.hash(values.get('filename'))
+        if versao:
+            values['v'] = versao
+
+@app.after_request
+def comprimir_resposta(response):
+    if (request.endpoint == 'static' and response.status_code in (200, 304)
+            and request.args.get('v') == arquivos_estaticos.hash(request.view_args.get('filename'))):
+        # URL com hash nunca muda de conteúdo: o navegador pode guardar por um ano
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in TIPOS_COMPRIMIVEIS):
+        return response
+    response.vary.add('Accept-Encoding')
+    codificacao = escolher_codificacao(request.accept_encodings)
+    if codificacao is None:
+        return response
+
+    if request.endpoint == 'static':
+        dados = arquivos_estaticos.comprimido(request.view_args.get('filename'), codificacao)
+        if dados is None:
+            return response
+        if hasattr(response.response, 'close'):
+            response.response.close()  # Solta o arquivo aberto pelo send_file
+        response.direct_passthrough = False
+        response.set_data(dados)
+    else:
+        # Streams (exportações, SSE) ficam de fora: compressão precisaria do corpo inteiro
+        if response.is_streamed or response.direct_passthrough:
+            return response
+        dados = response.get_data()
+        if len(dados) < app.config['COMPRESSAO_MINIMO']:
+            return response
+        response.set_data(comprimir(dados, codificacao))
+
+    response.headers['Content-Encoding'] = codificacao
+    etag, fraca = response.get_etag()
+    if etag and not fraca:
+        response.set_etag(etag, weak=True)  # Mesmo conteúdo, bytes diferentes: o ETag deixa de ser forte
+    return response
+
+
 # --- ROTA DE SETUP ---
 @app.route('/_iniciar_banco_de_dados_uma_vez')
 def iniciar_banco():
@@ -115,6 +799,10 @@ def iniciar_banco():
         
         # Tentamos apagar APENAS as tabelas de simulado para recriá-las corretamente
         # Usamos try/except para não dar erro se elas já não existirem
+        try:
+            EstatisticasSimulados.__table__.drop(db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"Aviso ao dropar EstatisticasSimulados: {e}")
         try:
             ResultadosSimulados.__table__.drop(db.engine)
         except Exception as e:
@@ -158,15 +846,521 @@ def iniciar_banco():
         return f"Ocorreu um erro: {e}", 500
 
 # --- FUNÇÃO HELPER DE FUSO HORÁRIO ---
+def carregar_fuso(nome):
+    try:
+        return ZoneInfo(nome)
+    except ZoneInfoNotFoundError:
+        # Sem base de fusos no sistema (ex.: Windows sem o pacote tzdata): cai no UTC-3 fixo
+        app.logger.warning(f"Fuso {nome} não encontrado; usando UTC-3 fixo.")
+        return timezone(timedelta(hours=-3))
+
+FUSO = carregar_fuso(app.config['FUSO_HORARIO'])
+
 def get_start_of_week():
-    from datetime import timezone
-    today_utc = datetime.now(timezone.utc)
-    today_brt = today_utc - timedelta(hours=3)
-    days_since_sunday = (today_brt.weekday() - 6 + 7) % 7
-    start_of_week_brt = today_brt - timedelta(days=days_since_sunday)
-    start_of_week_brt_midnight = start_of_week_brt.replace(hour=0, minute=0, second=0, microsecond=0)
-    start_of_week_utc = start_of_week_brt_midnight + timedelta(hours=3)
-    return start_of_week_utc
+    """Domingo 00:00 (no FUSO_HORARIO) da semana atual, como datetime UTC com tzinfo."""
+    return inicio_do_dia_utc(inicio_da_semana(datetime.now(FUSO).date()))
+
+def inicio_do_dia_utc(dia):
+    """Meia-noite local de `dia`, em UTC (com tzinfo)."""
+    return datetime(dia.year, dia.month, dia.day, tzinfo=FUSO).astimezone(timezone.utc)
+
+def local_para_utc(data_local):
+    """Converte um datetime local (no FUSO_HORARIO, naive) para o UTC naive usado em data_registro."""
+    return data_local.replace(tzinfo=FUSO).astimezone(timezone.utc).replace(tzinfo=None)
+
+def dia_local(data_utc):
+    """Dia no FUSO_HORARIO de um datetime UTC (naive, como gravado em data_registro, ou com tzinfo)."""
+    if data_utc.tzinfo is None:
+        data_utc = data_utc.replace(tzinfo=timezone.utc)
+    return data_utc.astimezone(FUSO).date()
+
+def inicio_da_semana(dia):
+    """Domingo que abre a semana (domingo a sábado) de um dia local."""
+    return dia - timedelta(days=(dia.weekday() + 1) % 7)
+
+def semana_iso(inicio):
+    """Rótulo ISO (ex.: 2025-W07) da semana que começa no domingo `inicio`: a da segunda seguinte."""
+    ano, semana, _ = (inicio + timedelta(days=1)).isocalendar()
+    return f"{ano}-W{semana:02d}"
+
+
+# --- ROLLUP DIÁRIO DE QUESTÕES ---
+
+def insert_com_conflito(tabela):
+    """INSERT no dialeto do banco (Postgres ou SQLite), que aceita ON CONFLICT ... DO UPDATE."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(tabela)
+
+def atualizar_rollup_diario(aluno_id, dia, questoes, acertos, registros=1):
+    """Soma (ou subtrai, com valores negativos) um registro no rollup do dia. Não faz commit."""
+    if registros > 0:
+        somar_no_rollup({(aluno_id, dia): [questoes, acertos, registros]})
+        return
+    tabela = RegistrosDiarios.__table__
+    db.session.execute(
+        tabela.update()
+        .where(tabela.c.aluno_id == aluno_id, tabela.c.dia == dia)
+        .values(quantidade_questoes=tabela.c.quantidade_questoes + questoes,
+                acertos=tabela.c.acertos + acertos,
+                num_registros=tabela.c.num_registros + registros)
+    )
+    # Dia sem nenhum registro restante sai do rollup
+    db.session.execute(tabela.delete().where(
+        tabela.c.aluno_id == aluno_id, tabela.c.dia == dia, tabela.c.num_registros <= 0))
+
+def somar_no_rollup(totais):
+    """Soma vários (aluno, dia) no rollup de uma vez. `totais`: {(aluno_id, dia): [questoes, acertos, registros]}.
+
+    Um INSERT ... ON CONFLICT (aluno_id, dia) DO UPDATE em executemany: o dia que já existe
+    soma, o que não existe é criado, e dois primeiros registros simultâneos do mesmo dia não
+    disputam a restrição única. Não faz commit.
+    """
+    if not totais:
+        return
+    tabela = RegistrosDiarios.__table__
+    comando = insert_com_conflito(tabela)
+    comando = comando.on_conflict_do_update(
+        index_elements=['aluno_id', 'dia'],
+        set_={'quantidade_questoes': tabela.c.quantidade_questoes + comando.excluded.quantidade_questoes,
+              'acertos': tabela.c.acertos + comando.excluded.acertos,
+              'num_registros': tabela.c.num_registros + comando.excluded.num_registros})
+    db.session.execute(comando, [
+        {'aluno_id': a, 'dia': d, 'quantidade_questoes': q, 'acertos': ac, 'num_registros': n}
+        for (a, d), (q, ac, n) in totais.items()])
+
+def preencher_data_local(todas=False):
+    """Grava data_local nas linhas que ainda não têm (ou em todas, depois de mudar o FUSO_HORARIO).
+
+    Anda por id em lotes (paginação por chave), então a memória não cresce com o histórico.
+    O dia sai do Python (zoneinfo) para valer igual no SQLite e no Postgres. Não faz commit.
+    """
+    tabela = RegistrosQuestoes.__table__
+    atualizar = (tabela.update().where(tabela.c.id == bindparam('b_id'))
+                 .values(data_local=bindparam('b_dia')))
+    ultimo_id, total = 0, 0
+    while True:
+        consulta = (select(tabela.c.id, tabela.c.data_registro)
+                    .where(tabela.c.id > ultimo_id).order_by(tabela.c.id).limit(5000))
+        if not todas:
+            consulta = consulta.where(tabela.c.data_local.is_(None))
+        lote = db.session.execute(consulta).all()
+        if not lote:
+            return total
+        db.session.execute(atualizar, [{'b_id': id_, 'b_dia': dia_local(data)} for id_, data in lote])
+        ultimo_id = lote[-1].id
+        total += len(lote)
+
+def reconstruir_rollup_diario():
+    """Apaga e recalcula o rollup inteiro a partir de registros_questoes. Não faz commit.
+
+    O agrupamento (aluno, data_local) roda no banco, num INSERT ... SELECT só.
+    """
+    preencher_data_local()
+    r = RegistrosQuestoes.__table__
+    db.session.execute(RegistrosDiarios.__table__.delete())
+    db.session.execute(RegistrosDiarios.__table__.insert().from_select(
+        ['aluno_id', 'dia', 'quantidade_questoes', 'acertos', 'num_registros'],
+        select(r.c.aluno_id, r.c.data_local, func.sum(r.c.quantidade_questoes), func.sum(r.c.acertos), func.count())
+        .group_by(r.c.aluno_id, r.c.data_local)))
+    return db.session.query(func.count(RegistrosDiarios.id)).scalar()
+
+@app.cli.command('reconstruir-rollup')
+def reconstruir_rollup_cli():
+    """Recria a tabela registros_diarios a partir do histórico completo."""
+    db.create_all()
+    versoes_prontas.garantir()  # Sem isso o commit não sobe as versões e os ETags ficam velhos
+    dias = reconstruir_rollup_diario()
+    db.session.commit()
+    print(f"Rollup reconstruído: {dias} linhas (aluno x dia).")
+
+@app.route('/_migrar_rollup_diario')
+def migrar_rollup_diario():
+    """Cria a tabela registros_diarios (se faltar) e faz o backfill a partir de registros_questoes."""
+    try:
+        RegistrosDiarios.__table__.create(db.engine, checkfirst=True)
+        dias = reconstruir_rollup_diario()
+        db.session.commit()
+        cache_rankings.invalidar(incluir_fechadas=True)
+        return f"✅ Rollup diário reconstruído: {dias} linhas (aluno x dia).", 200
+    except Exception as e:
+        db.session.rollback()
+        return f"❌ Erro na migração: {e}", 500
+
+@event.listens_for(RegistrosQuestoes, 'before_insert')
+def _preencher_data_local(_mapper, _conexao, registro):
+    # Inserts pelo ORM que não passaram data_local; os inserts em lote (Core) já mandam a coluna
+    if registro.data_registro is None:
+        registro.data_registro = datetime.utcnow()
+    if registro.data_local is None:
+        registro.data_local = dia_local(registro.data_registro)
+
+def recalcular_dias_locais(todas):
+    """Preenche data_local e refaz tudo que depende do dia: rollup e arquivo semanal. Não faz commit."""
+    linhas = preencher_data_local(todas)
+    dias = reconstruir_rollup_diario()
+    if todas:
+        db.session.execute(RankingsSemanais.__table__.delete())  # Refeitos sob demanda com os dias novos
+    return linhas, dias
+
+@app.cli.command('recalcular-data-local')
+def recalcular_data_local_cli():
+    """Recalcula data_local de todos os registros (rode depois de mudar FUSO_HORARIO)."""
+    versoes_prontas.garantir()
+    linhas, dias = recalcular_dias_locais(todas=True)
+    db.session.commit()
+    print(f"data_local recalculada em {linhas} registros; rollup com {dias} linhas.")
+
+@app.route('/_migrar_data_local')
+def migrar_data_local():
+    """Adiciona registros_questoes.data_local, preenche, cria os índices e refaz o rollup.
+
+    ?todas=1 recalcula também as linhas já preenchidas (depois de mudar FUSO_HORARIO).
+    """
+    try:
+        from sqlalchemy import inspect
+        colunas = {c['name'] for c in inspect(db.engine).get_columns('registros_questoes')}
+        if 'data_local' not in colunas:
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE registros_questoes ADD COLUMN data_local DATE"))
+        linhas, dias = recalcular_dias_locais(todas=request.args.get('todas') == '1')
+        db.session.commit()
+        criar_indices_desempenho()
+        cache_rankings.invalidar(incluir_fechadas=True)
+        return f"✅ data_local preenchida em {linhas} registros; rollup com {dias} linhas; índices criados.", 200
+    except Exception as e:
+        db.session.rollback()
+        return f"❌ Erro na migração: {e}", 500
+
+
+# --- CACHE DE RANKINGS ---
+
+class CacheRankings:
+    """Cache em memória (por processo) dos payloads JSON dos rankings.
+
+    Cada entrada expira pelo TTL e o cache guarda no máximo `max_entradas` (descarta a mais
+    antiga). As rotas de escrita chamam `invalidar()`; entradas marcadas como `fechadas`
+    (semana que já acabou) só saem com `invalidar(incluir_fechadas=True)` ou quando expiram.
+    A chave leva as versões de `dominios` em mudancas_dados: escrita feita por outro worker
+    (ou por um comando flask) muda a versão e a entrada antiga deixa de ser encontrada, então
+    o corpo nunca é mais velho que o ETag calculado das mesmas versões.
+    """
+
+    def __init__(self, ttl_padrao, max_entradas, dominios=()):
+        self.ttl_padrao = ttl_padrao
+        self.max_entradas = max_entradas
+        self.dominios = dominios
+        self._dados = OrderedDict()  # chave -> (expira_em, fechada, payload)
+        self._geracao = 0
+        self._lock = threading.Lock()
+
+    def obter(self, chave, calcular, ttl=None, fechada=False):
+        chave = (chave, versoes_dos_dominios(self.dominios))
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada and entrada[0] > agora:
+                self._dados.move_to_end(chave)
+                return entrada[2]
+            geracao = self._geracao
+
+        payload = calcular()
+
+        with self._lock:
+            # Se houve escrita enquanto calculávamos, o payload pode estar velho: não guarda
+            if geracao == self._geracao:
+                expira_em = agora + (self.ttl_padrao if ttl is None else ttl)
+                self._dados[chave] = (expira_em, fechada, payload)
+                self._dados.move_to_end(chave)
+                while len(self._dados) > self.max_entradas:
+                    self._dados.popitem(last=False)
+        return payload
+
+    def invalidar(self, incluir_fechadas=False):
+        with self._lock:
+            self._geracao += 1
+            if incluir_fechadas:
+                self._dados.clear()
+            else:
+                for chave in [c for c, (_, fechada, _) in self._dados.items() if not fechada]:
+                    del self._dados[chave]
+
+cache_rankings = CacheRankings(app.config['RANKING_CACHE_TTL'], app.config['RANKING_CACHE_MAX'],
+                               dominios=('alunos', 'registros'))
+
+def segundos_ate_virada_da_semana():
+    """Segundos até o próximo domingo 00:00 local (quando a semana atual fecha)."""
+    proxima_virada = inicio_do_dia_utc(inicio_da_semana(datetime.now(FUSO).date()) + timedelta(days=7))
+    agora_utc = datetime.now(timezone.utc)
+    return max((proxima_virada - agora_utc).total_seconds(), 1)
+
+
+# --- CACHE HTTP (ETAG POR DOMÍNIO) ---
+
+# Tabela -> domínio de dados. Toda escrita nessas tabelas (ORM ou Core via db.session) sobe
+# a versão do domínio no commit; tabelas derivadas (rankings_semanais) ficam de fora.
+DOMINIOS_POR_TABELA = {
+    'alunos': 'alunos',
+    'registros_questoes': 'registros',
+    'registros_diarios': 'registros',
+    'empresas': 'empresas',
+    'simulados': 'simulados',
+    'resultados_simulados': 'resultados',
+}
+
+# Colunas que nenhum payload em cache mostra: mudar só elas (troca de senha, rehash no login)
+# não sobe a versão do domínio. Vale para o ORM; UPDATE em lote marca o domínio de qualquer jeito.
+COLUNAS_FORA_DOS_DOMINIOS = {'alunos': {'senha_hash', 'primeira_vez'}}
+
+# Domínio sem tabela: sobe só quando muda nome, username ou perfil de alguém (ver
+# CacheIdentidades), não a cada escrita em alunos.
+DOMINIO_IDENTIDADES = 'identidades'
+
+# A versão é o maior id do domínio: de tempos em tempos (quando o id novo é múltiplo disto) as
+# linhas mais velhas do domínio são apagadas.
+PODA_MUDANCAS = 256
+
+class VersoesProntas:
+    """Garante (uma vez por processo) que mudancas_dados existe."""
+
+    def __init__(self):
+        self.ok = False
+        self._lock = threading.Lock()
+
+    def garantir(self):
+        if self.ok:
+            return True
+        with self._lock:
+            if self.ok:
+                return True
+            try:
+                # Conexão própria, fora da sessão do request (no SQLite a DDL não pode esperar o lock dela)
+                MudancasDados.__table__.create(db.engine, checkfirst=True)
+                self.ok = True
+            except Exception as e:
+                app.logger.warning(f"mudancas_dados indisponível, ETags desligados: {e}")
+        return self.ok
+
+versoes_prontas = VersoesProntas()
+
+@app.before_request
+def garantir_versoes_dados():
+    versoes_prontas.garantir()
+
+def versoes_dos_dominios(dominios):
+    """Versões atuais dos domínios (na ordem pedida), lidas uma vez por request e guardadas em g."""
+    if not dominios or not versoes_prontas.ok or not has_app_context():
+        return None
+    conhecidas = g.setdefault('versoes_dados', {})
+    faltando = [dominio for dominio in dominios if dominio not in conhecidas]
+    if faltando:
+        lidas = {v.dominio: v.versao for v in ler_versoes(faltando)}
+        conhecidas.update((dominio, lidas.get(dominio, 0)) for dominio in faltando)
+    return tuple(conhecidas.get(dominio) for dominio in dominios)
+
+def ler_versoes(dominios):
+    """(dominio, versao, atualizado_em) dos domínios que já tiveram alguma mudança."""
+    tabela = MudancasDados.__table__
+    return db.session.execute(
+        select(tabela.c.dominio, func.max(tabela.c.id).label('versao'), func.max(tabela.c.em).label('atualizado_em'))
+        .where(tabela.c.dominio.in_(dominios)).group_by(tabela.c.dominio).order_by(tabela.c.dominio)).all()
+
+def subir_versoes(dominios):
+    """Registra uma mudança em cada domínio, numa transação curta e própria.
+
+    Chamar depois do commit dos dados: quem lê a versão nova já enxerga os dados novos. No
+    intervalo entre um e outro, um leitor pode guardar dados novos com a versão velha, o que só
+    custa uma leitura a mais; o contrário (dado velho com versão nova) não acontece.
+    """
+    if not dominios or not versoes_prontas.garantir():
+        return
+    tabela = MudancasDados.__table__
+    agora = datetime.utcnow()
+    try:
+        with db.engine.begin() as conn:
+            for dominio in sorted(dominios):
+                novo_id = conn.execute(tabela.insert().values(dominio=dominio, em=agora)).inserted_primary_key[0]
+                if novo_id % PODA_MUDANCAS == 0:
+                    conn.execute(tabela.delete().where(tabela.c.dominio == dominio, tabela.c.id < novo_id))
+    except Exception as e:
+        app.logger.warning(f"Não foi possível subir as versões de {sorted(dominios)}: {e}")
+    if has_app_context():  # As versões guardadas em g (versoes_dos_dominios) ficaram velhas
+        g.pop('versoes_dados', None)
+
+def _marcar_dominio(sessao, tabela):
+    dominio = DOMINIOS_POR_TABELA.get(getattr(tabela, 'name', None))
+    if dominio:
+        sessao.info.setdefault('dominios_alterados', set()).add(dominio)
+
+def _mudou_coluna_visivel(obj, tabela):
+    ignoradas = COLUNAS_FORA_DOS_DOMINIOS.get(tabela.name, ())
+    return any(atributo.key not in ignoradas and atributo.history.has_changes() for atributo in inspect(obj).attrs)
+
+@event.listens_for(db.session, 'before_flush')
+def _dominios_do_flush(sessao, _contexto, _instancias):
+    for obj in (*sessao.new, *sessao.deleted):
+        _marcar_dominio(sessao, getattr(obj, '__table__', None))
+    for obj in sessao.dirty:
+        tabela = getattr(obj, '__table__', None)
+        if tabela is not None and _mudou_coluna_visivel(obj, tabela):
+            _marcar_dominio(sessao, tabela)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _dominios_do_execute(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        _marcar_dominio(estado.session, estado.statement.table)
+
+@event.listens_for(db.session, 'after_commit')
+def _subir_versoes(sessao):
+    # Depois do commit, fora da transação de quem escreveu: nada fica preso esperando a versão
+    subir_versoes(sessao.info.pop('dominios_alterados', None))
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar_dominios(sessao, _transacao):
+    sessao.info.pop('dominios_alterados', None)
+
+def resposta_condicional(*dominios, por_semana=False, max_age=0):
+    """ETag e Last-Modified a partir das versões dos domínios; `If-None-Match` que bate vira 304
+    sem rodar a view (uma leitura de mudancas_dados no lugar da consulta pesada).
+
+    `por_semana`: o conteúdo também muda na virada de domingo (rankings da semana).
+    `max_age`: segundos que o navegador/proxy pode reusar sem revalidar (0 = sempre revalida).
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not versoes_prontas.ok:
+                return f(*args, **kwargs)
+            versoes = ler_versoes(dominios)
+            lidas = {dominio: 0 for dominio in dominios} | {v.dominio: v.versao for v in versoes}
+            # O cache de rankings usa as mesmas versões na chave: corpo e ETag da mesma leitura
+            g.setdefault('versoes_dados', {}).update(lidas)
+            partes = [request.full_path] + [f'{dominio}:{versao}' for dominio, versao in sorted(lidas.items())]
+            ultima_mudanca = max((v.atualizado_em for v in versoes), default=datetime(2000, 1, 1))
+            if por_semana:
+                inicio_semana = get_start_of_week()
+                partes.append(inicio_semana.isoformat())
+                ultima_mudanca = max(ultima_mudanca, inicio_semana.replace(tzinfo=None))
+            etag = hashlib.sha1('|'.join(partes).encode()).hexdigest()[:20]
+            ultima_mudanca = ultima_mudanca.replace(microsecond=0)
+
+            def preparar(response):
+                response.set_etag(etag)
+                response.last_modified = ultima_mudanca
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+                if not max_age:
+                    response.cache_control.no_cache = True
+                return response
+
+            if request.if_none_match:
+                nao_mudou = request.if_none_match.contains_weak(etag)
+            else:
+                desde = request.if_modified_since
+                nao_mudou = desde is not None and ultima_mudanca <= desde.replace(tzinfo=None)
+            if nao_mudou:
+                return preparar(Response(status=304))
+
+            response = app.make_response(f(*args, **kwargs))
+            return preparar(response) if response.status_code == 200 else response
+        return wrapper
+    return decorator
+
+
+# --- RÉPLICA DE LEITURA ---
+
+def eh_leitura(clause):
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().upper().startswith(('SELECT', 'WITH'))
+    return getattr(clause, 'is_select', False)
+
+class ReplicaLeitura:
+    """Decide, statement a statement, se a sessão lê da réplica (bind 'leitura') ou do primário.
+
+    Vai para a réplica só o SELECT de um GET /api/... . Fica no primário: qualquer escrita e
+    tudo o que vem depois dela no mesmo request, e os requests do navegador que escreveu nos
+    últimos REPLICA_JANELA_ESCRITA segundos (`escrita_em` no cookie de sessão, que vale em
+    qualquer worker). A janela não baixa de JANELA_MINIMA: com 0 quem acabou de escrever não
+    veria a própria escrita. Os outros clientes podem ler da réplica atrasada sem risco para o
+    cache de rankings, que é chaveado pelas versões lidas do mesmo banco que os dados.
+    Réplica fora do ar: tudo vai para o primário e ela é testada de novo a cada
+    REPLICA_VERIFICACAO segundos; a leitura que falhou nela é repetida uma vez no primário.
+    """
+
+    JANELA_MINIMA = 1.0
+
+    def __init__(self, janela, intervalo):
+        self.janela = max(janela, self.JANELA_MINIMA)
+        self.intervalo = intervalo
+        self._ok = False
+        self._verificada_ate = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        return db.engines.get(BIND_LEITURA) if db_read_url else None
+
+    def usar(self, sessao, clause):
+        if self.engine is None or not has_request_context():
+            return False
+        # No flush o get_bind vem sem clause (não é leitura); o before_flush já marcou 'escreveu'
+        if sessao.info.get('escreveu') or not eh_leitura(clause):
+            g.leitura_no_primario = True
+            return False
+        return self.liberada()
+
+    def liberada(self):
+        """Se este request ainda pode ler da réplica (não escreveu, o cliente não está na janela, ela responde)."""
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith('/api/'):
+            return False
+        if g.get('leitura_no_primario'):
+            return False
+        if time.time() - session.get('escrita_em', 0) < self.janela:
+            return False
+        return self.disponivel()
+
+    def disponivel(self):
+        agora = time.monotonic()
+        if agora < self._verificada_ate:
+            return self._ok
+        with self._lock:
+            if agora < self._verificada_ate:
+                return self._ok
+            try:
+                with self.engine.connect() as conexao:
+                    conexao.execute(text('SELECT 1'))
+                if not self._ok:
+                    app.logger.info("Réplica de leitura disponível.")
+                self._ok = True
+            except Exception as e:
+                app.logger.warning(f"Réplica de leitura indisponível, lendo do primário: {e}")
+                self._ok = False
+            self._verificada_ate = agora + self.intervalo
+        return self._ok
+
+    def marcar_indisponivel(self, contexto):
+        """handle_error do engine da réplica: a sessão repete a leitura no primário, e conexão
+        perdida tira a réplica da rota até o próximo teste."""
+        if has_request_context():
+            g.replica_falhou = True
+        if contexto.is_disconnect or contexto.connection is None:
+            self._ok = False
+            self._verificada_ate = time.monotonic() + self.intervalo
+
+replica_leitura = ReplicaLeitura(app.config['REPLICA_JANELA_ESCRITA'], app.config['REPLICA_VERIFICACAO'])
+
+if db_read_url:
+    with app.app_context():
+        event.listen(replica_leitura.engine, 'handle_error', replica_leitura.marcar_indisponivel)
+
+    @app.after_request
+    def marcar_escrita(response):
+        # Quem acabou de escrever lê do primário por alguns segundos (ver ReplicaLeitura)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            session['escrita_em'] = time.time()
+        return response
 
 
 # --- ROTAS DE AUTENTICAÇÃO ---
@@ -186,6 +1380,11 @@ def login():
         if not aluno.check_senha(senha):
             return jsonify({'erro': 'Senha incorreta'}), 401
         
+        # Senha certa e hash mais fraco que o configurado: aproveita a senha em claro para refazer
+        if app.config['SENHA_REHASH_NO_LOGIN'] and aluno.precisa_rehash():
+            aluno.set_senha(senha)
+            db.session.commit()
+        
         # Login bem-sucedido - criar sessão
         session['user_id'] = aluno.id
         session['nome'] = aluno.nome
@@ -221,7 +1420,7 @@ def trocar_senha():
         if nova_senha != confirma_senha:
             return jsonify({'erro': 'As senhas não coincidem'}), 400
         
-        aluno = get_usuario_atual()
+        aluno = db.session.get(Alunos, get_usuario_atual().id)
         aluno.set_senha(nova_senha)
         aluno.primeira_vez = 0
         db.session.commit()
@@ -257,8 +1456,9 @@ def migrar_autenticacao():
         
         # 3. Definir senha padrão para alunos sem senha
         alunos_sem_senha = Alunos.query.filter(Alunos.senha_hash == None).all()
-        for aluno in alunos_sem_senha:
-            aluno.set_senha(DEFAULT_PASSWORD)  # Senha padrão
+        hashes = gerar_hashes_em_lote([DEFAULT_PASSWORD] * len(alunos_sem_senha))  # Senha padrão
+        for aluno, senha_hash in zip(alunos_sem_senha, hashes):
+            aluno.senha_hash = senha_hash
             if aluno.tipo_usuario is None:
                 # João Vithor é o admin
                 if aluno.nome == ADMIN_NAME:
@@ -270,6 +1470,7 @@ def migrar_autenticacao():
                 aluno.primeira_vez = 1
         
         db.session.commit()
+        invalidar_usuario('*')
         
         return f"✅ Migração concluída! {len(alunos_sem_senha)} alunos atualizados com senha padrão '{DEFAULT_PASSWORD}'. {ADMIN_NAME} configurado como admin.", 200
     
@@ -340,15 +1541,11 @@ def migrar_completo():
         alunos_todos = db.session.execute(text("SELECT id, nome, senha_hash FROM alunos")).fetchall()
         senhas_configuradas = 0
         
-        for row in alunos_todos:
-            aluno_id, nome, senha_hash_atual = row
-            
-            # Se já tem senha, pula
-            if senha_hash_atual:
-                continue
-            
-            senha_hash = generate_password_hash(DEFAULT_PASSWORD)
-            
+        # Se já tem senha, pula; os hashes dos demais saem de uma vez do pool de processos
+        alunos_sem_senha = [(aluno_id, nome) for aluno_id, nome, senha_hash_atual in alunos_todos if not senha_hash_atual]
+        hashes = gerar_hashes_em_lote([DEFAULT_PASSWORD] * len(alunos_sem_senha))
+        
+        for (aluno_id, nome), senha_hash in zip(alunos_sem_senha, hashes):
             # João Vithor é admin
             if nome == ADMIN_NAME:
                 db.session.execute(text(
@@ -363,6 +1560,7 @@ def migrar_completo():
             senhas_configuradas += 1
         
         db.session.commit()
+        invalidar_usuario('*')
         
         # Criar índice único em username (PostgreSQL)
         try:
@@ -436,6 +1634,7 @@ def migrar_adicionar_username():
                 db.session.commit()
         
         db.session.commit()
+        invalidar_usuario('*')
         
         msg = f"✅ Migração concluída! {len(alunos_sem_username)} usernames gerados:\n"
         msg += "\n".join(usernames_gerados)
@@ -486,59 +1685,203 @@ def atualizar_time_aluno():
     if not aluno:
         return jsonify({'erro': 'Aluno não encontrado'}), 404
 
+    if aluno.time != dados['time']:
+        descartar_rankings_do_aluno(aluno.id)
     aluno.time = dados['time']
     db.session.commit()
+    cache_rankings.invalidar(incluir_fechadas=True)
+    notificar_mudanca_placar()
     return jsonify({'status': 'sucesso'})
 
 @app.route('/api/batalha/placar', methods=['GET'])
 def get_placar_times():
-        start_date = get_start_of_week()
-        conn = db.session.connection()
-
-        # --- FUNÇÃO AUXILIAR PARA BUSCAR TOTAIS E RANKING ---
-        def buscar_dados_time(nome_time):
-            # 1. Total Geral do Time
-            sql_total = text("""
-                SELECT SUM(r.quantidade_questoes) as total_q, SUM(r.acertos) as total_a 
-                FROM registros_questoes r 
-                JOIN alunos a ON a.id = r.aluno_id 
-                WHERE a.time = :time 
-                AND r.data_registro >= :start_date
-            """)
-            res_total = conn.execute(sql_total, {'time': nome_time, 'start_date': start_date}).first()
-            
-            total_q = res_total.total_q if res_total and res_total.total_q else 0
-            total_a = res_total.total_a if res_total and res_total.total_a else 0
-            precisao = (total_a / total_q * 100) if total_q > 0 else 0
-
-            # 2. Ranking Individual dos Membros
-            sql_ranking = text("""
-                SELECT a.nome, SUM(r.quantidade_questoes) as qtd
-                FROM registros_questoes r
-                JOIN alunos a ON a.id = r.aluno_id
-                WHERE a.time = :time
-                AND r.data_registro >= :start_date
-                GROUP BY a.nome
-                ORDER BY qtd DESC
-            """)
-            res_ranking = conn.execute(sql_ranking, {'time': nome_time, 'start_date': start_date}).mappings().all()
-            
-            lista_membros = [{'nome': row.nome, 'qtd': row.qtd} for row in res_ranking]
-
-            return {
-                'questoes': total_q,
-                'acertos': total_a,
-                'precisao': round(precisao, 2),
-                'ranking': lista_membros # Lista nova incluída aqui
-            }
-
-        return jsonify({
-            'GUI': buscar_dados_time('GUI'),
-            'ENZO': buscar_dados_time('ENZO')
-        })
+    start_of_week = get_start_of_week()
+    payload = cache_rankings.obter(('placar', start_of_week.isoformat()), lambda: calcular_placar_times(start_of_week))
+    return jsonify(payload)
+
+def calcular_placar_times(start_of_week):
+    return calcular_placar_por_time(dia_local(start_of_week))
+
+def calcular_placar_por_time(inicio, fim=None):
+    """Totais e ranking de membros de TODOS os times no período, em uma única consulta.
+
+    `inicio`/`fim` são dias (locais) do rollup; sem `fim` o período vai até hoje.
+    Times sem nenhum registro no período aparecem zerados.
+    """
+    return montar_placar_por_time(db.session.execute(consulta_placar_por_time(inicio, fim)).mappings().all())
+
+def consulta_placar_por_time(inicio, fim=None):
+    filtro_fim = "AND r.dia <= :fim" if fim else ""
+    return text(f"""
+        SELECT a.time, a.nome,
+               COALESCE(SUM(r.quantidade_questoes), 0) as qtd,
+               COALESCE(SUM(r.acertos), 0) as acertos,
+               COUNT(r.id) as dias
+        FROM alunos a
+        LEFT JOIN registros_diarios r ON r.aluno_id = a.id AND r.dia >= :inicio {filtro_fim}
+        WHERE a.time IS NOT NULL AND a.time <> :sem_time
+        GROUP BY a.time, a.id, a.nome
+        ORDER BY a.time, qtd DESC
+    """).bindparams(inicio=inicio, sem_time=SEM_TIME, **({'fim': fim} if fim else {}))
+
+def montar_placar_por_time(linhas):
+    """Payload do placar a partir das linhas de `consulta_placar_por_time`."""
+    times = {}
+    for row in linhas:
+        time_atual = times.setdefault(row.time, {'questoes': 0, 'acertos': 0, 'precisao': 0, 'ranking': []})
+        time_atual['questoes'] += row.qtd
+        time_atual['acertos'] += row.acertos
+        # Só entra no ranking quem registrou algo no período
+        if row.dias:
+            time_atual['ranking'].append({'nome': row.nome, 'qtd': row.qtd})
+
+    for time_atual in times.values():
+        total_q = time_atual['questoes']
+        time_atual['precisao'] = round(time_atual['acertos'] / total_q * 100, 2) if total_q > 0 else 0
+    return times
+
+def definir_vencedor(times):
+    """Nome (com emoji, se houver) do time com mais questões, ou EMPATE."""
+    if not times:
+        return "EMPATE"
+    maior = max(t['questoes'] for t in times.values())
+    lideres = [nome for nome, t in times.items() if t['questoes'] == maior]
+    if len(lideres) > 1:
+        return "EMPATE"
+    return f"{lideres[0]} {EMOJI_TIMES[lideres[0]]}" if lideres[0] in EMOJI_TIMES else lideres[0]
+
+# --- PLACAR AO VIVO (SSE) ---
+# Em vez de cada aba consultar o placar a cada 30s, as rotas de escrita avisam o broker e
+# uma thread por processo recalcula o placar UMA vez e empurra o mesmo snapshot para todas
+# as conexões abertas em /api/batalha/placar/stream.
+# Obs.: cada conexão SSE ocupa uma thread, por isso o número delas por processo é limitado
+# (PLACAR_SSE_MAX_ASSINANTES) e cada uma acaba depois de PLACAR_SSE_DURACAO.
+
+class BrokerPlacar:
+    """Pub/sub em memória do placar (stand-in local, vale só dentro do processo)."""
+
+    def __init__(self):
+        self._assinantes = set()
+        self._lock = threading.Lock()
+        self._mudou = threading.Event()
+        self._thread = None
+
+    def assinar(self, maximo):
+        """Fila que recebe os snapshots, ou None se o processo já tem `maximo` assinantes."""
+        fila = queue.Queue(maxsize=5)
+        with self._lock:
+            if len(self._assinantes) >= maximo:
+                return None
+            self._assinantes.add(fila)
+            if self._thread is None:
+                self._iniciar()
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._assinantes.discard(fila)
+
+    def publicar(self):
+        """Avisa que o placar mudou. Chamar depois do commit."""
+        self._mudou.set()
+
+    def distribuir(self, mensagem):
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for fila in assinantes:
+            try:
+                fila.put_nowait(mensagem)
+            except queue.Full:
+                # Cliente lento: descarta o snapshot mais antigo, só o último importa
+                try:
+                    fila.get_nowait()
+                except queue.Empty:
+                    pass
+                fila.put_nowait(mensagem)
+
+    def _iniciar(self):
+        self._thread = threading.Thread(target=self._loop_despacho, name='placar-despacho', daemon=True)
+        self._thread.start()
+
+    def _loop_despacho(self):
+        while True:
+            # Acorda também na virada da semana, quando o placar zera sem nenhuma escrita
+            self._mudou.wait(timeout=segundos_ate_virada_da_semana())
+            self._mudou.clear()
+            with self._lock:
+                if not self._assinantes:
+                    continue
+            try:
+                with app.app_context():
+                    payload = calcular_placar_times(get_start_of_week())
+                    mensagem = app.json.dumps(payload)
+            except Exception as e:
+                print(f"Aviso ao calcular placar ao vivo: {e}")
+                continue
+            self.distribuir(mensagem)
+
+class BrokerPlacarPostgres(BrokerPlacar):
+    """Mesmo broker, mas o aviso passa por NOTIFY para chegar em todos os workers."""
+
+    CANAL = 'placar_times'
+
+    def publicar(self):
+        ouvinte_postgres.notificar(self.CANAL)
+
+    def _iniciar(self):
+        super()._iniciar()
+        ouvinte_postgres.iniciar()
+
+    def ao_notificar(self, _payload):
+        # Outro worker escreveu: o cache local de rankings também ficou velho
+        cache_rankings.invalidar(incluir_fechadas=True)
+        self._mudou.set()
+
+broker_placar = BrokerPlacarPostgres() if app.config['PLACAR_BROKER'] == 'postgres' else BrokerPlacar()
+if isinstance(broker_placar, BrokerPlacarPostgres):
+    ouvinte_postgres.registrar(BrokerPlacarPostgres.CANAL, broker_placar.ao_notificar)
+
+def notificar_mudanca_placar():
+    """Chamada pelas rotas de escrita, depois do commit. Falha no aviso não derruba a escrita."""
+    try:
+        broker_placar.publicar()
+    except Exception as e:
+        print(f"Aviso ao notificar placar: {e}")
+
+@app.route('/api/batalha/placar/stream', methods=['GET'])
+def stream_placar_times():
+    start_of_week = get_start_of_week()
+    inicial = app.json.dumps(cache_rankings.obter(('placar', start_of_week.isoformat()), lambda: calcular_placar_times(start_of_week)))
+    heartbeat = app.config['PLACAR_SSE_HEARTBEAT']
+    db.session.remove()  # Não segura conexão do pool enquanto o stream fica aberto
+    fila = broker_placar.assinar(app.config['PLACAR_SSE_MAX_ASSINANTES'])
+    if fila is None:
+        # Sem thread sobrando para mais um stream: o EventSource desiste e a página faz polling
+        return (jsonify({'erro': 'Placar ao vivo lotado, use /api/batalha/placar.'}), 503,
+                {'Retry-After': str(app.config['PLACAR_SSE_DURACAO'])})
+    fim = time.monotonic() + app.config['PLACAR_SSE_DURACAO']
+
+    def eventos():
+        yield 'retry: 5000\n\n'
+        yield f'event: placar\ndata: {inicial}\n\n'
+        # Fecha depois de PLACAR_SSE_DURACAO: o navegador reconecta e a thread volta para o pool
+        while (restante := fim - time.monotonic()) > 0:
+            try:
+                mensagem = fila.get(timeout=min(heartbeat, restante))
+            except queue.Empty:
+                yield ': ping\n\n'  # Mantém a conexão viva em proxies
+                continue
+            yield f'event: placar\ndata: {mensagem}\n\n'
+
+    resposta = Response(eventos(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Libera a vaga mesmo se o cliente cair antes do gerador começar
+    resposta.call_on_close(lambda: broker_placar.cancelar(fila))
+    return resposta
 
 # Atualize a API de alunos para retornar o time atual também
 @app.route('/api/alunos-com-time', methods=['GET'])
+@resposta_condicional('alunos')
 def get_alunos_com_time():
     alunos = Alunos.query.order_by(Alunos.nome).all()
     return jsonify([{'id': a.id, 'nome': a.nome, 'username': a.username, 'time': a.time} for a in alunos])
@@ -562,6 +1905,36 @@ def migrar_times():
              return "A coluna 'time' já existe, tudo certo.", 200
         return f"Erro ao adicionar coluna: {e}", 500
     
+TABELAS_INDEXADAS = (RegistrosQuestoes.__table__, RegistrosDiarios.__table__, ResultadosSimulados.__table__)
+
+def criar_indices_desempenho():
+    """Cria (se faltarem) os índices declarados em TABELAS_INDEXADAS."""
+    criados = []
+    for tabela in TABELAS_INDEXADAS:
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            indice.create(db.engine, checkfirst=True)
+            criados.append(indice.name)
+    return criados
+
+@app.route('/_migrar_indices')
+def migrar_indices():
+    """Cria os índices compostos e a restrição única (aluno, simulado) em bancos já existentes."""
+    try:
+        duplicados = db.session.execute(text(
+            "SELECT aluno_id, simulado_id, COUNT(*) FROM resultados_simulados "
+            "GROUP BY aluno_id, simulado_id HAVING COUNT(*) > 1"
+        )).fetchall()
+        if duplicados:
+            lista = ", ".join(f"aluno {a} / simulado {s} ({n}x)" for a, s, n in duplicados)
+            return f"❌ Existem notas duplicadas, apague-as antes de criar o índice único: {lista}", 409
+        db.session.commit()
+
+        criados = criar_indices_desempenho()
+        return "<br>".join(["✅ Índices verificados/criados:"] + [f"  • {nome}" for nome in criados]), 200
+    except Exception as e:
+        db.session.rollback()
+        return f"❌ Erro na migração: {e}", 500
+
 # --- ROTAS DE GERENCIAMENTO DE ALUNOS ---
 
 @app.route('/gerenciar-alunos')
@@ -575,7 +1948,7 @@ def criar_aluno():
     dados = request.get_json()
     nome = dados.get('nome', '').strip()
     username = dados.get('username', '').strip().lower()
-    time = dados.get('time', 'Sem Time')
+    time = dados.get('time', SEM_TIME)
     
     if not nome:
         return jsonify({'erro': 'Nome é obrigatório'}), 400
@@ -602,6 +1975,7 @@ def editar_aluno(id):
     novo_nome = dados.get('nome', '').strip()
     novo_username = dados.get('username', '').strip().lower()
     novo_time = dados.get('time')
+    nome_e_time_antes = (aluno.nome, aluno.time)
 
     if novo_nome:
         aluno.nome = novo_nome
@@ -616,7 +1990,12 @@ def editar_aluno(id):
     if novo_time:
         aluno.time = novo_time
 
+    if (aluno.nome, aluno.time) != nome_e_time_antes:
+        descartar_rankings_do_aluno(id)
     db.session.commit()
+    invalidar_usuario(id)
+    cache_rankings.invalidar(incluir_fechadas=True)
+    notificar_mudanca_placar()
     return jsonify({'status': 'sucesso', 'mensagem': 'Dados atualizados!'})
 
 @app.route('/api/alunos/<int:id>', methods=['DELETE'])
@@ -627,11 +2006,18 @@ def deletar_aluno(id):
         # Nota: Se houver registros vinculados (questões/simulados), 
         # o banco pode bloquear ou apagar em cascata dependendo da configuração.
         # Aqui vamos deletar os registros filhos manualmente para garantir limpeza
+        descartar_rankings_do_aluno(id)
         RegistrosQuestoes.query.filter_by(aluno_id=id).delete()
+        RegistrosDiarios.query.filter_by(aluno_id=id).delete()
+        simulados_do_aluno = [s for (s,) in db.session.query(ResultadosSimulados.simulado_id).filter_by(aluno_id=id)]
         ResultadosSimulados.query.filter_by(aluno_id=id).delete()
+        recalcular_estatisticas_simulados(simulados_do_aluno)
         
         db.session.delete(aluno)
         db.session.commit()
+        invalidar_usuario(id)
+        cache_rankings.invalidar(incluir_fechadas=True)
+        notificar_mudanca_placar()
         return jsonify({'status': 'sucesso', 'mensagem': 'Aluno e histórico apagados.'})
     except Exception as e:
         db.session.rollback()
@@ -639,6 +2025,7 @@ def deletar_aluno(id):
     
 
 @app.route('/api/alunos', methods=['GET'])
+@resposta_condicional('alunos')
 def get_alunos():
     alunos = Alunos.query.order_by(Alunos.nome).all()
     return jsonify([{'id': aluno.id, 'nome': aluno.nome} for aluno in alunos])
@@ -658,14 +2045,160 @@ def add_registro():
     if usuario_atual.tipo_usuario != 'admin' and aluno_id != usuario_atual.id:
         return jsonify({'erro': 'Você só pode registrar suas próprias questões'}), 403
     
-    novo_registro = RegistrosQuestoes(aluno_id=aluno_id, quantidade_questoes=dados['quantidade'], acertos=dados['acertos'])
+    agora = datetime.utcnow()
+    novo_registro = RegistrosQuestoes(aluno_id=aluno_id, quantidade_questoes=dados['quantidade'], acertos=dados['acertos'], data_registro=agora, data_local=dia_local(agora))
     db.session.add(novo_registro)
+    atualizar_rollup_diario(aluno_id, novo_registro.data_local, int(dados['quantidade']), int(dados['acertos']))
     db.session.commit()
+    cache_rankings.invalidar()  # Registro novo é sempre da semana atual
+    notificar_mudanca_placar()
     return jsonify({'status': 'sucesso'}), 201
 
+def ler_linhas_bulk(chave='registros'):
+    """Linhas do upload em massa: JSON (lista ou {chave: [...]}) ou CSV (arquivo ou corpo text/csv).
+
+    O CSV pode vir com vírgula, ponto e vírgula ou tab (colado de planilha): o separador
+    é o que aparecer no cabeçalho.
+    """
+    if request.is_json:
+        dados = request.get_json()
+        return dados.get(chave, []) if isinstance(dados, dict) else dados
+    arquivo = request.files.get('arquivo')
+    conteudo = arquivo.read().decode('utf-8-sig') if arquivo else request.get_data(as_text=True)
+    cabecalho = conteudo.lstrip().split('\n', 1)[0]
+    separador = next((s for s in ('\t', ';') if s in cabecalho), ',')
+    return list(csv.DictReader(io.StringIO(conteudo.strip()), delimiter=separador))
+
+def receber_linhas_bulk(chave, origem, vazio, plural):
+    """(linhas, None) do upload, ou (None, resposta de erro) se não deu para ler, veio vazio ou
+    passou de MAX_LINHAS_BULK. `origem`, `vazio` e `plural` só mudam o texto das mensagens."""
+    try:
+        linhas = ler_linhas_bulk(chave)
+    except Exception as e:
+        return None, (jsonify({'erro': f'Não foi possível ler {origem}: {e}'}), 400)
+    if not isinstance(linhas, list) or not linhas:
+        return None, (jsonify({'erro': vazio}), 400)
+    if len(linhas) > MAX_LINHAS_BULK:
+        return None, (jsonify({'erro': f'Máximo de {MAX_LINHAS_BULK} {plural} por envio.'}), 413)
+    return linhas, None
+
+def resolver_alunos_citados(linhas):
+    """Alunos citados nas linhas (por `aluno_id` ou `username`), numa consulta só.
+
+    Devolve (ids que existem, {username: id}) para `aluno_da_linha`.
+    """
+    ids_citados, usernames_citados = set(), set()
+    for linha in linhas:
+        if isinstance(linha, dict):
+            if str(linha.get('aluno_id') or '').strip().isdigit():
+                ids_citados.add(int(linha['aluno_id']))
+            elif linha.get('username'):
+                usernames_citados.add(str(linha['username']).strip().lower())
+    alunos = Alunos.query.with_entities(Alunos.id, Alunos.username).filter(
+        Alunos.id.in_(ids_citados) | Alunos.username.in_(usernames_citados)).all() if (ids_citados or usernames_citados) else []
+    return {a.id for a in alunos}, {a.username: a.id for a in alunos if a.username}
+
+def aluno_da_linha(linha, por_username, padrao=None):
+    """Id do aluno de uma linha: `aluno_id`, senão `username`, senão `padrao` (None = obrigatório)."""
+    if str(linha.get('aluno_id') or '').strip():
+        return int(linha['aluno_id'])
+    if linha.get('username'):
+        return por_username.get(str(linha['username']).strip().lower())
+    if padrao is None:
+        raise ValueError('informe aluno_id ou username')
+    return padrao
+
+def interpretar_data_registro(valor, agora):
+    """'AAAA-MM-DD' (vira meio-dia local) ou 'AAAA-MM-DDTHH:MM[:SS]' no horário local; vazio = agora."""
+    if not valor:
+        return agora
+    valor = str(valor).strip()
+    if len(valor) == 10:
+        data_local = datetime.strptime(valor, '%Y-%m-%d').replace(hour=12)
+    else:
+        data_local = datetime.fromisoformat(valor).replace(tzinfo=None)
+    data_utc = local_para_utc(data_local)
+    if data_utc > agora + timedelta(minutes=5):
+        raise ValueError('data no futuro')
+    return data_utc
+
+@app.route('/api/registros/bulk', methods=['POST'])
+@login_required
+def add_registros_bulk():
+    """Importa muitos registros numa transação só. Com ?parcial=1 grava as linhas válidas
+    mesmo que outras tenham erro; sem ele, qualquer erro cancela tudo."""
+    linhas, erro = receber_linhas_bulk('registros', 'o arquivo', 'Nenhum registro enviado.', 'registros')
+    if erro:
+        return erro
+    parcial = request.args.get('parcial') == '1'
+
+    # Permissão verificada uma vez: aluno só importa para si mesmo
+    usuario_atual = get_usuario_atual()
+    eh_admin = usuario_atual.tipo_usuario == 'admin'
+
+    ids_validos, por_username = resolver_alunos_citados(linhas)
+
+    agora = datetime.utcnow()
+    validos, erros = [], []
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            if not isinstance(linha, dict):
+                raise ValueError('linha deve ser um objeto')
+            aluno_id = aluno_da_linha(linha, por_username, padrao=usuario_atual.id)
+            if aluno_id not in ids_validos and aluno_id != usuario_atual.id:
+                raise ValueError('aluno não encontrado')
+            if not eh_admin and aluno_id != usuario_atual.id:
+                raise ValueError('você só pode registrar suas próprias questões')
+            quantidade = int(linha.get('quantidade', linha.get('quantidade_questoes')))
+            acertos = int(linha.get('acertos'))
+            if quantidade < 0 or acertos < 0:
+                raise ValueError('valores não podem ser negativos')
+            if acertos > quantidade:
+                raise ValueError('acertos maior que a quantidade de questões')
+            data_registro = interpretar_data_registro(linha.get('data') or linha.get('data_registro'), agora)
+        except (TypeError, ValueError) as e:
+            erros.append({'linha': numero, 'erro': str(e) or 'valor inválido'})
+            continue
+        validos.append({'aluno_id': aluno_id, 'quantidade_questoes': quantidade, 'acertos': acertos,
+                        'data_registro': data_registro, 'data_local': dia_local(data_registro)})
+
+    if erros and not parcial:
+        return jsonify({'status': 'erro', 'inseridos': 0, 'erros': erros}), 400
+
+    if validos:
+        totais = {}
+        for r in validos:
+            atual = totais.setdefault((r['aluno_id'], r['data_local']), [0, 0, 0])
+            atual[0] += r['quantidade_questoes']
+            atual[1] += r['acertos']
+            atual[2] += 1
+        try:
+            db.session.execute(RegistrosQuestoes.__table__.insert(), validos)
+            somar_no_rollup(totais)
+            descartar_rankings_arquivados(dia for _, dia in totais)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'erro': f'Erro ao gravar os registros: {e}'}), 500
+        cache_rankings.invalidar(incluir_fechadas=True)
+        notificar_mudanca_placar()
+
+    return jsonify({'status': 'sucesso', 'inseridos': len(validos), 'erros': erros}), 201 if validos else 200
+
+def parametros_paginacao(limite_padrao, limite_maximo=100):
+    """Lê `limit` e `before_id` (paginação por chave: só ids menores que before_id)."""
+    limite = request.args.get('limit', limite_padrao, type=int)
+    limite = max(1, min(limite, limite_maximo))
+    before_id = request.args.get('before_id', type=int)
+    return limite, before_id
+
 @app.route('/api/registros/recentes', methods=['GET'])
 def get_registros_recentes():
-    registros = RegistrosQuestoes.query.order_by(RegistrosQuestoes.id.desc()).limit(10).all()
+    limite, before_id = parametros_paginacao(10)
+    consulta = RegistrosQuestoes.query.options(joinedload(RegistrosQuestoes.aluno))
+    if before_id:
+        consulta = consulta.filter(RegistrosQuestoes.id < before_id)
+    registros = consulta.order_by(RegistrosQuestoes.id.desc()).limit(limite).all()
     lista_registros = [{'id': r.id, 'aluno_id': r.aluno_id, 'aluno_nome': r.aluno.nome, 'questoes': r.quantidade_questoes, 'acertos': r.acertos} for r in registros]
     return jsonify(lista_registros)
 
@@ -679,80 +2212,276 @@ def delete_registro(registro_id):
     if usuario_atual.tipo_usuario != 'admin' and registro.aluno_id != usuario_atual.id:
         return jsonify({'erro': 'Você só pode apagar seus próprios registros'}), 403
     
+    dia = registro.data_local or dia_local(registro.data_registro)
+    atualizar_rollup_diario(registro.aluno_id, dia, -registro.quantidade_questoes, -registro.acertos, registros=-1)
+    descartar_rankings_arquivados([dia])
     db.session.delete(registro)
     db.session.commit()
+    cache_rankings.invalidar(incluir_fechadas=True)
+    notificar_mudanca_placar()
     return jsonify({'status': 'sucesso', 'mensagem': 'Registro apagado.'})
 
+# --- RANKINGS (funções de janela) ---
+
+# Uma passada só: agrega por aluno (a.id, não a.nome, para não fundir homônimos) e numera com
+# RANK/DENSE_RANK. O percentual é arredondado a 2 casas antes de ranquear, que é a precisão
+# exibida: quem aparece com o mesmo número fica empatado. Só entra no ranking de percentual
+# quem passou do mínimo de questões (a partição pelo IS NULL deixa os outros de fora).
+SQL_RANKING_ALUNOS = """
+WITH totais AS (
+    SELECT a.id, a.nome, SUM(r.quantidade_questoes) AS total, SUM(r.acertos) AS acertos
+    FROM registros_diarios r JOIN alunos a ON a.id = r.aluno_id
+    WHERE {filtro}
+    GROUP BY a.id, a.nome
+), base AS (
+    SELECT id, nome, total,
+           CASE WHEN total > :minimo_percentual THEN ROUND(acertos * 100.0 / total, 2) END AS percentual
+    FROM totais
+)
+SELECT id, nome, total, percentual,
+       RANK() OVER (ORDER BY total DESC) AS posicao_qtd,
+       DENSE_RANK() OVER (ORDER BY total DESC) AS posicao_densa_qtd,
+       COUNT(*) OVER (PARTITION BY total) AS empatados_qtd,
+       RANK() OVER (PARTITION BY percentual IS NULL ORDER BY percentual DESC) AS posicao_perc,
+       DENSE_RANK() OVER (PARTITION BY percentual IS NULL ORDER BY percentual DESC) AS posicao_densa_perc,
+       COUNT(*) OVER (PARTITION BY percentual) AS empatados_perc
+FROM base
+"""
+
+def calcular_ranking_alunos(inicio=None, fim=None, minimo_percentual=0):
+    """Rankings de quantidade e de percentual de um período (dias locais, fim inclusivo).
+
+    Cada item traz id, nome, o valor, `posicao` (RANK: 1, 1, 3), `posicao_densa` (DENSE_RANK:
+    1, 1, 2) e `empatado`. As listas vêm completas e ordenadas; quem quiser um top N corta
+    com `cortar_rankings`.
+    """
+    return montar_ranking_alunos(db.session.execute(consulta_ranking_alunos(inicio, fim, minimo_percentual)).mappings().all())
+
+def consulta_ranking_alunos(inicio=None, fim=None, minimo_percentual=0):
+    filtros, params = ['1 = 1'], {'minimo_percentual': minimo_percentual}
+    if inicio is not None:
+        filtros.append('r.dia >= :inicio')
+        params['inicio'] = inicio
+    if fim is not None:
+        filtros.append('r.dia <= :fim')
+        params['fim'] = fim
+    return text(SQL_RANKING_ALUNOS.format(filtro=' AND '.join(filtros))).bindparams(**params)
+
+def montar_ranking_alunos(linhas):
+    """Listas de quantidade e de percentual a partir das linhas de SQL_RANKING_ALUNOS."""
+    quantidade, percentual = [], []
+    for l in linhas:
+        quantidade.append({'id': l['id'], 'nome': l['nome'], 'total': int(l['total']),
+                           'posicao': l['posicao_qtd'], 'posicao_densa': l['posicao_densa_qtd'],
+                           'empatado': l['empatados_qtd'] > 1})
+        if l['percentual'] is not None:
+            percentual.append({'id': l['id'], 'nome': l['nome'], 'percentual': float(l['percentual']),
+                               'total': int(l['total']),
+                               'posicao': l['posicao_perc'], 'posicao_densa': l['posicao_densa_perc'],
+                               'empatado': l['empatados_perc'] > 1})
+    quantidade.sort(key=lambda i: (i['posicao'], i['nome']))
+    percentual.sort(key=lambda i: (i['posicao'], i['nome']))
+    return {'quantidade': quantidade, 'percentual': percentual}
+
+def cortar_rankings(payload, limite):
+    """Top `limite` por posição: empatados na última posição entram todos."""
+    return {**payload,
+            'quantidade': [i for i in payload['quantidade'] if i['posicao'] <= limite],
+            'percentual': [i for i in payload['percentual'] if i['posicao'] <= limite]}
+
+def obter_rankings_semana(start_of_week):
+    return cache_rankings.obter(('semana', start_of_week.isoformat()),
+                                lambda: calcular_rankings_semana(start_of_week))
+
+def obter_rankings_gerais():
+    return cache_rankings.obter(('geral',), calcular_rankings_gerais)
+
 @app.route('/api/rankings', methods=['GET'])
+@resposta_condicional('registros', 'alunos', por_semana=True)
 def get_rankings():
-    start_of_week = get_start_of_week()
-    conn = db.session.connection()
-    params = {'start_date': start_of_week}
-    query_qtd = text('SELECT a.nome, SUM(r.quantidade_questoes) as total FROM registros_questoes r JOIN alunos a ON a.id = r.aluno_id WHERE r.data_registro >= :start_date GROUP BY a.nome ORDER BY total DESC LIMIT 10')
-    ranking_quantidade = conn.execute(query_qtd, params).mappings().all()
-    query_perc = text('SELECT a.nome, (SUM(r.acertos) * 100.0 / SUM(r.quantidade_questoes)) as percentual FROM registros_questoes r JOIN alunos a ON a.id = r.aluno_id WHERE r.data_registro >= :start_date GROUP BY a.nome HAVING SUM(r.quantidade_questoes) > 20 ORDER BY percentual DESC LIMIT 10')
-    ranking_percentual = conn.execute(query_perc, params).mappings().all()
-    return jsonify({'quantidade': [dict(row) for row in ranking_quantidade], 'percentual': [dict(row) for row in ranking_percentual]})
+    return jsonify(cortar_rankings(obter_rankings_semana(get_start_of_week()), 10))
+
+def calcular_rankings_semana(start_of_week):
+    return montar_ranking_alunos(db.session.execute(consulta_rankings_semana(start_of_week)).mappings().all())
+
+def consulta_rankings_semana(start_of_week):
+    return consulta_ranking_alunos(inicio=dia_local(start_of_week), minimo_percentual=20)
 
 @app.route('/api/rankings/geral', methods=['GET'])
+@resposta_condicional('registros', 'alunos')
 def get_rankings_gerais():
-    conn = db.session.connection()
-    query_qtd = text('SELECT a.nome, SUM(r.quantidade_questoes) as total FROM registros_questoes r JOIN alunos a ON a.id = r.aluno_id GROUP BY a.nome ORDER BY total DESC')
-    ranking_quantidade = conn.execute(query_qtd).mappings().all()
-    query_perc = text('SELECT a.nome, (SUM(r.acertos) * 100.0 / SUM(r.quantidade_questoes)) as percentual FROM registros_questoes r JOIN alunos a ON a.id = r.aluno_id GROUP BY a.nome HAVING SUM(r.quantidade_questoes) > 0 ORDER BY percentual DESC')
-    ranking_percentual = conn.execute(query_perc).mappings().all()
-    return jsonify({'quantidade': [dict(row) for row in ranking_quantidade], 'percentual': [dict(row) for row in ranking_percentual]})
+    return jsonify(obter_rankings_gerais())
+
+def calcular_rankings_gerais():
+    return calcular_ranking_alunos()
+
+@app.route('/api/rankings/me', methods=['GET'])
+@login_required
+def get_minha_posicao():
+    """Posição do aluno logado e os vizinhos de cada lado, sem mandar o ranking inteiro.
+
+    ?periodo=geral (padrão) | semana; ?vizinhos=N (padrão 2, máx. 10). Usa o mesmo ranking
+    em cache das rotas públicas, então não custa consulta extra na maioria das vezes.
+    """
+    periodo = request.args.get('periodo', 'geral')
+    if periodo not in ('geral', 'semana'):
+        return jsonify({'erro': 'periodo deve ser "geral" ou "semana".'}), 400
+    try:
+        vizinhos = min(max(int(request.args.get('vizinhos', 2)), 0), 10)
+    except ValueError:
+        return jsonify({'erro': 'vizinhos deve ser um número inteiro.'}), 400
+
+    usuario = get_usuario_atual()
+    payload = obter_rankings_semana(get_start_of_week()) if periodo == 'semana' else obter_rankings_gerais()
+
+    def recortar(lista):
+        indice = next((i for i, item in enumerate(lista) if item['id'] == usuario.id), None)
+        if indice is None:
+            return {'posicao': None, 'participantes': len(lista), 'vizinhos': []}
+        eu = lista[indice]
+        return {**eu, 'participantes': len(lista),
+                'vizinhos': lista[max(indice - vizinhos, 0):indice + vizinhos + 1]}
+
+    return jsonify({'periodo': periodo,
+                    'quantidade': recortar(payload['quantidade']),
+                    'percentual': recortar(payload['percentual'])})
 
 @app.route('/api/rankings/semana-passada', methods=['GET'])
+@resposta_condicional('registros', 'alunos', por_semana=True)
 def get_rankings_semana_passada():
-    # 1. Definição das datas
+    # A semana passada já fechou: o resultado só muda se um registro antigo for apagado
+    # ou um aluno editado, então fica em cache até a próxima virada de domingo.
     start_of_current_week = get_start_of_week()
-    end_of_last_week = start_of_current_week - timedelta(seconds=1)
-    start_of_last_week = start_of_current_week - timedelta(days=7)
-    
-    conn = db.session.connection()
-    params = {'start': start_of_last_week, 'end': end_of_last_week}
-    
-    # 2. Consultas (MANTIDAS IGUAIS)
-    query_qtd = text('SELECT a.nome, SUM(r.quantidade_questoes) as total FROM registros_questoes r JOIN alunos a ON a.id = r.aluno_id WHERE r.data_registro BETWEEN :start AND :end GROUP BY a.nome ORDER BY total DESC')
-    ranking_quantidade = conn.execute(query_qtd, params).mappings().all()
-    
-    query_perc = text('SELECT a.nome, (SUM(r.acertos) * 100.0 / SUM(r.quantidade_questoes)) as percentual FROM registros_questoes r JOIN alunos a ON a.id = r.aluno_id WHERE r.data_registro BETWEEN :start AND :end GROUP BY a.nome HAVING SUM(r.quantidade_questoes) > 20 ORDER BY percentual DESC')
-    ranking_percentual = conn.execute(query_perc, params).mappings().all()
-
-    # 3. Batalha de Times (MANTIDA IGUAL)
-    def calcular_time(nome_time):
-        sql = text("""
-            SELECT SUM(r.quantidade_questoes) as total_q, SUM(r.acertos) as total_a 
-            FROM registros_questoes r 
-            JOIN alunos a ON a.id = r.aluno_id 
-            WHERE a.time = :time AND r.data_registro BETWEEN :start AND :end
-        """)
-        params_time = params.copy()
-        params_time['time'] = nome_time
-        res = conn.execute(sql, params_time).first()
-        total_q = res.total_q if res and res.total_q else 0
-        total_a = res.total_a if res and res.total_a else 0
-        precisao = (total_a / total_q * 100) if total_q > 0 else 0
-        return {'questoes': total_q, 'precisao': round(precisao, 2)}
-
-    gui = calcular_time('GUI')
-    enzo = calcular_time('ENZO')
-
-    vencedor = "EMPATE"
-    if gui['questoes'] > enzo['questoes']: vencedor = "GUI 🔵"
-    elif enzo['questoes'] > gui['questoes']: vencedor = "ENZO 🔴"
-
-    return jsonify({
-        'quantidade': [dict(row) for row in ranking_quantidade], 
-        'percentual': [dict(row) for row in ranking_percentual],
-        'batalha': {'GUI': gui, 'ENZO': enzo, 'vencedor': vencedor},
-        # --- NOVO: Envia as datas formatadas ---
+    inicio = dia_local(start_of_current_week) - timedelta(days=7)
+    payload = cache_rankings.obter(('semana_passada', start_of_current_week.isoformat()),
+                                   lambda: obter_ranking_arquivado(inicio),
+                                   ttl=segundos_ate_virada_da_semana(), fechada=True)
+    return jsonify(payload)
+
+def consultas_semana_fechada(inicio):
+    """Rankings (mesma consulta com janela das outras rotas) e Batalha de Times (todos os times em
+    uma consulta) da semana que começa no domingo `inicio`: independentes entre si."""
+    fim = inicio + timedelta(days=6)
+    return consulta_ranking_alunos(inicio, fim, minimo_percentual=20), consulta_placar_por_time(inicio, fim)
+
+def montar_semana_fechada(inicio, linhas_ranking, linhas_placar):
+    """Payload da semana fechada (o que vai para rankings_semanais) a partir de `consultas_semana_fechada`."""
+    rankings = montar_ranking_alunos(linhas_ranking)
+    times = montar_placar_por_time(linhas_placar)
+    # Os times ficam aninhados: um time chamado "vencedor" não pode sobrescrever o resultado
+    batalha = {'times': {nome: {'questoes': t['questoes'], 'precisao': t['precisao']} for nome, t in times.items()},
+               'vencedor': definir_vencedor(times)}
+
+    return {
+        'quantidade': rankings['quantidade'],
+        'percentual': rankings['percentual'],
+        'batalha': batalha,
+        # --- NOVO: Envia as datas formatadas (dias locais: domingo a sábado) ---
         'periodo': {
-            'inicio': start_of_last_week.strftime(DATE_FORMAT),
-            'fim': end_of_last_week.strftime(DATE_FORMAT)
-        }
-    })
+            'inicio': inicio.strftime(DATE_FORMAT),
+            'fim': (inicio + timedelta(days=6)).strftime(DATE_FORMAT)
+        },
+        'semana': semana_iso(inicio),
+    }
+
+# --- ARQUIVO DE RANKINGS SEMANAIS ---
+
+def obter_ranking_arquivado(inicio):
+    """Ranking da semana fechada que começa no domingo `inicio`, lido de rankings_semanais.
+
+    Se a semana ainda não foi arquivada, calcula e grava (a primeira consulta depois da
+    virada faz o trabalho; as seguintes são uma busca pelo índice). Semana sem registros
+    não é gravada, para não encher a tabela com semanas vazias.
+    """
+    arquivado = RankingsSemanais.query.filter_by(semana_inicio=inicio).first()
+    if arquivado:
+        return arquivado.payload
+    payload = calcular_ranking_semana_fechada(inicio)
+    if payload['quantidade']:
+        db.session.add(RankingsSemanais(semana_inicio=inicio, vencedor=payload['batalha']['vencedor'], payload=payload))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Outro worker arquivou a mesma semana ao mesmo tempo
+    return payload
+
+def calcular_ranking_semana_fechada(inicio):
+    return montar_semana_fechada(inicio, *(db.session.execute(c).mappings().all() for c in consultas_semana_fechada(inicio)))
+
+def descartar_rankings_arquivados(dias):
+    """Apaga o arquivo das semanas que contêm `dias` (registro apagado ou importado com data antiga).
+
+    A semana é recalculada na próxima consulta. Não faz commit.
+    """
+    semanas = {inicio_da_semana(dia) for dia in dias}
+    if semanas:
+        RankingsSemanais.query.filter(RankingsSemanais.semana_inicio.in_(semanas)).delete(synchronize_session=False)
+
+def descartar_rankings_do_aluno(aluno_id):
+    """Apaga o arquivo das semanas em que o aluno tem registros: o payload guarda nome e time
+    dele, então exclusão, renomeação e troca de time mudam essas semanas. Não faz commit."""
+    descartar_rankings_arquivados(dia for (dia,) in db.session.query(RegistrosDiarios.dia).filter_by(aluno_id=aluno_id))
+
+def arquivar_semanas_fechadas(refazer=False):
+    """Arquiva todas as semanas fechadas com registros que ainda não estão na tabela. Não faz commit."""
+    primeiro_dia = db.session.query(func.min(RegistrosDiarios.dia)).scalar()
+    if primeiro_dia is None:
+        return 0
+    if refazer:
+        db.session.execute(RankingsSemanais.__table__.delete())
+    ja_arquivadas = {s for (s,) in db.session.query(RankingsSemanais.semana_inicio)}
+    semana_atual = dia_local(get_start_of_week())
+    inicio, arquivadas = inicio_da_semana(primeiro_dia), 0
+    while inicio < semana_atual:
+        if inicio not in ja_arquivadas:
+            payload = calcular_ranking_semana_fechada(inicio)
+            if payload['quantidade']:
+                db.session.add(RankingsSemanais(semana_inicio=inicio, vencedor=payload['batalha']['vencedor'], payload=payload))
+                arquivadas += 1
+        inicio += timedelta(days=7)
+    return arquivadas
+
+@app.cli.command('arquivar-rankings')
+@click.option('--refazer', is_flag=True, help='Apaga o arquivo e recalcula todas as semanas.')
+def arquivar_rankings_cli(refazer):
+    """Preenche rankings_semanais com todas as semanas fechadas do histórico."""
+    db.create_all()
+    versoes_prontas.garantir()
+    arquivadas = arquivar_semanas_fechadas(refazer)
+    if refazer:  # O arquivo não é um domínio próprio: quem o serve versiona por 'registros'
+        db.session.info.setdefault('dominios_alterados', set()).add('registros')
+    db.session.commit()
+    print(f"Semanas arquivadas: {arquivadas}.")
+
+@app.route('/_migrar_rankings_semanais')
+def migrar_rankings_semanais():
+    """Cria a tabela rankings_semanais (se faltar) e arquiva as semanas fechadas."""
+    try:
+        RankingsSemanais.__table__.create(db.engine, checkfirst=True)
+        arquivadas = arquivar_semanas_fechadas()
+        db.session.commit()
+        return f"✅ Rankings semanais arquivados: {arquivadas} semana(s).", 200
+    except Exception as e:
+        db.session.rollback()
+        return f"❌ Erro na migração: {e}", 500
+
+@app.route('/api/rankings/semana/<iso_semana>', methods=['GET'])
+@resposta_condicional('registros', 'alunos', por_semana=True, max_age=300)
+def get_ranking_semana_arquivada(iso_semana):
+    """Ranking de uma semana fechada. `iso_semana` no formato 2025-W07: a semana do app
+    (domingo a sábado) que começa no domingo anterior à segunda-feira daquela semana ISO."""
+    try:
+        ano, semana = iso_semana.upper().split('-W')
+        inicio = datetime.fromisocalendar(int(ano), int(semana), 1).date() - timedelta(days=1)
+    except ValueError:
+        return jsonify({'erro': 'Semana inválida. Use o formato AAAA-Www (ex.: 2025-W07).'}), 400
+    if inicio >= dia_local(get_start_of_week()):
+        return jsonify({'erro': 'Essa semana ainda não fechou.'}), 404
+    payload = cache_rankings.obter(('arquivo', inicio.isoformat()), lambda: obter_ranking_arquivado(inicio),
+                                   ttl=segundos_ate_virada_da_semana(), fechada=True)
+    if not payload['quantidade']:
+        return jsonify({'erro': 'Nenhum registro nessa semana.'}), 404
+    return jsonify(payload)
 # --- ROTAS DE GERENCIAMENTO DE SIMULADOS ---
 @app.route('/gerenciar-simulados')
 @admin_required
@@ -760,6 +2489,7 @@ def gerenciar_simulados():
     return render_template('gerenciamento_simulados.html')
 
 @app.route('/api/empresas', methods=['GET'])
+@resposta_condicional('empresas')
 def get_empresas():
     empresas = Empresas.query.order_by(Empresas.nome).all()
     return jsonify([{'id': e.id, 'nome': e.nome} for e in empresas])
@@ -776,13 +2506,21 @@ def add_empresa():
     return jsonify({'status': 'sucesso', 'empresa': {'id': nova_empresa.id, 'nome': nova_empresa.nome}}), 201
 
 @app.route('/api/simulados', methods=['GET'])
+@resposta_condicional('simulados', 'empresas')
 def get_simulados():
-    simulados = db.session.query(Simulados, Empresas.nome).join(Empresas).order_by(Simulados.data_realizacao.desc()).all()
+    return jsonify(montar_simulados(db.session.execute(consulta_simulados()).mappings().all()))
+
+def consulta_simulados():
+    return (select(Simulados.id, Simulados.numero, Simulados.nome_especifico, Simulados.categoria,
+                   Simulados.data_realizacao, Empresas.nome.label('empresa_nome'))
+            .join(Empresas, Empresas.id == Simulados.empresa_id).order_by(Simulados.data_realizacao.desc()))
+
+def montar_simulados(simulados):
     lista_simulados = []
-    for simulado, empresa_nome in simulados:
+    for simulado in simulados:
         nome_display = f"Nº {simulado.numero}" if simulado.numero else simulado.nome_especifico
-        lista_simulados.append({'id': simulado.id, 'nome_display': f"{empresa_nome} - {nome_display} ({simulado.categoria})", 'data': simulado.data_realizacao.strftime(DATE_FORMAT)})
-    return jsonify(lista_simulados)
+        lista_simulados.append({'id': simulado.id, 'nome_display': f"{simulado.empresa_nome} - {nome_display} ({simulado.categoria})", 'data': simulado.data_realizacao.strftime(DATE_FORMAT)})
+    return lista_simulados
 
 @app.route('/api/simulados', methods=['POST'])
 def add_simulado():
@@ -800,10 +2538,6 @@ def add_resultado():
     dados = request.get_json()
     if not all(k in dados for k in ['aluno_id', 'simulado_id', 'nota']):
         return jsonify({'status': 'erro', 'mensagem': 'Dados incompletos (aluno, simulado ou nota).'}), 400
-    existe = ResultadosSimulados.query.filter_by(aluno_id=dados['aluno_id'], simulado_id=dados['simulado_id']).first()
-    if existe:
-        return jsonify({'status': 'erro', 'mensagem': 'Este aluno já possui uma nota para este simulado.'}), 409
-    
     novo_resultado = ResultadosSimulados(
         aluno_id=dados['aluno_id'],
         simulado_id=dados['simulado_id'],
@@ -811,12 +2545,26 @@ def add_resultado():
         # Tempos removidos
     )
     db.session.add(novo_resultado)
-    db.session.commit()
+    try:
+        db.session.flush()
+        recalcular_estatisticas_simulados([novo_resultado.simulado_id])
+        db.session.commit()
+    except IntegrityError:
+        # uq_resultados_simulados_aluno_simulado: já existe nota desse aluno nesse simulado
+        db.session.rollback()
+        return jsonify({'status': 'erro', 'mensagem': 'Este aluno já possui uma nota para este simulado.'}), 409
     return jsonify({'status': 'sucesso'}), 201
 
 @app.route('/api/resultados/recentes', methods=['GET'])
 def get_resultados_recentes():
-    resultados = ResultadosSimulados.query.order_by(ResultadosSimulados.id.desc()).limit(15).all()
+    limite, before_id = parametros_paginacao(15)
+    consulta = ResultadosSimulados.query.options(
+        joinedload(ResultadosSimulados.aluno),
+        joinedload(ResultadosSimulados.simulado).joinedload(Simulados.empresa),
+    )
+    if before_id:
+        consulta = consulta.filter(ResultadosSimulados.id < before_id)
+    resultados = consulta.order_by(ResultadosSimulados.id.desc()).limit(limite).all()
     lista_resultados = []
     for r in resultados:
         nome_simulado = f"Nº {r.simulado.numero}" if r.simulado.numero else r.simulado.nome_especifico
@@ -828,49 +2576,490 @@ def get_resultados_recentes():
 def delete_resultado(resultado_id):
     resultado = ResultadosSimulados.query.get_or_404(resultado_id)
     db.session.delete(resultado)
+    db.session.flush()
+    recalcular_estatisticas_simulados([resultado.simulado_id])
     db.session.commit()
     return jsonify({'status': 'sucesso', 'mensagem': 'Nota apagada com sucesso.'})
 
+def upsert_resultados(linhas):
+    """INSERT ... ON CONFLICT (aluno_id, simulado_id) DO UPDATE nota, no dialeto do banco. Não faz commit.
+
+    A restrição única uq_resultados_simulados_aluno_simulado decide, então dois admins lançando
+    a mesma planilha ao mesmo tempo não duplicam nem perdem notas.
+    """
+    comando = insert_com_conflito(ResultadosSimulados.__table__)
+    comando = comando.on_conflict_do_update(index_elements=['aluno_id', 'simulado_id'],
+                                            set_={'nota': comando.excluded.nota})
+    db.session.execute(comando, linhas)
+
+@app.route('/api/simulados/<int:simulado_id>/resultados/lote', methods=['POST'])
+@admin_required
+def add_resultados_lote(simulado_id):
+    """Lança a planilha de notas de um simulado numa transação só.
+
+    Linhas com `aluno_id` ou `username` e `nota` (JSON, {"resultados": [...]} ou CSV colado).
+    Nota que já existe é atualizada. Cada linha volta com o desfecho: inserido, atualizado,
+    inalterado ou erro. Como em /api/registros/bulk, sem ?parcial=1 qualquer erro cancela tudo.
+    """
+    db.get_or_404(Simulados, simulado_id)
+    linhas, erro = receber_linhas_bulk('resultados', 'a planilha', 'Nenhuma nota enviada.', 'notas')
+    if erro:
+        return erro
+    parcial = request.args.get('parcial') == '1'
+
+    # Alunos citados e notas já lançadas neste simulado: duas consultas para a planilha inteira
+    ids_validos, por_username = resolver_alunos_citados(linhas)
+    notas_atuais = dict(db.session.query(ResultadosSimulados.aluno_id, ResultadosSimulados.nota)
+                        .filter(ResultadosSimulados.simulado_id == simulado_id, ResultadosSimulados.aluno_id.in_(ids_validos)))
+
+    desfechos, gravar, linha_do_aluno = [], [], {}
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            if not isinstance(linha, dict):
+                raise ValueError('linha deve ser um objeto')
+            aluno_id = aluno_da_linha(linha, por_username)
+            if aluno_id not in ids_validos:
+                raise ValueError('aluno não encontrado')
+            if aluno_id in linha_do_aluno:
+                raise ValueError(f'aluno repetido (já está na linha {linha_do_aluno[aluno_id]})')
+            nota = float(str(linha.get('nota', '')).strip().replace(',', '.'))
+            if not 0 <= nota < float('inf'):
+                raise ValueError('nota deve ser um número não negativo')
+        except (TypeError, ValueError) as e:
+            desfechos.append({'linha': numero, 'resultado': 'erro', 'erro': str(e) or 'valor inválido'})
+            continue
+        linha_do_aluno[aluno_id] = numero
+        if aluno_id not in notas_atuais:
+            resultado = 'inserido'
+        elif notas_atuais[aluno_id] != nota:
+            resultado = 'atualizado'
+        else:
+            resultado = 'inalterado'
+        if resultado != 'inalterado':
+            gravar.append({'aluno_id': aluno_id, 'simulado_id': simulado_id, 'nota': nota})
+        desfechos.append({'linha': numero, 'aluno_id': aluno_id, 'nota': nota, 'resultado': resultado})
+
+    resumo = {chave: sum(1 for d in desfechos if d['resultado'] == chave)
+              for chave in ('inserido', 'atualizado', 'inalterado', 'erro')}
+    if resumo['erro'] and not parcial:
+        return jsonify({'status': 'erro', 'resumo': resumo, 'linhas': desfechos}), 400
+
+    if gravar:
+        try:
+            upsert_resultados(gravar)
+            recalcular_estatisticas_simulados([simulado_id])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'erro': f'Erro ao gravar as notas: {e}'}), 500
+    return jsonify({'status': 'sucesso', 'simulado_id': simulado_id, 'resumo': resumo, 'linhas': desfechos}), 200
+
 @app.route('/ranking-simulados')
 def ranking_simulados():
     return render_template('ranking_simulados.html')
 
 @app.route('/api/simulados/<int:simulado_id>/ranking', methods=['GET'])
+@resposta_condicional('resultados', 'alunos')
 def get_ranking_por_simulado(simulado_id):
     # ROTA SIMPLIFICADA: Removemos os joins de tempo
-    resultados = db.session.query(ResultadosSimulados.nota, Alunos.nome).join(Alunos).filter(ResultadosSimulados.simulado_id == simulado_id).order_by(ResultadosSimulados.nota.desc()).all()
-    ranking = [{'aluno_nome': nome, 'nota': nota} for nota, nome in resultados]
-    return jsonify(ranking)
+    return jsonify(montar_ranking_simulado(db.session.execute(consulta_ranking_simulado(simulado_id)).mappings().all()))
+
+def consulta_ranking_simulado(simulado_id):
+    return (select(ResultadosSimulados.nota, Alunos.nome).join(Alunos, Alunos.id == ResultadosSimulados.aluno_id)
+            .where(ResultadosSimulados.simulado_id == simulado_id).order_by(ResultadosSimulados.nota.desc()))
+
+def montar_ranking_simulado(resultados):
+    return [{'aluno_nome': r.nome, 'nota': r.nota} for r in resultados]
+
+# --- ESTATÍSTICAS DE SIMULADOS ---
+
+# Faixas do histograma (limite inferior de cada faixa; a última vai até o infinito)
+FAIXAS_HISTOGRAMA_NOTAS = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90]
+
+def percentil_interpolado(ordenadas, p):
+    """Percentil `p` (0 a 100) de uma lista já ordenada, com interpolação linear entre vizinhos."""
+    posicao = (len(ordenadas) - 1) * p / 100
+    abaixo = int(posicao)
+    acima = min(abaixo + 1, len(ordenadas) - 1)
+    return ordenadas[abaixo] + (ordenadas[acima] - ordenadas[abaixo]) * (posicao - abaixo)
+
+def calcular_estatisticas_notas(notas):
+    """Agregados de uma lista de notas (já ordenada) no formato das colunas de EstatisticasSimulados."""
+    n = len(notas)
+    media = sum(notas) / n
+    desvio = (sum((nota - media) ** 2 for nota in notas) / n) ** 0.5
+    histograma = [0] * len(FAIXAS_HISTOGRAMA_NOTAS)
+    for nota in notas:
+        faixa = sum(1 for limite in FAIXAS_HISTOGRAMA_NOTAS[1:] if nota >= limite)
+        histograma[faixa] += 1
+    return {'participantes': n, 'media': media, 'desvio': desvio, 'minimo': notas[0],
+            'p25': percentil_interpolado(notas, 25), 'mediana': percentil_interpolado(notas, 50),
+            'p75': percentil_interpolado(notas, 75), 'p90': percentil_interpolado(notas, 90),
+            'maximo': notas[-1], 'histograma': histograma}
+
+def recalcular_estatisticas_simulados(simulado_ids):
+    """Refaz os agregados dos simulados indicados a partir das notas atuais. Não faz commit.
+
+    Uma consulta traz as notas de todos eles já ordenadas (índice simulado_id, nota).
+    """
+    simulado_ids = set(simulado_ids)
+    if not simulado_ids:
+        return
+    notas_por_simulado = {}
+    for simulado_id, nota in db.session.execute(
+            select(ResultadosSimulados.simulado_id, ResultadosSimulados.nota)
+            .where(ResultadosSimulados.simulado_id.in_(simulado_ids))
+            .order_by(ResultadosSimulados.simulado_id, ResultadosSimulados.nota)):
+        notas_por_simulado.setdefault(simulado_id, []).append(nota)
+
+    tabela = EstatisticasSimulados.__table__
+    db.session.execute(tabela.delete().where(tabela.c.simulado_id.in_(simulado_ids)))
+    agora = datetime.utcnow()
+    linhas = [{'simulado_id': simulado_id, 'atualizado_em': agora, **calcular_estatisticas_notas(notas)}
+              for simulado_id, notas in notas_por_simulado.items()]
+    if linhas:
+        db.session.execute(tabela.insert(), linhas)
+
+@app.route('/_migrar_estatisticas_simulados')
+def migrar_estatisticas_simulados():
+    """Cria a tabela estatisticas_simulados (se faltar) e calcula os agregados de todos os simulados."""
+    try:
+        EstatisticasSimulados.__table__.create(db.engine, checkfirst=True)
+        ids = [s for (s,) in db.session.query(Simulados.id)]
+        recalcular_estatisticas_simulados(ids)
+        db.session.commit()
+        return f"✅ Estatísticas calculadas para {len(ids)} simulado(s).", 200
+    except Exception as e:
+        db.session.rollback()
+        return f"❌ Erro na migração: {e}", 500
+
+def filtros_simulados(args):
+    """Filtros opcionais ?empresa_id=&categoria= das rotas de estatísticas."""
+    filtros = []
+    empresa_id = args.get('empresa_id', type=int)
+    categoria = args.get('categoria')
+    if empresa_id:
+        filtros.append(Simulados.empresa_id == empresa_id)
+    if categoria:
+        filtros.append(Simulados.categoria == categoria)
+    return filtros
+
+@app.route('/api/simulados/estatisticas', methods=['GET'])
+@resposta_condicional('resultados', 'simulados', 'empresas')
+def get_estatisticas_simulados():
+    linhas = db.session.execute(consulta_estatisticas_simulados(filtros_simulados(request.args))).mappings().all()
+    return jsonify(montar_estatisticas_simulados(linhas))
+
+def consulta_estatisticas_simulados(filtros):
+    e = EstatisticasSimulados
+    return (select(Simulados.id, Simulados.numero, Simulados.nome_especifico, Simulados.categoria,
+                   Simulados.data_realizacao, Empresas.id.label('empresa_id'), Empresas.nome.label('empresa'),
+                   e.participantes, e.media, e.desvio, e.minimo, e.p25, e.mediana, e.p75, e.p90, e.maximo, e.histograma)
+            .join(e, e.simulado_id == Simulados.id).join(Empresas, Empresas.id == Simulados.empresa_id)
+            .where(*filtros).order_by(Simulados.data_realizacao.desc(), Simulados.id.desc()))
+
+def montar_estatisticas_simulados(linhas):
+    arredondar = ('media', 'desvio', 'minimo', 'p25', 'mediana', 'p75', 'p90', 'maximo')
+    simulados = []
+    for l in linhas:
+        nome_simulado = f"Nº {l['numero']}" if l['numero'] else l['nome_especifico']
+        simulados.append({
+            'id': l['id'], 'nome_display': f"{l['empresa']} - {nome_simulado} ({l['categoria']})",
+            'empresa_id': l['empresa_id'], 'categoria': l['categoria'],
+            'data': l['data_realizacao'].strftime(DATE_FORMAT), 'participantes': l['participantes'],
+            **{campo: round(l[campo], 2) for campo in arredondar}, 'histograma': l['histograma'],
+        })
+    return {'faixas_histograma': FAIXAS_HISTOGRAMA_NOTAS, 'simulados': simulados}
+
+@app.route('/api/simulados/leaderboard', methods=['GET'])
+@resposta_condicional('resultados', 'simulados', 'alunos')
+def get_leaderboard_simulados():
+    """Alunos ordenados pelo z-score médio nos simulados filtrados.
+
+    O z-score ((nota - média) / desvio do simulado) vem dos agregados pré-calculados, então
+    simulados mais difíceis não puxam ninguém para baixo. ?minimo=N exige N simulados feitos.
+    """
+    consulta = consulta_leaderboard_simulados(filtros_simulados(request.args), request.args.get('minimo', 1, type=int))
+    return jsonify(montar_leaderboard_simulados(db.session.execute(consulta).mappings().all()))
+
+def consulta_leaderboard_simulados(filtros, minimo):
+    r, e = ResultadosSimulados, EstatisticasSimulados
+    z = case((e.desvio > 0, (r.nota - e.media) / e.desvio), else_=0.0)
+    z_medio = func.avg(z)
+    return (select(Alunos.id, Alunos.nome, func.count().label('simulados'), func.avg(r.nota).label('media_nota'),
+                   z_medio.label('z_medio'), func.rank().over(order_by=z_medio.desc()).label('posicao'))
+            .join(r, r.aluno_id == Alunos.id).join(e, e.simulado_id == r.simulado_id)
+            .join(Simulados, Simulados.id == r.simulado_id)
+            .where(*filtros)
+            .group_by(Alunos.id, Alunos.nome).having(func.count() >= minimo)
+            .order_by(z_medio.desc(), Alunos.nome))
+
+def montar_leaderboard_simulados(linhas):
+    return [{'posicao': l['posicao'], 'aluno_id': l['id'], 'aluno_nome': l['nome'],
+             'simulados': l['simulados'], 'media_nota': round(l['media_nota'], 2),
+             'z_medio': round(l['z_medio'], 3)} for l in linhas]
+
+# Notas do aluno e, para cada simulado, a posição e a distribuição da turma inteira nele:
+# a subconsulta ranqueia todas as notas dos simulados que o aluno fez e a de fora fica só
+# com as linhas dele. Variância por janela (média dos quadrados - quadrado da média) porque
+# o SQLite não tem STDDEV; a raiz sai no Python.
+SQL_EVOLUCAO_SIMULADOS = """
+SELECT t.simulado_id, t.nota, t.posicao, t.participantes, t.percentil, t.media, t.variancia,
+       s.numero, s.nome_especifico, s.categoria, s.data_realizacao, e.nome AS empresa
+FROM (
+    SELECT r.aluno_id, r.simulado_id, r.nota,
+           RANK() OVER (PARTITION BY r.simulado_id ORDER BY r.nota DESC) AS posicao,
+           COUNT(*) OVER (PARTITION BY r.simulado_id) AS participantes,
+           PERCENT_RANK() OVER (PARTITION BY r.simulado_id ORDER BY r.nota) * 100 AS percentil,
+           AVG(r.nota) OVER (PARTITION BY r.simulado_id) AS media,
+           AVG(r.nota * r.nota) OVER (PARTITION BY r.simulado_id)
+               - AVG(r.nota) OVER (PARTITION BY r.simulado_id) * AVG(r.nota) OVER (PARTITION BY r.simulado_id) AS variancia
+    FROM resultados_simulados r
+    WHERE r.simulado_id IN (SELECT simulado_id FROM resultados_simulados WHERE aluno_id = :aluno_id)
+) t
+JOIN simulados s ON s.id = t.simulado_id
+JOIN empresas e ON e.id = s.empresa_id
+WHERE t.aluno_id = :aluno_id
+ORDER BY s.data_realizacao, s.id
+"""
+
+@app.route('/api/alunos/<int:aluno_id>/simulados', methods=['GET'])
+@resposta_condicional('resultados', 'simulados', 'empresas', 'alunos')
+def get_evolucao_simulados(aluno_id):
+    """Notas do aluno em ordem de data, com posição, percentil e z-score dentro de cada simulado."""
+    aluno = db.get_or_404(Alunos, aluno_id)
+    linhas = db.session.execute(consulta_evolucao_simulados(aluno_id)).mappings().all()
+    return jsonify({'aluno_id': aluno.id, 'aluno_nome': aluno.nome, 'simulados': montar_evolucao_simulados(linhas)})
+
+def consulta_evolucao_simulados(aluno_id):
+    return text(SQL_EVOLUCAO_SIMULADOS).bindparams(aluno_id=aluno_id)
+
+def montar_evolucao_simulados(linhas):
+    evolucao = []
+    for l in linhas:
+        desvio = max(l['variancia'] or 0, 0) ** 0.5  # max(): arredondamento pode dar variância -0.0000001
+        nome_simulado = f"Nº {l['numero']}" if l['numero'] else l['nome_especifico']
+        data = l['data_realizacao']
+        if isinstance(data, str):  # SQLite devolve DATE como texto em SQL cru
+            data = datetime.strptime(data, '%Y-%m-%d').date()
+        evolucao.append({
+            'simulado_id': l['simulado_id'],
+            'nome_display': f"{l['empresa']} - {nome_simulado} ({l['categoria']})",
+            'data': data.strftime(DATE_FORMAT),
+            'nota': l['nota'],
+            'posicao': l['posicao'],
+            'participantes': l['participantes'],
+            'percentil': round(l['percentil'], 1),
+            'media_simulado': round(l['media'], 2),
+            'z_score': round((l['nota'] - l['media']) / desvio, 3) if desvio > 0 else 0.0,
+        })
+    return evolucao
 
 @app.route('/consulta-desempenho')
 def consulta_desempenho(): return render_template('consulta_desempenho.html')
 
 @app.route('/api/consulta/desempenho', methods=['GET'])
 def get_consulta_desempenho():
-    aluno_id = request.args.get('aluno_id')
-    data_inicio_str = request.args.get('inicio')
-    data_fim_str = request.args.get('fim')
-    if not aluno_id or not data_inicio_str or not data_fim_str: return jsonify({'erro': 'Parâmetros aluno_id, inicio e fim são obrigatórios.'}), 400
     try:
-        data_inicio = datetime.strptime(data_inicio_str + ' 00:00:00', '%Y-%m-%d %H:%M:%S')
-        data_fim = datetime.strptime(data_fim_str + ' 23:59:59', '%Y-%m-%d %H:%M:%S')
-        resumo = db.session.query(func.sum(RegistrosQuestoes.quantidade_questoes).label('total_questoes'), func.sum(RegistrosQuestoes.acertos).label('total_acertos')).filter(RegistrosQuestoes.aluno_id == aluno_id, RegistrosQuestoes.data_registro >= data_inicio, RegistrosQuestoes.data_registro <= data_fim).first()
-        total_questoes = resumo.total_questoes if resumo and resumo.total_questoes else 0
-        total_acertos = resumo.total_acertos if resumo and resumo.total_acertos else 0
-        percentual_total = (total_acertos * 100.0 / total_questoes) if total_questoes > 0 else 0
-        dados_diarios_query = db.session.query(func.date(RegistrosQuestoes.data_registro).label('dia'), func.sum(RegistrosQuestoes.quantidade_questoes).label('questoes_dia'), func.sum(RegistrosQuestoes.acertos).label('acertos_dia')).filter(RegistrosQuestoes.aluno_id == aluno_id, RegistrosQuestoes.data_registro >= data_inicio, RegistrosQuestoes.data_registro <= data_fim).group_by(func.date(RegistrosQuestoes.data_registro)).order_by(func.date(RegistrosQuestoes.data_registro)).all()
-        dados_diarios_formatados = []
-        for row in dados_diarios_query:
-            dia_data = row.dia; questoes = row.questoes_dia; acertos = row.acertos_dia
-            percentual_dia = (acertos * 100.0 / questoes) if questoes > 0 else 0
-            dados_diarios_formatados.append({'data': dia_data.strftime('%Y-%m-%d'), 'questoes': questoes, 'acertos': acertos, 'percentual': round(percentual_dia, 2)})
-        aluno = Alunos.query.get(aluno_id)
-        nome_aluno = aluno.nome if aluno else "Aluno não encontrado"
-        return jsonify({'aluno_nome': nome_aluno, 'data_inicio': data_inicio_str, 'data_fim': data_fim_str, 'total_questoes': total_questoes, 'total_acertos': total_acertos, 'percentual_total': round(percentual_total, 2), 'dados_diarios': dados_diarios_formatados})
+        aluno_id, data_inicio, data_fim = ler_parametros_desempenho(request.args)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    try:
+        leituras = [db.session.execute(c).mappings().all() for c in consultas_desempenho(aluno_id, data_inicio, data_fim)]
+        return jsonify(montar_consulta_desempenho(aluno_id, data_inicio, data_fim, *leituras))
     except Exception as e:
         db.session.rollback()
         return jsonify({'erro': f'Erro ao consultar o banco de dados: {e}'}), 500
 
+def ler_parametros_desempenho(args):
+    """(aluno_id, inicio, fim) de ?aluno_id=&inicio=&fim=; ValueError com a mensagem para o 400."""
+    aluno_id, data_inicio_str, data_fim_str = args.get('aluno_id'), args.get('inicio'), args.get('fim')
+    if not aluno_id or not data_inicio_str or not data_fim_str:
+        raise ValueError('Parâmetros aluno_id, inicio e fim são obrigatórios.')
+    try:
+        data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
+        data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
+        aluno_id = int(aluno_id)
+    except ValueError:
+        raise ValueError('Datas devem estar no formato AAAA-MM-DD e aluno_id deve ser numérico.')
+    if data_fim < data_inicio:
+        raise ValueError('A data de fim é anterior à data de início.')
+    return aluno_id, data_inicio, data_fim
+
+def consultas_desempenho(aluno_id, data_inicio, data_fim):
+    """Nome do aluno, série dele (com os dias de aquecimento das médias móveis) e totais de todos
+    os alunos no período: independentes entre si; o resto é NumPy em cima dos arrays."""
+    carregar_desde = data_inicio - timedelta(days=analise_desempenho.AQUECIMENTO)
+    r = RegistrosDiarios
+    return (select(Alunos.nome).where(Alunos.id == aluno_id),
+            select(r.dia, r.quantidade_questoes, r.acertos).where(
+                r.aluno_id == aluno_id, r.dia >= carregar_desde, r.dia <= data_fim),
+            select(r.aluno_id, func.sum(r.quantidade_questoes).label('questoes'), func.sum(r.acertos).label('acertos')).where(
+                r.dia >= data_inicio, r.dia <= data_fim).group_by(r.aluno_id))
+
+def montar_consulta_desempenho(aluno_id, data_inicio, data_fim, aluno, linhas, totais_grupo):
+    """Payload da consulta a partir das três leituras de `consultas_desempenho`."""
+    carregar_desde = data_inicio - timedelta(days=analise_desempenho.AQUECIMENTO)
+    serie = analise_desempenho.SerieDiaria(carregar_desde, data_fim, [(l.dia, l.quantidade_questoes, l.acertos) for l in linhas])
+    desde = serie.recorte(data_inicio)
+    total_questoes = int(serie.questoes[desde:].sum())
+    total_acertos = int(serie.acertos[desde:].sum())
+    percentual_total = (total_acertos * 100.0 / total_questoes) if total_questoes > 0 else 0
+    hoje = dia_local(datetime.utcnow())
+    return {'data_inicio': data_inicio.isoformat(), 'data_fim': data_fim.isoformat(),
+            'aluno_nome': aluno[0].nome if aluno else "Aluno não encontrado",
+            'total_questoes': total_questoes, 'total_acertos': total_acertos,
+            'percentual_total': round(percentual_total, 2),
+            'dados_diarios': analise_desempenho.dias_com_registro(serie, desde),
+            'analise': analise_desempenho.analisar(serie, data_inicio, aluno_id, [(t.aluno_id, t.questoes, t.acertos) for t in totais_grupo], hoje)}
+
+MAX_DIAS_CONSULTA_GRUPO = 366
+
+@app.route('/api/consulta/grupo', methods=['GET'])
+@resposta_condicional('registros', 'alunos')
+def get_consulta_grupo():
+    """Todos os alunos (ou os `aluno_id` pedidos) num período, de uma consulta só, em colunas.
+
+    `datas` é o eixo comum; `questoes[i]` e `acertos[i]` são as séries diárias (zero nos dias
+    sem registro) do aluno `alunos.id[i]`, alinhadas com `datas`.
+    """
+    try:
+        data_inicio = datetime.strptime(request.args.get('inicio', ''), '%Y-%m-%d').date()
+        data_fim = datetime.strptime(request.args.get('fim', ''), '%Y-%m-%d').date()
+        ids_filtro = [int(i) for i in request.args.getlist('aluno_id')]
+    except ValueError:
+        return jsonify({'erro': 'Parâmetros inicio e fim (AAAA-MM-DD) são obrigatórios; aluno_id deve ser numérico.'}), 400
+    num_dias = (data_fim - data_inicio).days + 1
+    if num_dias < 1:
+        return jsonify({'erro': 'A data de fim é anterior à data de início.'}), 400
+    if num_dias > MAX_DIAS_CONSULTA_GRUPO:
+        return jsonify({'erro': f'O período pode ter no máximo {MAX_DIAS_CONSULTA_GRUPO} dias.'}), 400
+
+    # LEFT JOIN: aluno sem registro no período também aparece, com a série zerada
+    consulta = (select(Alunos.id, Alunos.nome, Alunos.time, RegistrosDiarios.dia,
+                       RegistrosDiarios.quantidade_questoes, RegistrosDiarios.acertos)
+                .outerjoin(RegistrosDiarios, (RegistrosDiarios.aluno_id == Alunos.id)
+                           & (RegistrosDiarios.dia >= data_inicio) & (RegistrosDiarios.dia <= data_fim))
+                .order_by(Alunos.nome, Alunos.id))
+    if ids_filtro:
+        consulta = consulta.where(Alunos.id.in_(ids_filtro))
+
+    colunas = {'id': [], 'nome': [], 'time': [], 'total_questoes': [], 'total_acertos': [], 'percentual': []}
+    questoes, acertos = [], []
+    for aluno_id, nome, time_aluno, dia, qtd, acertos_dia in db.session.execute(consulta):
+        if not colunas['id'] or colunas['id'][-1] != aluno_id:
+            colunas['id'].append(aluno_id)
+            colunas['nome'].append(nome)
+            colunas['time'].append(time_aluno)
+            questoes.append([0] * num_dias)
+            acertos.append([0] * num_dias)
+        if dia is not None:
+            indice = (dia - data_inicio).days
+            questoes[-1][indice] = qtd
+            acertos[-1][indice] = acertos_dia
+
+    for serie_questoes, serie_acertos in zip(questoes, acertos):
+        total_questoes, total_acertos = sum(serie_questoes), sum(serie_acertos)
+        colunas['total_questoes'].append(total_questoes)
+        colunas['total_acertos'].append(total_acertos)
+        colunas['percentual'].append(round(total_acertos * 100.0 / total_questoes, 2) if total_questoes else None)
+
+    datas = [(data_inicio + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(num_dias)]
+    return jsonify({'inicio': datas[0], 'fim': datas[-1], 'datas': datas, 'alunos': colunas,
+                    'questoes': questoes, 'acertos': acertos})
+
+# --- EXPORTAÇÃO (CSV / NDJSON EM STREAMING) ---
+# As linhas saem do banco por cursor do lado do servidor (yield_per) e são escritas na
+# resposta em lotes, então a memória não cresce com o tamanho do histórico.
+
+def filtros_exportacao(usuario):
+    """aluno_id/inicio/fim como em /api/consulta/desempenho, mas opcionais. Aluno só exporta o próprio."""
+    aluno_id = request.args.get('aluno_id', type=int)
+    if usuario.tipo_usuario != 'admin':
+        aluno_id = usuario.id
+    inicio = request.args.get('inicio')
+    fim = request.args.get('fim')
+    inicio = datetime.strptime(inicio, '%Y-%m-%d').date() if inicio else None
+    fim = datetime.strptime(fim, '%Y-%m-%d').date() if fim else None
+    return aluno_id, inicio, fim
+
+def _valor_exportacao(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+def resposta_exportacao(nome_arquivo, colunas, consulta):
+    formato = request.args.get('formato', 'csv').lower()
+    if formato not in ('csv', 'ndjson'):
+        return jsonify({'erro': 'Formato deve ser csv ou ndjson.'}), 400
+
+    def gerar():
+        resultado = db.session.execute(consulta.execution_options(yield_per=LINHAS_POR_LOTE_EXPORT))
+        if formato == 'csv':
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(colunas)
+        for lote in resultado.partitions():
+            if formato == 'csv':
+                escritor.writerows([_valor_exportacao(v) for v in linha] for linha in lote)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield ''.join(json.dumps(dict(zip(colunas, map(_valor_exportacao, linha))), ensure_ascii=False) + '\n'
+                              for linha in lote)
+        if formato == 'csv' and buffer.tell():
+            yield buffer.getvalue()
+
+    if formato == 'csv':
+        mimetype, extensao = 'text/csv', 'csv'
+    else:
+        mimetype, extensao = 'application/x-ndjson', 'ndjson'
+    return Response(stream_with_context(gerar()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={nome_arquivo}.{extensao}'})
+
+@app.route('/api/export/registros', methods=['GET'])
+@login_required
+def exportar_registros():
+    try:
+        aluno_id, inicio, fim = filtros_exportacao(get_usuario_atual())
+    except ValueError:
+        return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DD.'}), 400
+    colunas = ['id', 'aluno_id', 'aluno_nome', 'data_registro_utc', 'data_local', 'quantidade_questoes', 'acertos']
+    return resposta_exportacao('registros', colunas, consulta_exportacao_registros(aluno_id, inicio, fim))
+
+def consulta_exportacao_registros(aluno_id=None, inicio=None, fim=None):
+    r = RegistrosQuestoes
+    consulta = select(r.id, r.aluno_id, Alunos.nome, r.data_registro, r.data_local, r.quantidade_questoes, r.acertos) \
+        .join(Alunos, Alunos.id == r.aluno_id).order_by(r.id)
+    if aluno_id:
+        consulta = consulta.where(r.aluno_id == aluno_id)
+    if inicio:
+        consulta = consulta.where(r.data_local >= inicio)
+    if fim:
+        consulta = consulta.where(r.data_local <= fim)
+    return consulta
+
+@app.route('/api/export/resultados', methods=['GET'])
+@login_required
+def exportar_resultados():
+    try:
+        aluno_id, inicio, fim = filtros_exportacao(get_usuario_atual())
+    except ValueError:
+        return jsonify({'erro': 'Datas devem estar no formato AAAA-MM-DD.'}), 400
+    r = ResultadosSimulados
+    consulta = select(r.id, r.aluno_id, Alunos.nome, r.simulado_id, Empresas.nome, Simulados.numero,
+                      Simulados.nome_especifico, Simulados.categoria, Simulados.data_realizacao, r.nota) \
+        .join(Alunos, Alunos.id == r.aluno_id).join(Simulados, Simulados.id == r.simulado_id) \
+        .join(Empresas, Empresas.id == Simulados.empresa_id).order_by(r.id)
+    if aluno_id:
+        consulta = consulta.where(r.aluno_id == aluno_id)
+    if inicio:
+        consulta = consulta.where(Simulados.data_realizacao >= inicio)
+    if fim:
+        consulta = consulta.where(Simulados.data_realizacao <= fim)
+    colunas = ['id', 'aluno_id', 'aluno_nome', 'simulado_id', 'empresa', 'numero', 'nome_especifico',
+               'categoria', 'data_realizacao', 'nota']
+    return resposta_exportacao('resultados', colunas, consulta)
+
 # --- EXECUÇÃO DO SERVIDOR ---
 if __name__ == '__main__':
     with app.app_context():
@@ -0,0 +1,191 @@
+"""Entry point ASGI: leituras públicas em views `async def`, o resto do app Flask por baixo.
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT --workers $WEB_CONCURRENCY
+
+As rotas /api/async/... devolvem o mesmo JSON das /api/... correspondentes, mas rodam no event
+loop, sobre o engine asyncio do SQLAlchemy (aiosqlite no SQLite, asyncpg no Postgres; a réplica
+de DATABASE_READ_URL se houver, senão o primário). Enquanto uma espera o banco o loop atende as
+outras, então o número de leituras simultâneas deixa de ser o de threads. As consultas
+independentes de uma rota (ranking + placar da semana fechada; nome, série e totais do grupo da
+consulta de desempenho) saem juntas com asyncio.gather, cada uma numa conexão do pool.
+
+Sem cache de rankings nem ETag: é o caminho para quando o cache não segura (muitos períodos e
+alunos diferentes). A semana fechada é lida do arquivo rankings_semanais; se ainda não foi
+arquivada, é calculada sem gravar (quem grava é a rota síncrona).
+
+Todo o resto (páginas, login, escritas, /api/...) é o app Flask, servido por a2wsgi num pool de
+ASGI_WSGI_THREADS threads (padrão GUNICORN_THREADS ou 4).
+"""
+import asyncio
+import os
+import re
+from datetime import timedelta
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header
+
+import app as radar
+
+PREFIXO = '/api/async'
+DRIVERS_ASSINCRONOS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+
+def criar_engine(url):
+    """Engine asyncio para `url`, com o mesmo pool de app.opcoes_engine."""
+    url = make_url(url)
+    opcoes = radar.opcoes_engine(url.render_as_string(hide_password=False))
+    opcoes.pop('connect_args', None)  # keepalives são parâmetros do libpq; o asyncpg não os conhece
+    if 'sslmode' in url.query:
+        # ?sslmode=require das URLs de Heroku/Render: no asyncpg o nome é ssl
+        url = url.difference_update_query(['sslmode']).update_query_dict({'ssl': url.query['sslmode']})
+    return create_async_engine(url.set(drivername=DRIVERS_ASSINCRONOS[url.get_backend_name()]), **opcoes)
+
+
+engine = criar_engine(radar.db_read_url or radar.db_url)
+
+
+async def ler(*consultas):
+    """Linhas (mappings) de cada consulta, na ordem; as consultas rodam ao mesmo tempo."""
+    async def uma(consulta):
+        async with engine.connect() as conexao:
+            return (await conexao.execute(consulta)).mappings().all()
+    return await asyncio.gather(*(uma(consulta) for consulta in consultas))
+
+
+# --- VIEWS ---
+# Cada view recebe os parâmetros da query string (MultiDict, como request.args) e os da URL, e
+# devolve o payload; as consultas e a montagem do JSON são as mesmas das rotas síncronas.
+
+ROTAS = []
+
+
+def rota(padrao):
+    def registrar(view):
+        ROTAS.append((re.compile(f'^{PREFIXO}{padrao}$'), view))
+        return view
+    return registrar
+
+
+@rota('/rankings')
+async def get_rankings(args):
+    linhas, = await ler(radar.consulta_rankings_semana(radar.get_start_of_week()))
+    return radar.cortar_rankings(radar.montar_ranking_alunos(linhas), 10)
+
+
+@rota('/rankings/geral')
+async def get_rankings_gerais(args):
+    linhas, = await ler(radar.consulta_ranking_alunos())
+    return radar.montar_ranking_alunos(linhas)
+
+
+@rota('/rankings/semana-passada')
+async def get_rankings_semana_passada(args):
+    inicio = radar.dia_local(radar.get_start_of_week()) - timedelta(days=7)
+    arquivado, = await ler(select(radar.RankingsSemanais.payload).where(radar.RankingsSemanais.semana_inicio == inicio))
+    if arquivado:
+        return arquivado[0]['payload']
+    return radar.montar_semana_fechada(inicio, *await ler(*radar.consultas_semana_fechada(inicio)))
+
+
+@rota('/batalha/placar')
+async def get_placar_times(args):
+    linhas, = await ler(radar.consulta_placar_por_time(radar.dia_local(radar.get_start_of_week())))
+    return radar.montar_placar_por_time(linhas)
+
+
+@rota('/consulta/desempenho')
+async def get_consulta_desempenho(args):
+    aluno_id, inicio, fim = radar.ler_parametros_desempenho(args)
+    leituras = await ler(*radar.consultas_desempenho(aluno_id, inicio, fim))
+    # A análise é NumPy sobre arrays de poucos milhares de dias: rápida o bastante para o loop
+    return radar.montar_consulta_desempenho(aluno_id, inicio, fim, *leituras)
+
+
+@rota('/simulados')
+async def get_simulados(args):
+    linhas, = await ler(radar.consulta_simulados())
+    return radar.montar_simulados(linhas)
+
+
+@rota('/simulados/estatisticas')
+async def get_estatisticas_simulados(args):
+    linhas, = await ler(radar.consulta_estatisticas_simulados(radar.filtros_simulados(args)))
+    return radar.montar_estatisticas_simulados(linhas)
+
+
+@rota('/simulados/leaderboard')
+async def get_leaderboard_simulados(args):
+    consulta = radar.consulta_leaderboard_simulados(radar.filtros_simulados(args), args.get('minimo', 1, type=int))
+    linhas, = await ler(consulta)
+    return radar.montar_leaderboard_simulados(linhas)
+
+
+@rota(r'/simulados/(?P<simulado_id>\d+)/ranking')
+async def get_ranking_por_simulado(args, simulado_id):
+    linhas, = await ler(radar.consulta_ranking_simulado(int(simulado_id)))
+    return radar.montar_ranking_simulado(linhas)
+
+
+# --- APLICAÇÃO ---
+
+class AplicacaoRadar:
+    """Aplicação ASGI: /api/async/... nas views acima, o resto no app WSGI."""
+
+    def __init__(self, wsgi_app, threads):
+        self.wsgi = WSGIMiddleware(wsgi_app, workers=threads)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.ciclo_de_vida(receive, send)
+        if scope['type'] == 'http' and (scope['path'] == PREFIXO or scope['path'].startswith(PREFIXO + '/')):
+            return await self.leitura(scope, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def ciclo_de_vida(self, receive, send):
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensagem['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def leitura(self, scope, send):
+        cabecalhos = {nome.decode('latin-1').lower(): valor.decode('latin-1') for nome, valor in scope['headers']}
+        if scope['method'] != 'GET':
+            return await self.responder(send, cabecalhos, 405, {'erro': 'Só GET.'})
+        for padrao, view in ROTAS:
+            encontrada = padrao.match(scope['path'])
+            if encontrada:
+                break
+        else:
+            return await self.responder(send, cabecalhos, 404, {'erro': 'Rota não encontrada.'})
+        args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+        try:
+            payload, status = await view(args, **encontrada.groupdict()), 200
+        except ValueError as e:  # Parâmetro inválido (ler_parametros_desempenho...)
+            payload, status = {'erro': str(e)}, 400
+        except Exception as e:
+            radar.app.logger.exception("Erro em %s", scope['path'])
+            payload, status = {'erro': f'Erro ao consultar o banco de dados: {e}'}, 500
+        await self.responder(send, cabecalhos, status, payload)
+
+    async def responder(self, send, cabecalhos, status, payload):
+        corpo = radar.app.json.dumps(payload).encode()
+        resposta = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding')]
+        codificacao = radar.escolher_codificacao(parse_accept_header(cabecalhos.get('accept-encoding')))
+        if status == 200 and codificacao and len(corpo) >= radar.app.config['COMPRESSAO_MINIMO']:
+            corpo = radar.comprimir(corpo, codificacao)
+            resposta.append((b'content-encoding', codificacao.encode()))
+        resposta.append((b'content-length', str(len(corpo)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': resposta})
+        await send({'type': 'http.response.body', 'body': corpo})
+
+
+application = AplicacaoRadar(radar.app, int(os.environ.get('ASGI_WSGI_THREADS', os.environ.get('GUNICORN_THREADS', 4))))
@@ -0,0 +1,28 @@
+"""Benchmarks do Radar da Aprovação.
+
+Os módulos daqui rodam a aplicação contra um banco descartável (SQLite temporário
+por padrão, ou um Postgres local via --database-url) populado com dados sintéticos:
+
+    python -m benchmarks.dados_sinteticos   # só popula um banco
+    python -m benchmarks.endpoints          # latência/queries de todas as rotas /api
+    python -m benchmarks.comparar A.json B.json
+    python -m benchmarks.explain_indices    # planos antes/depois dos índices
+    python -m benchmarks.assincrono         # req/s de /api (Flask) x /api/async (asgi.py)
+"""
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def carregar_app(database_url=None):
+    """Importa o módulo `app` apontando para `database_url` (ou um SQLite temporário).
+
+    Precisa rodar antes de qualquer outro import do app, que lê DATABASE_URL no import.
+    """
+    os.environ['DATABASE_URL'] = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    import app as app_module
+    return app_module
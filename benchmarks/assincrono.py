@@ -0,0 +1,125 @@
+"""Requests por segundo das rotas de leitura: app Flask (/api/...) x views assíncronas (/api/async/...).
+
+    python -m benchmarks.assincrono --alunos 100 --anos 3
+    python -m benchmarks.assincrono --database-url postgresql://localhost/radar_bench --concorrencia 1 8 32
+
+Popula um banco sintético (ver benchmarks.dados_sinteticos) e, para cada rota e cada nível de
+concorrência N, dispara GETs durante alguns segundos:
+  - síncrono: N threads no test client do Flask, como um worker gthread com N threads;
+  - assíncrono: N tarefas num event loop chamando a aplicação de asgi.py, como um worker uvicorn.
+Tudo no mesmo processo, sem HTTP no meio: mede o caminho do banco e da montagem do JSON. O cache
+de rankings fica desligado para todo request ir ao banco (o caminho assíncrono não tem cache).
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import carregar_app
+from benchmarks.dados_sinteticos import adicionar_argumentos, recriar_e_popular
+
+
+def rotas():
+    hoje = datetime.utcnow().date()
+    desempenho = f"aluno_id=2&inicio={(hoje - timedelta(days=365)).isoformat()}&fim={hoje.isoformat()}"
+    return ['/rankings', '/rankings/geral', '/rankings/semana-passada', '/batalha/placar',
+            f'/consulta/desempenho?{desempenho}', '/simulados', '/simulados/estatisticas',
+            '/simulados/leaderboard', '/simulados/1/ranking']
+
+
+def medir_sincrono(app, url, segundos, threads):
+    contagem = [0] * threads
+    fim = time.perf_counter() + segundos
+
+    def disparar(indice):
+        cliente = app.test_client()
+        while time.perf_counter() < fim:
+            resposta = cliente.get(url)
+            assert resposta.status_code == 200, (url, resposta.status_code, resposta.get_data(as_text=True)[:200])
+            contagem[indice] += 1
+
+    trabalhadores = [threading.Thread(target=disparar, args=(i,)) for i in range(threads)]
+    inicio = time.perf_counter()
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    return sum(contagem) / (time.perf_counter() - inicio)
+
+
+async def get_asgi(aplicacao, url):
+    caminho, _, query = url.partition('?')
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http', 'root_path': '',
+             'path': caminho, 'query_string': query.encode(), 'server': ('bench', 80), 'headers': []}
+    mensagens = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(mensagem):
+        mensagens.append(mensagem)
+
+    await aplicacao(scope, receive, send)
+    return mensagens[0]['status'], b''.join(m.get('body', b'') for m in mensagens[1:])
+
+
+async def medir_assincrono(asgi, url, segundos, tarefas):
+    contagem = [0] * tarefas
+    fim = time.perf_counter() + segundos
+
+    async def disparar(indice):
+        while time.perf_counter() < fim:
+            status, corpo = await get_asgi(asgi.application, url)
+            assert status == 200, (url, status, corpo[:200])
+            contagem[indice] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(disparar(i) for i in range(tarefas)))
+    return sum(contagem) / (time.perf_counter() - inicio)
+
+
+async def medir_todas_assincronas(asgi, args):
+    try:
+        return {(rota, n): await medir_assincrono(asgi, '/api/async' + rota, args.segundos, n)
+                for rota in rotas() for n in args.concorrencia}
+    finally:
+        await asgi.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    parser.add_argument('--concorrencia', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--segundos', type=float, default=3)
+    parser.add_argument('--reusar-banco', action='store_true', help='Não recria/popula o banco de --database-url')
+    args = parser.parse_args()
+
+    os.environ['RANKING_CACHE_MAX'] = '0'  # Nenhuma entrada fica no cache
+    app_module = carregar_app(args.database_url)
+    app = app_module.app
+    with app.app_context():
+        volumes = None if args.reusar_banco else recriar_e_popular(app_module, args)
+        # Os dois caminhos leem a semana passada do arquivo; sem isso só o síncrono arquivaria
+        app_module.arquivar_semanas_fechadas()
+        app_module.db.session.commit()
+    if volumes:
+        print(f"Dados: {volumes}\n")
+    import asgi  # Depois de carregar_app: o engine assíncrono usa o DATABASE_URL do app
+
+    assincronas = asyncio.run(medir_todas_assincronas(asgi, args))
+    colunas = [f'N = {n}' for n in args.concorrencia]
+    print(f"{'rota':28s} " + ' '.join(f"{c:>30s}" for c in colunas))
+    print(f"{'':28s} " + ' '.join(f"{'sync/s   async/s   ganho':>30s}" for _ in colunas))
+    for rota in rotas():
+        celulas = []
+        for n in args.concorrencia:
+            sincrono = medir_sincrono(app, '/api' + rota, args.segundos, n)
+            assincrono = assincronas[(rota, n)]
+            celulas.append(f"{sincrono:8.1f}  {assincrono:8.1f}  {(assincrono / sincrono - 1) * 100:+6.1f}%")
+        print(f"{rota.split('?')[0]:28s} " + ' '.join(f"{c:>30s}" for c in celulas))
+
+
+if __name__ == '__main__':
+    main()
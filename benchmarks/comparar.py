@@ -0,0 +1,38 @@
+"""Compara dois resultados de benchmarks.endpoints rota a rota.
+
+    python -m benchmarks.comparar benchmarks/resultados/antes.json benchmarks/resultados/depois.json
+"""
+import argparse
+import json
+
+METRICAS = ['p50_ms', 'p95_ms', 'p99_ms', 'queries']
+
+
+def variacao(antes, depois):
+    if antes in (None, 0) or depois is None:
+        return '   n/a'
+    return f"{(depois - antes) / antes * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('antes')
+    parser.add_argument('depois')
+    args = parser.parse_args()
+
+    with open(args.antes, encoding='utf-8') as a, open(args.depois, encoding='utf-8') as b:
+        antes, depois = json.load(a), json.load(b)
+    print(f"{antes['commit']} ({antes['data']})  ->  {depois['commit']} ({depois['data']})\n")
+    print(f"{'rota':45s} " + ' '.join(f"{m:>22s}" for m in METRICAS))
+
+    for rota in sorted(set(antes['endpoints']) | set(depois['endpoints'])):
+        ra, rd = antes['endpoints'].get(rota, {}), depois['endpoints'].get(rota, {})
+        colunas = []
+        for metrica in METRICAS:
+            va, vd = ra.get(metrica), rd.get(metrica)
+            colunas.append(f"{str(va):>6s} -> {str(vd):>6s} {variacao(va, vd)}")
+        print(f"{rota:45s} " + ' '.join(f"{c:>22s}" for c in colunas))
+
+
+if __name__ == '__main__':
+    main()
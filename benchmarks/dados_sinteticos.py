@@ -0,0 +1,117 @@
+"""Gerador de dados sintéticos: alunos, registros diários, empresas, simulados e notas.
+
+    python -m benchmarks.dados_sinteticos --database-url sqlite:///bench.db --alunos 100 --anos 3
+
+O banco indicado é RECRIADO (drop_all/create_all). Não aponte para produção.
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from benchmarks import carregar_app
+
+SENHA_BENCH = 'bench123'
+TIMES = ['GUI', 'ENZO']
+CATEGORIAS = ['Soldado', 'Oficial']
+TAMANHO_LOTE = 10000
+
+
+def popular(app_module, alunos=100, anos=3, registros_por_dia=1.5, simulados=150,
+            participacao_simulados=0.7, semente=42):
+    """Popula o banco do app (já criado) e reconstrói o rollup e as estatísticas dos simulados.
+    Retorna os volumes gerados.
+
+    O aluno de id 1 é admin (username 'admin', senha SENHA_BENCH); os demais são 'aluno<id>'.
+    Cada aluno registra em ~`registros_por_dia` lotes por dia nos últimos `anos`.
+    """
+    from werkzeug.security import generate_password_hash
+
+    db = app_module.db
+    rnd = random.Random(semente)
+    agora = datetime.utcnow()
+    dias = int(anos * 365)
+    senha_hash = generate_password_hash(SENHA_BENCH)  # Uma vez só: hash é caro
+
+    db.session.execute(app_module.Alunos.__table__.insert(), [
+        {'id': i, 'nome': f'Aluno {i:04d}', 'username': 'admin' if i == 1 else f'aluno{i}',
+         'time': TIMES[i % len(TIMES)], 'senha_hash': senha_hash,
+         'tipo_usuario': 'admin' if i == 1 else 'aluno', 'primeira_vez': 0}
+        for i in range(1, alunos + 1)
+    ])
+
+    total_registros = 0
+    lote = []
+    for aluno_id in range(1, alunos + 1):
+        assiduidade = rnd.uniform(0.3, 1.0)  # Nem todo aluno estuda todo dia
+        for dia in range(dias):
+            if rnd.random() > assiduidade:
+                continue
+            for _ in range(max(1, int(rnd.expovariate(1 / registros_por_dia)))):
+                q = rnd.randint(5, 80)
+                data_registro = agora - timedelta(days=dia, minutes=rnd.randint(0, 24 * 60 - 1))
+                lote.append({
+                    'aluno_id': aluno_id, 'quantidade_questoes': q, 'acertos': rnd.randint(q // 3, q),
+                    'data_registro': data_registro, 'data_local': app_module.dia_local(data_registro),
+                })
+            if len(lote) >= TAMANHO_LOTE:
+                db.session.execute(app_module.RegistrosQuestoes.__table__.insert(), lote)
+                total_registros += len(lote)
+                lote = []
+    if lote:
+        db.session.execute(app_module.RegistrosQuestoes.__table__.insert(), lote)
+        total_registros += len(lote)
+
+    empresas = ['Quad', 'rumo', 'projeto missão', 'projeto caveira']
+    db.session.execute(app_module.Empresas.__table__.insert(),
+                       [{'id': i, 'nome': nome} for i, nome in enumerate(empresas, start=1)])
+    db.session.execute(app_module.Simulados.__table__.insert(), [
+        {'id': i, 'empresa_id': rnd.randint(1, len(empresas)), 'numero': i,
+         'categoria': rnd.choice(CATEGORIAS), 'data_realizacao': (agora - timedelta(days=rnd.randint(0, dias))).date()}
+        for i in range(1, simulados + 1)
+    ])
+    resultados = [
+        {'aluno_id': aluno_id, 'simulado_id': simulado_id, 'nota': round(rnd.uniform(20, 100), 2)}
+        for simulado_id in range(1, simulados + 1)
+        for aluno_id in range(1, alunos + 1)
+        if rnd.random() < participacao_simulados
+    ]
+    for i in range(0, len(resultados), TAMANHO_LOTE):
+        db.session.execute(app_module.ResultadosSimulados.__table__.insert(), resultados[i:i + TAMANHO_LOTE])
+
+    app_module.reconstruir_rollup_diario()
+    app_module.recalcular_estatisticas_simulados(range(1, simulados + 1))
+    db.session.commit()
+    return {'alunos': alunos, 'registros': total_registros, 'simulados': simulados, 'resultados': len(resultados)}
+
+
+def adicionar_argumentos(parser):
+    parser.add_argument('--database-url', help='Padrão: SQLite em diretório temporário')
+    parser.add_argument('--alunos', type=int, default=100)
+    parser.add_argument('--anos', type=float, default=3)
+    parser.add_argument('--registros-por-dia', type=float, default=1.5)
+    parser.add_argument('--simulados', type=int, default=150)
+    parser.add_argument('--participacao-simulados', type=float, default=0.7)
+    parser.add_argument('--semente', type=int, default=42)
+
+
+def recriar_e_popular(app_module, args):
+    db = app_module.db
+    db.drop_all()
+    db.create_all()
+    return popular(app_module, alunos=args.alunos, anos=args.anos, registros_por_dia=args.registros_por_dia,
+                   simulados=args.simulados, participacao_simulados=args.participacao_simulados,
+                   semente=args.semente)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+    app_module = carregar_app(args.database_url)
+    with app_module.app.app_context():
+        volumes = recriar_e_popular(app_module, args)
+    print(f"Banco populado em {app_module.db_url}: {volumes}")
+
+
+if __name__ == '__main__':
+    main()
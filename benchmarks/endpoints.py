@@ -0,0 +1,218 @@
+"""Mede todas as rotas GET de /api com o test client do Flask sobre dados sintéticos.
+
+    python -m benchmarks.endpoints --alunos 100 --anos 3 --repeticoes 50
+    python -m benchmarks.endpoints --database-url postgresql://localhost/radar_bench
+
+Para cada rota: latência p50/p95/p99 (ms), número de queries SQL por request, tempo
+gasto no banco e uma medida de linhas varridas:
+  * Postgres: soma das linhas lidas pelos nós de Scan no EXPLAIN ANALYZE das queries;
+  * SQLite: não expõe linhas por query, então reportamos passos da VM (em milhares),
+    que crescem na mesma proporção das linhas varridas.
+O resultado vai para benchmarks/resultados/<data>-<commit>.json (ver benchmarks.comparar).
+Rota que não responde 2xx com os parâmetros padrão não é medida: sai em `puladas` no JSON
+e o comando termina com erro, para parâmetro faltando não virar latência de um 400.
+"""
+import argparse
+import json
+import os
+import subprocess
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import RAIZ, carregar_app
+from benchmarks.dados_sinteticos import SENHA_BENCH, adicionar_argumentos, recriar_e_popular
+
+# Rotas que não fazem sentido num loop de latência (conexões longas)
+IGNORAR = {'stream_placar_times'}
+PASSOS_POR_TICK = 1000
+
+
+def parametros_padrao():
+    """Query string usada em cada endpoint que exige parâmetros."""
+    hoje = datetime.utcnow().date()
+    ultimo_ano = {'inicio': (hoje - timedelta(days=365)).isoformat(), 'fim': hoje.isoformat()}
+    return {
+        'get_consulta_desempenho': {'aluno_id': 2, **ultimo_ano},
+        'get_consulta_grupo': ultimo_ano,
+    }
+
+
+def valor_argumento(nome):
+    """Valor para argumentos de rota com ids que existem nos dados sintéticos."""
+    if nome == 'iso_semana':  # Semana fechada (retrasada, para não cair na virada de domingo)
+        ano, semana, _ = (datetime.utcnow().date() - timedelta(days=14)).isocalendar()
+        return f'{ano}-W{semana:02d}'
+    return {'aluno_id': 2, 'id': 2, 'simulado_id': 1}.get(nome, 1)
+
+
+def rotas_get(app):
+    rotas = []
+    for regra in app.url_map.iter_rules():
+        if not regra.rule.startswith('/api/') or 'GET' not in regra.methods or regra.endpoint in IGNORAR:
+            continue
+        url = regra.rule
+        for argumento in regra.arguments:
+            url = url.replace(f'<int:{argumento}>', str(valor_argumento(argumento)))
+            url = url.replace(f'<{argumento}>', str(valor_argumento(argumento)))
+        rotas.append((regra.endpoint, url))
+    return sorted(rotas, key=lambda rota: rota[1])
+
+
+class Medidor:
+    """Conta statements, tempo de banco e passos da VM via eventos do engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.engine = engine
+        self.zerar()
+        event.listen(engine, 'before_cursor_execute', self._antes)
+        event.listen(engine, 'after_cursor_execute', self._depois)
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', self._ao_conectar)
+            engine.dispose()  # Garante que todas as conexões passem pelo 'connect'
+
+    def zerar(self):
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.passos_vm = 0
+        self.statements = []
+
+    def _ao_conectar(self, dbapi_conn, _):
+        def tick():
+            self.passos_vm += PASSOS_POR_TICK
+            return 0
+        dbapi_conn.set_progress_handler(tick, PASSOS_POR_TICK)
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info['bench_inicio'] = time.perf_counter()
+
+    def _depois(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries += 1
+        self.tempo_db += time.perf_counter() - conn.info.pop('bench_inicio', time.perf_counter())
+        self.statements.append((statement, parameters))
+
+
+def linhas_lidas_postgres(engine, statements):
+    """Soma as linhas lidas pelos nós de Scan no EXPLAIN ANALYZE de cada SELECT."""
+    def somar(no):
+        total = 0
+        if 'Scan' in no.get('Node Type', ''):
+            total += (no.get('Actual Rows', 0) + no.get('Rows Removed by Filter', 0)) * no.get('Actual Loops', 1)
+        for filho in no.get('Plans', []):
+            total += somar(filho)
+        return total
+
+    total = 0
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                continue
+            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + statement, parameters)
+            plano = cursor.fetchone()[0]
+            plano = json.loads(plano) if isinstance(plano, str) else plano
+            total += somar(plano[0]['Plan'])
+        conn.rollback()
+    finally:
+        conn.close()
+    return total
+
+
+def percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    indice = max(0, min(len(ordenadas) - 1, int(round(p / 100 * len(ordenadas) + 0.5)) - 1))
+    return ordenadas[indice]
+
+
+def medir_rota(app_module, cliente, medidor, url, params, repeticoes, com_cache):
+    def limpar_cache():
+        if not com_cache:
+            app_module.cache_rankings.invalidar(incluir_fechadas=True)
+
+    # Aquecimento: também é dele que saem queries/statements por request
+    limpar_cache()
+    medidor.zerar()
+    resposta = cliente.get(url, query_string=params)
+    if not 200 <= resposta.status_code < 300:
+        return None, f"{resposta.status_code} {resposta.get_data(as_text=True)[:200]}"
+    resultado = {'status': resposta.status_code, 'bytes': len(resposta.get_data()),
+                 'queries': medidor.queries, 'tempo_db_ms': round(medidor.tempo_db * 1000, 3)}
+    engine = medidor.engine
+    if engine.dialect.name == 'postgresql':
+        resultado['linhas_lidas'] = linhas_lidas_postgres(engine, medidor.statements)
+    else:
+        resultado['passos_vm_mil'] = medidor.passos_vm // 1000
+
+    amostras = []
+    for _ in range(repeticoes):
+        limpar_cache()
+        inicio = time.perf_counter()
+        cliente.get(url, query_string=params)
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    resultado.update({f'p{p}_ms': round(percentil(amostras, p), 3) for p in (50, 95, 99)})
+    resultado['media_ms'] = round(sum(amostras) / len(amostras), 3)
+    return resultado, None
+
+
+def commit_atual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, text=True).strip()
+    except Exception:
+        return 'desconhecido'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--com-cache', action='store_true', help='Não limpa o cache de rankings entre requests')
+    parser.add_argument('--reusar-banco', action='store_true', help='Não recria/popula o banco de --database-url')
+    parser.add_argument('--saida', help='Arquivo JSON (padrão: benchmarks/resultados/<data>-<commit>.json)')
+    args = parser.parse_args()
+
+    app_module = carregar_app(args.database_url)
+    app = app_module.app
+    with app.app_context():
+        volumes = None if args.reusar_banco else recriar_e_popular(app_module, args)
+        medidor = Medidor(app_module.db.engine)
+
+    cliente = app.test_client()
+    login = cliente.post('/login', json={'username': 'admin', 'senha': SENHA_BENCH})
+    if login.status_code != 200:
+        raise SystemExit(f"Falha no login do admin sintético: {login.status_code} {login.get_data(as_text=True)}")
+
+    params = parametros_padrao()
+    resultados, puladas = {}, {}
+    for endpoint, url in rotas_get(app):
+        r, erro = medir_rota(app_module, cliente, medidor, url, params.get(endpoint), args.repeticoes, args.com_cache)
+        if erro:
+            puladas[url] = erro
+            print(f"{url:45s} PULADA: {erro}")
+            continue
+        resultados[url] = r
+        print(f"{url:45s} {r['status']}  p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  "
+              f"p99 {r['p99_ms']:8.2f} ms  {r['queries']:3d} queries")
+
+    commit = commit_atual()
+    saida = args.saida or os.path.join(RAIZ, 'benchmarks', 'resultados',
+                                       f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'commit': commit,
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'banco': medidor.engine.dialect.name,
+            'volumes': volumes,
+            'repeticoes': args.repeticoes,
+            'com_cache': args.com_cache,
+            'endpoints': resultados,
+            'puladas': puladas,
+        }, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em {saida}")
+    if puladas:
+        raise SystemExit(f"{len(puladas)} rota(s) sem resposta 2xx: ajuste parametros_padrao/valor_argumento.")
+
+
+if __name__ == '__main__':
+    main()
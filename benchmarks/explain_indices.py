@@ -0,0 +1,99 @@
+"""Compara o plano (EXPLAIN) e o tempo das consultas quentes antes e depois dos índices.
+
+As consultas são as do próprio app (os mesmos construtores que as rotas usam), então o
+benchmark acompanha o que as rotas realmente leem: o rollup registros_diarios nos rankings,
+placar e consulta de desempenho, registros_questoes.data_local na exportação.
+
+Uso (SQLite temporário, padrão):
+    python -m benchmarks.explain_indices --alunos 100 --anos 3
+
+Contra um Postgres local (o banco é recriado, NÃO aponte para produção):
+    python -m benchmarks.explain_indices --database-url postgresql://localhost/radar_bench
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from benchmarks import carregar_app
+from benchmarks.dados_sinteticos import adicionar_argumentos, popular
+
+
+def consultas(app_module, hoje):
+    """(nome, consulta) das leituras que filtram pelas colunas indexadas, com os parâmetros de cada rota."""
+    domingo = app_module.inicio_da_semana(hoje)
+    semana_passada = domingo - timedelta(days=7)
+    nome, serie, totais = app_module.consultas_desempenho(1, hoje - timedelta(days=30), hoje)
+    r = app_module.ResultadosSimulados
+    return [
+        ('ranking da semana (/api/rankings)',
+         app_module.consulta_ranking_alunos(inicio=domingo, minimo_percentual=20)),
+        ('placar da semana (/api/batalha/placar)', app_module.consulta_placar_por_time(domingo)),
+        ('semana fechada (/api/rankings/semana-passada)',
+         app_module.consulta_ranking_alunos(semana_passada, domingo - timedelta(days=1), minimo_percentual=20)),
+        ('série do aluno (/api/consulta/desempenho)', serie),
+        ('totais do grupo (/api/consulta/desempenho)', totais),
+        ('registros de um aluno (/api/export/registros)',
+         app_module.consulta_exportacao_registros(1, hoje - timedelta(days=30), hoje)),
+        ('ranking de um simulado', app_module.consulta_ranking_simulado(1)),
+        ('nota do aluno no simulado (upsert das notas)',
+         app_module.select(r.id).where(r.aluno_id == 1, r.simulado_id == 1)),
+    ]
+
+
+def medir(app_module, repeticoes):
+    db = app_module.db
+    explain = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    resultado = {}
+    for nome, consulta in consultas(app_module, app_module.dia_local(datetime.utcnow())):
+        # O EXPLAIN precisa do SQL com os valores no texto; a medição executa a consulta como o app
+        sql = str(consulta.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plano = [' | '.join(str(c) for c in linha) for linha in db.session.execute(app_module.text(explain + sql))]
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            db.session.execute(consulta).fetchall()
+        resultado[nome] = {'plano': plano, 'ms': (time.perf_counter() - inicio) * 1000 / repeticoes}
+    # Fecha a transação de leitura: senão a sessão continua vendo o schema antigo
+    db.session.commit()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    adicionar_argumentos(parser)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    args = parser.parse_args()
+
+    app_module = carregar_app(args.database_url)
+    db = app_module.db
+
+    with app_module.app.app_context():
+        db.drop_all()
+        db.create_all()
+        # Remove os índices para medir o "antes". A restrição única (aluno_id, dia) de
+        # registros_diarios fica: é parte da tabela e o rollup depende dela.
+        for tabela in app_module.TABELAS_INDEXADAS:
+            for indice in tabela.indexes:
+                indice.drop(db.engine)
+        popular(app_module, alunos=args.alunos, anos=args.anos, registros_por_dia=args.registros_por_dia,
+                simulados=args.simulados, participacao_simulados=args.participacao_simulados,
+                semente=args.semente)
+
+        antes = medir(app_module, args.repeticoes)
+        app_module.criar_indices_desempenho()
+        # Atualiza as estatísticas para o planner escolher entre os índices novos
+        db.session.execute(app_module.text('ANALYZE'))
+        db.session.commit()
+        depois = medir(app_module, args.repeticoes)
+
+    for nome in antes:
+        print(f"\n== {nome} ==")
+        print(f"  antes:  {antes[nome]['ms']:8.2f} ms")
+        for linha in antes[nome]['plano']:
+            print(f"          {linha}")
+        print(f"  depois: {depois[nome]['ms']:8.2f} ms")
+        for linha in depois[nome]['plano']:
+            print(f"          {linha}")
+
+
+if __name__ == '__main__':
+    main()
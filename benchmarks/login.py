@@ -0,0 +1,71 @@
+"""Logins por segundo por worker para cada configuração de hash de senha.
+
+    python -m benchmarks.login
+    python -m benchmarks.login --metodos scrypt:32768:8:1 scrypt:16384:8:1 --threads 1 4 --segundos 5
+
+Para cada método, grava a senha de um aluno com aquele hash e dispara POST /login pelo
+test client durante alguns segundos, com 1 thread (worker sync) e com N threads
+(simulando um worker gthread com N threads). O rehash no login fica desligado para o
+hash medido não mudar no meio do teste.
+"""
+import argparse
+import threading
+import time
+
+from benchmarks import carregar_app
+
+METODOS_PADRAO = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+SENHA = 'bench123'
+
+
+def medir(app, segundos, threads):
+    contagem = [0] * threads
+    fim = time.perf_counter() + segundos
+
+    def disparar(indice):
+        cliente = app.test_client()
+        while time.perf_counter() < fim:
+            resposta = cliente.post('/login', json={'username': 'bench', 'senha': SENHA})
+            assert resposta.status_code == 200, resposta.get_data(as_text=True)
+            contagem[indice] += 1
+
+    trabalhadores = [threading.Thread(target=disparar, args=(i,)) for i in range(threads)]
+    inicio = time.perf_counter()
+    for t in trabalhadores:
+        t.start()
+    for t in trabalhadores:
+        t.join()
+    return sum(contagem) / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Padrão: SQLite em diretório temporário')
+    parser.add_argument('--metodos', nargs='+', default=METODOS_PADRAO)
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--segundos', type=float, default=3)
+    args = parser.parse_args()
+
+    app_module = carregar_app(args.database_url)
+    app, db = app_module.app, app_module.db
+    app.config['SENHA_REHASH_NO_LOGIN'] = False
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        aluno = app_module.Alunos(nome='Bench', username='bench', tipo_usuario='aluno', primeira_vez=0)
+        db.session.add(aluno)
+        db.session.commit()
+
+    print(f"{'método':28s} " + ' '.join(f"{f'{t} thread(s)':>14s}" for t in args.threads))
+    for metodo in args.metodos:
+        with app.app_context():
+            aluno = db.session.execute(db.select(app_module.Alunos).filter_by(username='bench')).scalar_one()
+            aluno.senha_hash = app_module.gerar_hash_senha(SENHA, metodo)
+            db.session.commit()
+        resultados = [medir(app, args.segundos, t) for t in args.threads]
+        print(f"{metodo:28s} " + ' '.join(f"{r:10.1f}/s   " for r in resultados))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Configuração do gunicorn para produção: `gunicorn app:app` já lê este arquivo.
+
+Tudo vem de variáveis de ambiente:
+
+    GUNICORN_WORKER_CLASS  gthread (padrão) | gevent (gevent e psycogreen fixados no requirements) | sync
+    WEB_CONCURRENCY        nº de processos (padrão: 2 x CPUs + 1)
+    GUNICORN_THREADS       threads por processo no gthread (padrão 4)
+    GUNICORN_CONNECTIONS   conexões simultâneas por processo no gevent (padrão 200)
+    GUNICORN_PRELOAD       1 = importa o app no master antes do fork (economiza memória)
+    GUNICORN_TIMEOUT       segundos (padrão 30)
+    PORT                   porta (padrão 5000)
+
+O pool do banco (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE...) é configurado em
+app.opcoes_engine. Cada processo tem seu pool, então o máximo de conexões no Postgres é
+WEB_CONCURRENCY x (DB_POOL_SIZE + DB_MAX_OVERFLOW) + 1 LISTEN por processo; isso precisa
+caber no max_connections do plano. No gthread, DB_POOL_SIZE segue GUNICORN_THREADS.
+
+O placar ao vivo (SSE) prende uma thread/greenlet por aba aberta. Por processo, no máximo
+PLACAR_SSE_MAX_ASSINANTES streams (padrão: metade das threads no gthread, metade das conexões
+no gevent, nenhum no sync); as abas além disso fazem polling de /api/batalha/placar.
+
+O entry point ASGI (asgi.py, com as leituras /api/async/...) roda no uvicorn, que não lê este arquivo.
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_CONNECTIONS', 200))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recicla workers de tempos em tempos para conter vazamento de memória
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+if worker_class == 'gevent':
+    # O pool do SQLAlchemy precisa ter lugar para as greenlets que usam o banco ao mesmo tempo
+    os.environ.setdefault('DB_POOL_SIZE', '10')
+    os.environ.setdefault('DB_MAX_OVERFLOW', '10')
+    if preload_app:
+        # Com preload o app é importado no master: o patch tem que vir antes disso
+        from gevent import monkey
+        monkey.patch_all()
+else:
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+
+# Streams SSE por processo: a outra metade das threads/conexões fica para os requests comuns
+os.environ.setdefault('PLACAR_SSE_MAX_ASSINANTES', str(
+    worker_connections // 2 if worker_class == 'gevent' else (threads // 2 if worker_class == 'gthread' else 0)))
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()  # Sem isso cada query trava o loop do gevent
+    if preload_app:
+        # Conexões abertas no master não podem ser compartilhadas entre processos
+        from app import app, db
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def when_ready(server):
+    pool = int(os.environ.get('DB_POOL_SIZE', 5)) + int(os.environ.get('DB_MAX_OVERFLOW', 2))
+    concorrencia = worker_connections if worker_class == 'gevent' else (threads if worker_class == 'gthread' else 1)
+    server.log.info(
+        f"{workers} worker(s) {worker_class} x {concorrencia} = {workers * concorrencia} requests simultâneos; "
+        f"até {workers * (pool + 1)} conexões no banco (pool {pool} + LISTEN por worker)")
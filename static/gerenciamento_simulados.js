@@ -87,13 +87,25 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    async function carregarUltimasNotas() {
+    const NOTAS_POR_PAGINA = 15;
+    let ultimoIdNotas = null; // Menor id já exibido (cursor para "Carregar mais")
+
+    const btnMaisNotas = document.createElement('button');
+    btnMaisNotas.type = 'button';
+    btnMaisNotas.textContent = 'Carregar mais';
+    btnMaisNotas.style.display = 'none';
+    btnMaisNotas.addEventListener('click', () => carregarUltimasNotas(true));
+    listaUltimasNotas.after(btnMaisNotas);
+
+    async function carregarUltimasNotas(maisAntigas = false) {
         try {
-            const response = await fetch('/api/resultados/recentes');
+            const params = new URLSearchParams({ limit: NOTAS_POR_PAGINA });
+            if (maisAntigas && ultimoIdNotas) params.set('before_id', ultimoIdNotas);
+            const response = await fetch(`/api/resultados/recentes?${params}`);
             const resultados = await response.json();
             
-            listaUltimasNotas.innerHTML = '';
-            if (resultados.length === 0) {
+            if (!maisAntigas) listaUltimasNotas.innerHTML = '';
+            if (resultados.length === 0 && !maisAntigas) {
                 listaUltimasNotas.innerHTML = '<li>Nenhuma nota lançada recentemente.</li>';
             } else {
                 resultados.forEach(r => {
@@ -105,6 +117,8 @@ document.addEventListener('DOMContentLoaded', () => {
                     listaUltimasNotas.appendChild(li);
                 });
             }
+            if (resultados.length > 0) ultimoIdNotas = resultados[resultados.length - 1].id;
+            btnMaisNotas.style.display = resultados.length === NOTAS_POR_PAGINA ? '' : 'none';
         } catch (error) {
             console.error('Erro ao carregar últimas notas:', error);
         }
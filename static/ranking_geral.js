@@ -36,7 +36,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (restoQtd.length > 0) {
                     restoQtd.forEach((item, index) => {
                         const li = document.createElement('li');
-                        li.textContent = `${index + 4}. ${item.nome} - ${item.total} questões`;
+                        li.textContent = `${item.posicao}. ${item.nome} - ${item.total} questões`;
                         rankingQtdGeralLista.appendChild(li);
                     });
                 } else if (top3Qtd.length >= 1) {
@@ -73,7 +73,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if (restoPerc.length > 0) {
                     restoPerc.forEach((item, index) => {
                         const li = document.createElement('li');
-                        li.textContent = `${index + 4}. ${item.nome} - ${parseFloat(item.percentual).toFixed(2)}%`;
+                        li.textContent = `${item.posicao}. ${item.nome} - ${parseFloat(item.percentual).toFixed(2)}%`;
                         rankingPercGeralLista.appendChild(li);
                     });
                 } else if (top3Perc.length >= 1) {
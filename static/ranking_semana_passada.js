@@ -22,31 +22,52 @@ document.addEventListener('DOMContentLoaded', async () => {
                 nomeArquivoPDF = `Ranking_${inicioLimpo}_a_${fimLimpo}`;
             }
 
-            // --- 2. Preencher Batalha de Times ---
-            if (data.batalha) {
-                const alphaDiv = document.getElementById('bat-alpha-qtd').parentElement;
-                alphaDiv.classList.add('text-alpha');
-                const omegaDiv = document.getElementById('bat-omega-qtd').parentElement;
-                omegaDiv.classList.add('text-omega');
-
-                document.getElementById('bat-gui-qtd').innerText = data.batalha.GUI.questoes;
-                document.getElementById('bat-gui-perc').innerText = data.batalha.GUI.precisao + '%';
-                document.getElementById('bat-enzo-qtd').innerText = data.batalha.ENZO.questoes;
-                document.getElementById('bat-enzo-perc').innerText = data.batalha.ENZO.precisao + '%';
-                document.getElementById('bat-vencedor').innerText = data.batalha.vencedor;
-            }
-
-            // --- 3. Preencher Pódios e Listas ---
+            // --- 2. Preencher Pódios e Listas ---
             preencherPodio('qtd-passada', data.quantidade, 'Questões', 'total');
             preencherPodio('perc-passada', data.percentual, '%', 'percentual');
             preencherLista('ranking-quantidade-passada-lista', data.quantidade, 'Questões', 'total');
             preencherLista('ranking-percentual-passada-lista', data.percentual, '%', 'percentual');
 
+            // --- 3. Preencher Batalha de Times ---
+            if (data.batalha) preencherBatalha(data.batalha);
+
         } catch (error) {
             console.error("Erro ao carregar ranking:", error);
         }
     }
 
+    // Estilos alternados entre os times (azul, vermelho, azul...), como em batalha_times.html
+    const ESTILOS_TIMES = [['text-alpha', '#3b82f6'], ['text-omega', '#ef4444']];
+
+    function preencherBatalha(batalha) {
+        const container = document.getElementById('bat-times');
+        container.innerHTML = '';
+        const times = Object.entries(batalha.times || {});
+        if (times.length === 0) {
+            container.innerHTML = '<span style="color: #777;">Nenhum time com membros</span>';
+        }
+        times.forEach(([nome, time], index) => {
+            if (index > 0) {
+                const vs = document.createElement('span');
+                vs.style.cssText = 'font-size: 1.5em; font-weight: bold; color: #555;';
+                vs.innerText = 'VS';
+                container.appendChild(vs);
+            }
+            const [classe, cor] = ESTILOS_TIMES[index % ESTILOS_TIMES.length];
+            const div = document.createElement('div');
+            div.className = classe;
+            div.style.color = cor;
+            div.innerHTML = `
+                <h4 style="margin:0; font-size: 1.2em;">PELOTÃO ${nome}</h4>
+                <div style="font-size: 2em; font-weight: bold;">${time.questoes}</div>
+                <div style="font-size: 0.9em; opacity: 0.8;">Questões</div>
+                <div style="font-size: 1em; font-weight: bold; margin-top: 5px;">${time.precisao}%</div>
+            `;
+            container.appendChild(div);
+        });
+        document.getElementById('bat-vencedor').innerText = batalha.vencedor;
+    }
+
     function preencherPodio(prefixo, lista, unidade, campoValor) {
         [1, 2, 3].forEach(i => {
             const elName = document.getElementById(`podium-${prefixo}-${i}-name`);
@@ -73,7 +94,7 @@ document.addEventListener('DOMContentLoaded', async () => {
             let valor = item[campoValor];
             if (unidade === '%') valor = parseFloat(valor).toFixed(2);
             const li = document.createElement('li');
-            li.innerHTML = `<span>${i + 1}. ${item.nome}</span><strong>${valor} ${unidade}</strong>`;
+            li.innerHTML = `<span>${item.posicao}. ${item.nome}</span><strong>${valor} ${unidade}</strong>`;
             ol.appendChild(li);
         }
     }
@@ -38,7 +38,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     restoQtd.forEach((item, index) => {
                         const li = document.createElement('li');
                         // Garante que o número está correto (index do slice(3) + 4)
-                        li.textContent = `${index + 4}. ${item.nome} - ${item.total} questões`;
+                        li.textContent = `${item.posicao}. ${item.nome} - ${item.total} questões`;
                         rankingQtdList.appendChild(li);
                     });
                 } else if (top3Qtd.length >= 1) { // Mudança aqui para verificar se há pelo menos 1 no pódio
@@ -78,7 +78,7 @@ document.addEventListener('DOMContentLoaded', () => {
                  if (restoPerc.length > 0) {
                     restoPerc.forEach((item, index) => {
                         const li = document.createElement('li');
-                        li.textContent = `${index + 4}. ${item.nome} - ${parseFloat(item.percentual).toFixed(2)}%`;
+                        li.textContent = `${item.posicao}. ${item.nome} - ${parseFloat(item.percentual).toFixed(2)}%`;
                         rankingPercList.appendChild(li);
                     });
                  } else if (top3Perc.length >= 1) { // Mudança aqui
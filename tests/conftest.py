@@ -0,0 +1,79 @@
+"""Fixtures dos testes: o app apontado para um SQLite temporário, recriado a cada teste.
+
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# O app lê a configuração no import: precisa vir antes dele
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'teste.db')}"
+os.environ['PLACAR_BROKER'] = 'local'
+os.environ['SENHA_HASH_METODO'] = 'pbkdf2:sha256:1000'  # Hash barato: os testes fazem muito login
+os.environ.pop('DATABASE_READ_URL', None)
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+import app as app_module  # noqa: E402
+
+SENHA = 'senha-teste'
+
+
+def limpar_caches():
+    app_module.cache_rankings.invalidar(incluir_fechadas=True)
+    app_module.cache_identidades.invalidar('*', propagar=False)
+    app_module.versoes_prontas.ok = False
+
+
+@pytest.fixture
+def app():
+    flask_app = app_module.app
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        app_module.db.session.remove()
+        app_module.db.drop_all()
+        app_module.db.create_all()
+    limpar_caches()
+    yield flask_app
+    with flask_app.app_context():
+        app_module.db.session.remove()
+
+
+@pytest.fixture
+def db(app):
+    """App context aberto durante o teste. Os requests do test client reaproveitam ele (e o `g`):
+    teste que simula vários requests independentes abre o próprio contexto só onde precisa."""
+    with app.app_context():
+        yield app_module.db
+
+
+def criar_aluno(nome, username, tipo_usuario='aluno', time=None):
+    aluno = app_module.Alunos(nome=nome, username=username, tipo_usuario=tipo_usuario, primeira_vez=0,
+                              time=time or app_module.SEM_TIME)
+    aluno.set_senha(SENHA)
+    app_module.db.session.add(aluno)
+    app_module.db.session.commit()
+    return aluno.id
+
+
+@pytest.fixture
+def alunos(app):
+    """Ids do admin e de dois alunos, um em cada time."""
+    with app.app_context():
+        return {
+            'admin': criar_aluno('Admin', 'admin', tipo_usuario='admin'),
+            'ana': criar_aluno('Ana', 'ana', time='GUI'),
+            'bruno': criar_aluno('Bruno', 'bruno', time='ENZO'),
+        }
+
+
+@pytest.fixture
+def cliente(app, alunos):
+    """Test client logado como admin."""
+    cliente = app.test_client()
+    resposta = cliente.post('/login', json={'username': 'admin', 'senha': SENHA})
+    assert resposta.status_code == 200, resposta.get_data(as_text=True)
+    return cliente
@@ -0,0 +1,91 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+import asgi
+from test_batalha import registrar_semana_passada
+from test_resultados_lote import PLANILHA, criar_simulado, enviar
+
+
+async def chamar(caminho, query='', cabecalhos=()):
+    """GET direto na aplicação ASGI: (status, cabeçalhos, corpo)."""
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http', 'root_path': '',
+             'path': caminho, 'query_string': query.encode(), 'server': ('teste', 80),
+             'headers': [(nome.encode(), valor.encode()) for nome, valor in cabecalhos]}
+    mensagens = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(mensagem):
+        mensagens.append(mensagem)
+
+    await asgi.application(scope, receive, send)
+    inicio = mensagens[0]
+    corpo = b''.join(m.get('body', b'') for m in mensagens[1:])
+    return inicio['status'], {k.decode(): v.decode() for k, v in inicio['headers']}, corpo
+
+
+def get_async(caminho, query='', cabecalhos=()):
+    async def rodar():
+        try:
+            return await chamar(caminho, query, cabecalhos)
+        finally:
+            await asgi.engine.dispose()  # Cada asyncio.run é um loop novo: o pool não passa de um para outro
+    return asyncio.run(rodar())
+
+
+@pytest.fixture
+def dados(cliente, alunos, db):
+    hoje = app_module.dia_local(datetime.utcnow())
+    cliente.post('/api/registros/bulk', json=[
+        {'aluno_id': alunos['ana'], 'quantidade': 20, 'acertos': 10},
+        {'aluno_id': alunos['bruno'], 'quantidade': 30, 'acertos': 27, 'data': (hoje - timedelta(days=40)).isoformat()},
+    ])
+    registrar_semana_passada(cliente, [{'aluno_id': alunos['ana'], 'quantidade': 30, 'acertos': 15},
+                                       {'aluno_id': alunos['bruno'], 'quantidade': 10, 'acertos': 10}])
+    simulado_id = criar_simulado(db)
+    assert enviar(cliente, simulado_id, PLANILHA).status_code in (200, 201)
+    inicio, fim = (hoje - timedelta(days=60)).isoformat(), hoje.isoformat()
+    return [
+        '/rankings', '/rankings/geral', '/batalha/placar', '/simulados', '/simulados/estatisticas',
+        '/simulados/leaderboard', f'/simulados/{simulado_id}/ranking',
+        f"/consulta/desempenho?aluno_id={alunos['bruno']}&inicio={inicio}&fim={fim}",
+    ]
+
+
+def test_rotas_assincronas_devolvem_o_mesmo_json_das_sincronas(cliente, dados):
+    for rota in dados:
+        caminho, _, query = rota.partition('?')
+        status, _, corpo = get_async(asgi.PREFIXO + caminho, query)
+        assert status == 200, (rota, corpo)
+        esperado = cliente.get('/api' + rota).get_json()
+        assert esperado and json.loads(corpo) == esperado, rota
+
+
+def test_semana_passada_sem_arquivo_e_depois_arquivada(cliente, dados):
+    _, _, calculada = get_async(asgi.PREFIXO + '/rankings/semana-passada')
+    assert app_module.RankingsSemanais.query.count() == 0  # O caminho assíncrono não grava
+    sincrona = cliente.get('/api/rankings/semana-passada').get_json()  # Esta arquiva
+    _, _, arquivada = get_async(asgi.PREFIXO + '/rankings/semana-passada')
+    assert json.loads(calculada) == json.loads(arquivada) == sincrona
+    assert sincrona['batalha']['times']['GUI'] == {'questoes': 30, 'precisao': 50.0}
+
+
+def test_parametro_invalido_rota_desconhecida_e_compressao(cliente, dados, monkeypatch):
+    assert get_async(asgi.PREFIXO + '/consulta/desempenho', 'aluno_id=1')[0] == 400
+    assert get_async(asgi.PREFIXO + '/nao-existe')[0] == 404
+
+    monkeypatch.setitem(app_module.app.config, 'COMPRESSAO_MINIMO', 0)
+    status, cabecalhos, corpo = get_async(asgi.PREFIXO + '/rankings/geral', cabecalhos=[('accept-encoding', 'gzip')])
+    assert (status, cabecalhos['content-encoding']) == (200, 'gzip')
+    assert json.loads(gzip.decompress(corpo)) == cliente.get('/api/rankings/geral').get_json()
+
+
+def test_resto_do_app_passa_pelo_flask(dados):
+    status, cabecalhos, corpo = get_async('/api/rankings')
+    assert status == 200 and 'etag' in cabecalhos
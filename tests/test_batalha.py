@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import app as app_module
+
+
+def registrar_semana_passada(cliente, linhas):
+    hoje = app_module.dia_local(datetime.utcnow())
+    dia = (app_module.inicio_da_semana(hoje) - timedelta(days=4)).isoformat()
+    resposta = cliente.post('/api/registros/bulk', json=[{**linha, 'data': dia} for linha in linhas])
+    assert resposta.status_code == 201, resposta.get_json()
+
+
+def test_batalha_da_semana_passada_aninha_os_times(cliente, alunos):
+    registrar_semana_passada(cliente, [{'aluno_id': alunos['ana'], 'quantidade': 30, 'acertos': 15},
+                                       {'aluno_id': alunos['bruno'], 'quantidade': 10, 'acertos': 10}])
+    batalha = cliente.get('/api/rankings/semana-passada').get_json()['batalha']
+    assert set(batalha) == {'times', 'vencedor'}
+    assert batalha['times'] == {'GUI': {'questoes': 30, 'precisao': 50.0},
+                                'ENZO': {'questoes': 10, 'precisao': 100.0}}
+    assert batalha['vencedor'].startswith('GUI')
+
+
+def test_time_sem_membros_some_da_batalha(cliente, alunos):
+    registrar_semana_passada(cliente, [{'aluno_id': alunos['ana'], 'quantidade': 30, 'acertos': 15}])
+    cliente.post('/api/alunos/atualizar-time', json={'aluno_id': alunos['bruno'], 'time': 'GUI'})
+    batalha = cliente.get('/api/rankings/semana-passada').get_json()['batalha']
+    assert list(batalha['times']) == ['GUI']
+
+
+def test_time_chamado_vencedor_nao_sobrescreve_o_resultado(cliente, alunos):
+    cliente.post('/api/alunos/atualizar-time', json={'aluno_id': alunos['bruno'], 'time': 'vencedor'})
+    registrar_semana_passada(cliente, [{'aluno_id': alunos['ana'], 'quantidade': 30, 'acertos': 15},
+                                       {'aluno_id': alunos['bruno'], 'quantidade': 10, 'acertos': 10}])
+    batalha = cliente.get('/api/rankings/semana-passada').get_json()['batalha']
+    assert batalha['times']['vencedor'] == {'questoes': 10, 'precisao': 100.0}
+    assert batalha['vencedor'].startswith('GUI')
+
+
+def test_stream_do_placar_tem_limite_e_acaba_sozinho(cliente, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'PLACAR_SSE_MAX_ASSINANTES', 1)
+    aberto = cliente.get('/api/batalha/placar/stream', buffered=False)
+    assert aberto.status_code == 200
+    lotado = cliente.get('/api/batalha/placar/stream')
+    assert lotado.status_code == 503 and lotado.headers['Retry-After']
+    aberto.close()  # Aba fechada: a vaga volta
+
+    monkeypatch.setitem(app_module.app.config, 'PLACAR_SSE_DURACAO', 0)
+    for _ in range(2):  # O stream que acabou também devolve a vaga
+        resposta = cliente.get('/api/batalha/placar/stream', buffered=True)
+        assert resposta.status_code == 200
+        assert resposta.get_data(as_text=True).count('event: placar') == 1  # Snapshot inicial e fim
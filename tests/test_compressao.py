@@ -0,0 +1,27 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+
+@pytest.fixture
+def sem_minimo(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESSAO_MINIMO', 0)
+
+
+@pytest.mark.parametrize('aceita, codificacao, descomprimir', [
+    ('br, gzip', 'br', brotli.decompress),
+    ('gzip', 'gzip', gzip.decompress),
+])
+def test_json_sai_comprimido_na_codificacao_aceita(cliente, sem_minimo, aceita, codificacao, descomprimir):
+    resposta = cliente.get('/api/alunos', headers={'Accept-Encoding': aceita})
+    assert resposta.headers['Content-Encoding'] == codificacao
+    assert 'Accept-Encoding' in resposta.headers['Vary']
+    assert {a['nome'] for a in json.loads(descomprimir(resposta.get_data()))} == {'Admin', 'Ana', 'Bruno'}
+
+
+def test_sem_accept_encoding_sai_sem_compressao(cliente, sem_minimo):
+    resposta = cliente.get('/api/alunos', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in resposta.headers
+    assert len(resposta.get_json()) == 3
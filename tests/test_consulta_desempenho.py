@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from test_rollup import hoje_local
+
+
+def test_totais_serie_e_analise(cliente, alunos):
+    ontem = hoje_local() - timedelta(days=1)
+    cliente.post('/api/registros/bulk', json=[
+        {'aluno_id': alunos['ana'], 'quantidade': 20, 'acertos': 10, 'data': ontem.isoformat()},
+        {'aluno_id': alunos['ana'], 'quantidade': 10, 'acertos': 10},
+        {'aluno_id': alunos['bruno'], 'quantidade': 50, 'acertos': 5},
+    ])
+    resposta = cliente.get('/api/consulta/desempenho', query_string={
+        'aluno_id': alunos['ana'], 'inicio': (ontem - timedelta(days=5)).isoformat(), 'fim': hoje_local().isoformat()})
+    assert resposta.status_code == 200, resposta.get_json()
+    dados = resposta.get_json()
+    assert (dados['aluno_nome'], dados['total_questoes'], dados['total_acertos']) == ('Ana', 30, 20)
+    assert dados['percentual_total'] == 66.67
+    assert [(d['data'], d['questoes'], d['acertos']) for d in dados['dados_diarios']] == [
+        (ontem.isoformat(), 20, 10), (hoje_local().isoformat(), 10, 10)]
+    assert dados['analise'] is not None
@@ -0,0 +1,78 @@
+import app as app_module
+from conftest import SENHA, criar_aluno
+
+from test_rollup import hoje_local
+
+
+def nomes(ranking):
+    return {linha['nome'] for linha in ranking['quantidade']}
+
+
+def test_304_enquanto_nada_muda_e_etag_novo_depois_de_escrita(cliente, alunos):
+    primeira = cliente.get('/api/rankings/geral')
+    assert primeira.status_code == 200 and primeira.get_etag()[0]
+    etag = primeira.get_etag()[0]
+    assert cliente.get('/api/rankings/geral', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+
+    assert cliente.post('/api/registros', json={'aluno_id': alunos['ana'], 'quantidade': 30,
+                                                'acertos': 20}).status_code == 201
+    depois = cliente.get('/api/rankings/geral', headers={'If-None-Match': f'"{etag}"'})
+    assert depois.status_code == 200
+    assert depois.get_etag()[0] != etag
+    assert 'Ana' in nomes(depois.get_json())
+
+
+def test_escrita_de_outro_worker_nao_serve_corpo_velho_com_etag_novo(cliente, alunos, db):
+    etag = cliente.get('/api/rankings/geral').get_etag()[0]  # Entra no cache deste processo
+
+    # Outro worker: grava e sobe a versão em mudancas_dados, mas não invalida o cache daqui
+    app_module.db.session.add(app_module.RegistrosQuestoes(
+        aluno_id=alunos['bruno'], quantidade_questoes=50, acertos=40, data_local=hoje_local()))
+    app_module.atualizar_rollup_diario(alunos['bruno'], hoje_local(), 50, 40)
+    app_module.db.session.commit()
+
+    resposta = cliente.get('/api/rankings/geral')
+    assert resposta.get_etag()[0] != etag
+    assert 'Bruno' in nomes(resposta.get_json())
+
+
+def test_comando_flask_sobe_a_versao(app, cliente, alunos):
+    cliente.post('/api/registros', json={'aluno_id': alunos['ana'], 'quantidade': 10, 'acertos': 5})
+    etag = cliente.get('/api/rankings/geral').get_etag()[0]
+    app_module.versoes_prontas.ok = False  # Processo novo: o comando não passou por before_request
+
+    resultado = app.test_cli_runner().invoke(args=['reconstruir-rollup'])
+    assert resultado.exit_code == 0, resultado.output
+    assert cliente.get('/api/rankings/geral', headers={'If-None-Match': f'"{etag}"'}).status_code == 200
+
+
+def test_aluno_novo_muda_o_etag_da_lista(cliente, alunos, db):
+    etag = cliente.get('/api/alunos').get_etag()[0]
+    criar_aluno('Carla', 'carla', time='GUI')
+    resposta = cliente.get('/api/alunos', headers={'If-None-Match': f'"{etag}"'})
+    assert resposta.status_code == 200
+    assert 'Carla' in {a['nome'] for a in resposta.get_json()}
+
+
+def test_troca_de_senha_nao_muda_o_etag(app, cliente, alunos):
+    etags = {rota: cliente.get(rota).get_etag()[0] for rota in ('/api/alunos', '/api/rankings/geral')}
+    ana = app.test_client()
+    assert ana.post('/login', json={'username': 'ana', 'senha': SENHA}).status_code == 200
+    resposta = ana.post('/trocar-senha', json={'nova_senha': 'outra-senha', 'confirma_senha': 'outra-senha'})
+    assert resposta.status_code == 200, resposta.get_data(as_text=True)
+    for rota, etag in etags.items():
+        assert cliente.get(rota, headers={'If-None-Match': f'"{etag}"'}).status_code == 304, rota
+
+
+def test_versao_sobe_depois_do_commit(app, alunos):
+    tabela = app_module.MudancasDados.__table__
+    contar = lambda: app_module.db.session.execute(
+        app_module.select(app_module.func.count()).select_from(tabela).where(tabela.c.dominio == 'alunos')).scalar()
+    with app.app_context():
+        app_module.versoes_prontas.garantir()
+        antes = contar()
+        app_module.db.session.get(app_module.Alunos, alunos['ana']).nome = 'Ana Maria'
+        app_module.db.session.flush()
+        assert contar() == antes  # Nada gravado dentro da transação de quem escreve
+        app_module.db.session.commit()
+        assert contar() == antes + 1
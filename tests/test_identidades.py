@@ -0,0 +1,65 @@
+"""Identidade em cache com o broker local: mudança feita por outro worker (aqui, direto no
+banco, sem passar pelo cache deste processo) tem que valer assim que a versão 'identidades'
+for conferida, não depois do TTL."""
+import pytest
+
+import app as app_module
+from conftest import SENHA
+
+
+@pytest.fixture(autouse=True)
+def conferir_a_cada_request(monkeypatch):
+    monkeypatch.setattr(app_module.cache_identidades, 'verificacao', 0)
+    monkeypatch.setattr(app_module.cache_identidades, '_verificada_ate', 0.0)
+
+
+def mudar_em_outro_worker(aluno_id, **campos):
+    with app_module.app.app_context():
+        aluno = app_module.db.session.get(app_module.Alunos, aluno_id)
+        if campos:
+            for campo, valor in campos.items():
+                setattr(aluno, campo, valor)
+        else:
+            app_module.db.session.delete(aluno)
+        app_module.db.session.commit()
+        app_module.cache_identidades.publicar_mudanca()  # O que invalidar_usuario faz no outro worker
+
+
+def versao_identidades():
+    with app_module.app.app_context():
+        app_module.versoes_prontas.garantir()
+        return app_module.versoes_dos_dominios((app_module.DOMINIO_IDENTIDADES,))[0]
+
+
+def test_admin_rebaixado_perde_o_acesso(cliente, alunos):
+    assert cliente.get('/api/_metrics').status_code == 200  # Identidade entra no cache
+    mudar_em_outro_worker(alunos['admin'], tipo_usuario='aluno')
+    assert cliente.get('/api/_metrics').status_code == 403
+
+
+def test_aluno_apagado_perde_a_sessao(app, alunos):
+    cliente = app.test_client()
+    assert cliente.post('/login', json={'username': 'bruno', 'senha': SENHA}).status_code == 200
+    assert cliente.get('/api/rankings/me').status_code == 200
+    mudar_em_outro_worker(alunos['bruno'])
+    assert cliente.get('/api/rankings/me').status_code != 200
+    with cliente.session_transaction() as sessao:
+        assert 'user_id' not in sessao
+
+
+def test_troca_de_senha_nao_mexe_nas_identidades(app, cliente, alunos):
+    assert cliente.get('/api/_metrics').status_code == 200
+    antes = versao_identidades()
+    ana = app.test_client()
+    ana.post('/login', json={'username': 'ana', 'senha': SENHA})
+    resposta = ana.post('/trocar-senha', json={'nova_senha': 'outra-senha', 'confirma_senha': 'outra-senha'})
+    assert resposta.status_code == 200, resposta.get_data(as_text=True)
+    assert versao_identidades() == antes
+    assert alunos['admin'] in app_module.cache_identidades._dados  # A do admin continua em cache
+
+
+def test_renomear_pela_rota_sobe_a_versao(cliente, alunos):
+    antes = versao_identidades()
+    resposta = cliente.put(f"/api/alunos/{alunos['ana']}", json={'nome': 'Ana Maria'})
+    assert resposta.status_code == 200, resposta.get_json()
+    assert versao_identidades() > antes
@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+import app as app_module
+
+
+def test_pool_do_postgres_recicla_conexoes_e_ping_e_opcional(monkeypatch):
+    for variavel in ('DB_POOL_PRE_PING', 'DB_POOL_RECYCLE'):
+        monkeypatch.delenv(variavel, raising=False)
+    opcoes = app_module.opcoes_engine('postgresql://radar@localhost/radar')
+    assert opcoes['pool_pre_ping'] is False
+    assert 0 < opcoes['pool_recycle'] < 300  # Antes do idle timeout de 5 min dos proxies
+    assert opcoes['connect_args']['keepalives'] == 1
+
+
+def test_pre_ping_pode_ser_ligado(monkeypatch):
+    monkeypatch.setenv('DB_POOL_PRE_PING', '1')
+    assert app_module.opcoes_engine('postgresql://radar@localhost/radar')['pool_pre_ping'] is True
+
+
+@pytest.fixture
+def derrubar_conexao(db):
+    """Faz o próximo SELECT falhar como uma conexão derrubada pelo PgBouncer."""
+    derrubados = []
+
+    def derrubar(cursor, statement, parameters, context):
+        if not derrubados and statement.lstrip().upper().startswith('SELECT'):
+            derrubados.append(statement)
+            raise sqlite3.OperationalError('server conn crashed?')
+
+    event.listen(db.engine, 'do_execute', derrubar)
+    yield derrubados
+    event.remove(db.engine, 'do_execute', derrubar)
+
+
+def test_leitura_que_pega_conexao_derrubada_e_repetida(cliente, derrubar_conexao):
+    resposta = cliente.get('/api/rankings/geral')
+    assert resposta.status_code == 200, resposta.get_json()
+    assert derrubar_conexao  # Falhou uma vez e a repetição respondeu
+
+
+def test_nao_repete_depois_de_escrever_na_transacao(alunos, db, derrubar_conexao):
+    db.session.add(app_module.Empresas(nome='Nova'))
+    db.session.flush()
+    with pytest.raises(OperationalError) as erro:
+        db.session.execute(app_module.select(app_module.Alunos.id)).all()
+    assert erro.value.connection_invalidated
+    db.session.rollback()
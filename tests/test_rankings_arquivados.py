@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+
+import app as app_module
+
+
+def dia_da_semana_passada():
+    hoje = app_module.dia_local(datetime.utcnow())
+    return (app_module.inicio_da_semana(hoje) - timedelta(days=4)).isoformat()
+
+
+def registrar_semana_passada(cliente, alunos):
+    dia = dia_da_semana_passada()
+    resposta = cliente.post('/api/registros/bulk', json=[
+        {'aluno_id': alunos['ana'], 'quantidade': 30, 'acertos': 20, 'data': dia},
+        {'aluno_id': alunos['bruno'], 'quantidade': 50, 'acertos': 40, 'data': dia},
+    ])
+    assert resposta.status_code == 201, resposta.get_json()
+
+
+def nomes(payload):
+    return [item['nome'] for item in payload['quantidade']]
+
+
+def test_semana_passada_fica_arquivada(cliente, alunos, db):
+    registrar_semana_passada(cliente, alunos)
+    payload = cliente.get('/api/rankings/semana-passada').get_json()
+    assert nomes(payload) == ['Bruno', 'Ana']
+    assert db.session.query(app_module.RankingsSemanais).count() == 1
+
+
+def test_apagar_aluno_descarta_o_arquivo(cliente, alunos, db):
+    registrar_semana_passada(cliente, alunos)
+    assert cliente.get('/api/rankings/semana-passada').get_json()['batalha']['vencedor'].startswith('ENZO')
+
+    assert cliente.delete(f"/api/alunos/{alunos['bruno']}").status_code == 200
+    payload = cliente.get('/api/rankings/semana-passada').get_json()
+    assert nomes(payload) == ['Ana']
+    assert payload['batalha']['vencedor'].startswith('GUI')
+
+
+def test_renomear_aluno_descarta_o_arquivo(cliente, alunos):
+    registrar_semana_passada(cliente, alunos)
+    cliente.get('/api/rankings/semana-passada')
+
+    assert cliente.put(f"/api/alunos/{alunos['ana']}", json={'nome': 'Ana Maria'}).status_code == 200
+    assert nomes(cliente.get('/api/rankings/semana-passada').get_json()) == ['Bruno', 'Ana Maria']
+
+
+def test_trocar_de_time_descarta_o_arquivo(cliente, alunos):
+    registrar_semana_passada(cliente, alunos)
+    cliente.get('/api/rankings/semana-passada')
+
+    resposta = cliente.post('/api/alunos/atualizar-time', json={'aluno_id': alunos['bruno'], 'time': 'GUI'})
+    assert resposta.status_code == 200
+    assert cliente.get('/api/rankings/semana-passada').get_json()['batalha']['vencedor'].startswith('GUI')
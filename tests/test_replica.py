@@ -0,0 +1,89 @@
+"""Réplica de leitura: um segundo SQLite faz o papel da réplica, parada no tempo (nunca recebe
+as escritas do primário), então tudo o que vier dela é visivelmente atrasado."""
+import importlib.util
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+from conftest import RAIZ, SENHA
+
+
+@pytest.fixture(scope='module')
+def replicado():
+    """Outra cópia do módulo do app, com DATABASE_READ_URL e janela 0 (o mínimo vale mesmo assim)."""
+    pasta = tempfile.mkdtemp()
+    ambiente = {'DATABASE_URL': f"sqlite:///{os.path.join(pasta, 'primario.db')}",
+                'DATABASE_READ_URL': f"sqlite:///{os.path.join(pasta, 'replica.db')}",
+                'REPLICA_JANELA_ESCRITA': '0'}
+    anterior = {chave: os.environ.get(chave) for chave in ambiente}
+    os.environ.update(ambiente)
+    try:
+        spec = importlib.util.spec_from_file_location('app_replicado', os.path.join(RAIZ, 'app.py'))
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+    finally:
+        for chave, valor in anterior.items():
+            if valor is None:
+                os.environ.pop(chave, None)
+            else:
+                os.environ[chave] = valor
+
+    with modulo.app.app_context():
+        modulo.db.create_all()
+        admin = modulo.Alunos(nome='Admin', username='admin', tipo_usuario='admin', primeira_vez=0,
+                              time=modulo.SEM_TIME)
+        admin.set_senha(SENHA)
+        modulo.db.session.add(admin)
+        modulo.db.session.commit()
+        modulo.db.engines[None].dispose()
+    shutil.copy(os.path.join(pasta, 'primario.db'), os.path.join(pasta, 'replica.db'))
+    return modulo
+
+
+def nomes(resposta):
+    assert resposta.status_code == 200
+    return {aluno['nome'] for aluno in resposta.get_json()}
+
+
+def test_quem_escreveu_le_a_propria_escrita_e_os_outros_leem_da_replica(replicado):
+    escritor, outro = replicado.app.test_client(), replicado.app.test_client()
+    for cliente in (escritor, outro):
+        assert cliente.post('/login', json={'username': 'admin', 'senha': SENHA}).status_code == 200
+    with outro.session_transaction() as sessao:  # O login também é um POST: tira o outro da janela
+        sessao.pop('escrita_em')
+    etag = outro.get('/api/alunos').get_etag()[0]
+
+    resposta = escritor.post('/api/alunos', json={'nome': 'Carla', 'username': 'carla', 'time': 'GUI'})
+    assert resposta.status_code == 201
+    assert 'Carla' in nomes(escritor.get('/api/alunos'))
+
+    # Outro navegador não está preso ao primário: a réplica (parada) ainda não tem a Carla,
+    # e o ETag continua batendo com o que ele já tinha
+    assert outro.get('/api/alunos', headers={'If-None-Match': f'"{etag}"'}).status_code == 304
+    assert 'Carla' not in nomes(outro.get('/api/alunos'))
+
+
+def test_leitura_que_falha_na_replica_e_repetida_no_primario(replicado):
+    cliente = replicado.app.test_client()
+    assert cliente.post('/login', json={'username': 'admin', 'senha': SENHA}).status_code == 200
+    assert cliente.post('/api/alunos', json={'nome': 'Dora', 'username': 'dora', 'time': 'GUI'}).status_code == 201
+    with cliente.session_transaction() as sessao:
+        sessao.pop('escrita_em')
+    falhas = []
+
+    def quebrar(cursor, statement, parameters, context):
+        falhas.append(statement)
+        raise sqlite3.OperationalError('canceling statement due to conflict with recovery')
+
+    with replicado.app.app_context():
+        engine = replicado.replica_leitura.engine
+    event.listen(engine, 'do_execute', quebrar)
+    try:
+        assert 'Dora' in nomes(cliente.get('/api/alunos'))  # Veio do primário
+    finally:
+        event.remove(engine, 'do_execute', quebrar)
+    assert len(falhas) == 1  # Depois da falha, o resto do request nem tenta a réplica
@@ -0,0 +1,70 @@
+from datetime import date
+
+import app as app_module
+
+PLANILHA = 'username;nota\nana;7,5\nbruno;9\n'
+
+
+def criar_simulado(db):
+    empresa = app_module.Empresas(nome='Estratégia')
+    db.session.add(empresa)
+    db.session.flush()
+    simulado = app_module.Simulados(empresa_id=empresa.id, numero=1, categoria='Geral',
+                                    data_realizacao=date(2025, 3, 1))
+    db.session.add(simulado)
+    db.session.commit()
+    return simulado.id
+
+
+def notas(db, simulado_id):
+    r = app_module.ResultadosSimulados
+    db.session.expire_all()
+    return sorted(db.session.query(r.id, r.aluno_id, r.nota).filter(r.simulado_id == simulado_id).all())
+
+
+def enviar(cliente, simulado_id, planilha, **params):
+    return cliente.post(f'/api/simulados/{simulado_id}/resultados/lote', data=planilha,
+                        content_type='text/csv', query_string=params)
+
+
+def test_mesma_planilha_duas_vezes_nao_duplica_nem_muda_nada(cliente, alunos, db):
+    simulado_id = criar_simulado(db)
+    primeira = enviar(cliente, simulado_id, PLANILHA)
+    assert primeira.status_code in (200, 201), primeira.get_json()
+    assert primeira.get_json()['resumo'] == {'inserido': 2, 'atualizado': 0, 'inalterado': 0, 'erro': 0}
+    gravadas = notas(db, simulado_id)
+    assert [(aluno_id, nota) for _, aluno_id, nota in gravadas] == [(alunos['ana'], 7.5), (alunos['bruno'], 9.0)]
+
+    segunda = enviar(cliente, simulado_id, PLANILHA)
+    assert segunda.get_json()['resumo'] == {'inserido': 0, 'atualizado': 0, 'inalterado': 2, 'erro': 0}
+    assert notas(db, simulado_id) == gravadas  # Mesmas linhas (mesmos ids), nada regravado
+
+
+def test_nota_nova_atualiza_a_mesma_linha(cliente, alunos, db):
+    simulado_id = criar_simulado(db)
+    enviar(cliente, simulado_id, PLANILHA)
+    ids = {aluno_id: id_ for id_, aluno_id, _ in notas(db, simulado_id)}
+
+    resposta = enviar(cliente, simulado_id, 'username,nota\nana,8\nbruno,9\n')
+    assert resposta.get_json()['resumo'] == {'inserido': 0, 'atualizado': 1, 'inalterado': 1, 'erro': 0}
+    assert notas(db, simulado_id) == [(ids[alunos['ana']], alunos['ana'], 8.0),
+                                      (ids[alunos['bruno']], alunos['bruno'], 9.0)]
+
+
+def test_erro_sem_parcial_nao_grava_nada(cliente, alunos, db):
+    simulado_id = criar_simulado(db)
+    resposta = enviar(cliente, simulado_id, 'username;nota\nana;7\nninguem;5\n')
+    assert resposta.status_code == 400
+    assert notas(db, simulado_id) == []
+    resposta = enviar(cliente, simulado_id, 'username;nota\nana;7\nninguem;5\n', parcial='1')
+    assert resposta.get_json()['resumo']['inserido'] == 1
+    assert [aluno_id for _, aluno_id, _ in notas(db, simulado_id)] == [alunos['ana']]
+
+
+def test_evolucao_do_aluno_traz_posicao_e_z_score(cliente, alunos, db):
+    simulado_id = criar_simulado(db)
+    enviar(cliente, simulado_id, PLANILHA)
+    dados = cliente.get(f"/api/alunos/{alunos['ana']}/simulados").get_json()
+    assert dados['aluno_nome'] == 'Ana'
+    assert [(s['simulado_id'], s['nota'], s['posicao'], s['participantes'], s['data'], s['z_score'])
+            for s in dados['simulados']] == [(simulado_id, 7.5, 2, 2, '01/03/2025', -1.0)]
@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta
+
+import app as app_module
+
+
+def hoje_local():
+    return app_module.dia_local(datetime.utcnow())
+
+
+def rollup(db):
+    r = app_module.RegistrosDiarios
+    return {(l.aluno_id, l.dia): (l.quantidade_questoes, l.acertos, l.num_registros)
+            for l in db.session.query(r.aluno_id, r.dia, r.quantidade_questoes, r.acertos, r.num_registros)}
+
+
+def test_registros_somam_no_mesmo_dia(cliente, alunos, db):
+    for quantidade, acertos in ((30, 20), (10, 5)):
+        resposta = cliente.post('/api/registros', json={'aluno_id': alunos['ana'], 'quantidade': quantidade,
+                                                        'acertos': acertos})
+        assert resposta.status_code == 201
+    hoje = hoje_local()
+    assert rollup(db) == {(alunos['ana'], hoje): (40, 25, 2)}
+
+
+def test_bulk_soma_em_dias_novos_e_existentes(cliente, alunos, db):
+    ontem = (hoje_local() - timedelta(days=1)).isoformat()
+    anteontem = (hoje_local() - timedelta(days=2)).isoformat()
+    assert cliente.post('/api/registros/bulk', json=[
+        {'aluno_id': alunos['ana'], 'quantidade': 10, 'acertos': 8, 'data': ontem},
+    ]).status_code == 201
+    resposta = cliente.post('/api/registros/bulk', json=[
+        {'aluno_id': alunos['ana'], 'quantidade': 20, 'acertos': 10, 'data': ontem},
+        {'aluno_id': alunos['ana'], 'quantidade': 5, 'acertos': 5, 'data': anteontem},
+        {'aluno_id': alunos['bruno'], 'quantidade': 7, 'acertos': 1, 'data': ontem},
+    ])
+    assert resposta.status_code == 201, resposta.get_json()
+    dia = date.fromisoformat
+    assert rollup(db) == {
+        (alunos['ana'], dia(ontem)): (30, 18, 2),
+        (alunos['ana'], dia(anteontem)): (5, 5, 1),
+        (alunos['bruno'], dia(ontem)): (7, 1, 1),
+    }
+
+
+def test_apagar_ultimo_registro_do_dia_tira_o_dia_do_rollup(cliente, alunos, db):
+    for quantidade in (30, 10):
+        cliente.post('/api/registros', json={'aluno_id': alunos['ana'], 'quantidade': quantidade, 'acertos': 5})
+    ids = [r['id'] for r in cliente.get('/api/registros/recentes').get_json()]
+    hoje = hoje_local()
+
+    assert cliente.delete(f'/api/registros/{ids[0]}').status_code == 200
+    assert rollup(db) == {(alunos['ana'], hoje): (30, 5, 1)}
+    assert cliente.delete(f'/api/registros/{ids[1]}').status_code == 200
+    assert rollup(db) == {}
+
+
+def test_rollup_bate_com_a_reconstrucao(cliente, alunos, db):
+    ontem = (hoje_local() - timedelta(days=1)).isoformat()
+    cliente.post('/api/registros/bulk', json=[
+        {'aluno_id': alunos['ana'], 'quantidade': 12, 'acertos': 6, 'data': ontem},
+        {'aluno_id': alunos['bruno'], 'quantidade': 3, 'acertos': 3},
+    ])
+    cliente.post('/api/registros', json={'aluno_id': alunos['ana'], 'quantidade': 9, 'acertos': 9})
+    incremental = rollup(db)
+    app_module.reconstruir_rollup_diario()
+    db.session.commit()
+    assert rollup(db) == incremental
@@ -0,0 +1,45 @@
+from werkzeug.security import generate_password_hash
+
+import app as app_module
+from conftest import SENHA
+
+ALVO = 'pbkdf2:sha256:1000'  # SENHA_HASH_METODO dos testes (conftest)
+
+
+def test_hash_mais_fraco():
+    fraco = app_module.hash_mais_fraco
+    assert fraco('pbkdf2:sha256:500', ALVO)
+    assert fraco('pbkdf2:sha1:1000', ALVO)
+    assert fraco('pbkdf2:sha256:1000', 'scrypt:16384:8:1')
+    assert fraco('scrypt:16384:8:1', 'scrypt')  # Padrão do werkzeug: 32768:8:1
+    assert not fraco('pbkdf2:sha256:1000', ALVO)
+    assert not fraco('pbkdf2:sha256:600000', ALVO)
+    assert not fraco('scrypt:32768:8:1', 'scrypt:16384:8:1')
+    assert not fraco('scrypt:16384:8:1', ALVO)
+    assert not fraco('scrypt:32768:8:1', 'scrypt:16384:8:4')  # Mais memória, menos CPU
+    assert not fraco('md5', ALVO)
+
+
+def gravar_hash(db, aluno_id, metodo):
+    aluno = db.session.get(app_module.Alunos, aluno_id)
+    aluno.senha_hash = generate_password_hash(SENHA, method=metodo)
+    db.session.commit()
+    return aluno.senha_hash
+
+
+def hash_depois_do_login(app, db, username):
+    assert app.test_client().post('/login', json={'username': username, 'senha': SENHA}).status_code == 200
+    db.session.expire_all()
+    return app_module.Alunos.query.filter_by(username=username).one().senha_hash
+
+
+def test_login_refaz_hash_mais_fraco(app, alunos, db):
+    gravar_hash(db, alunos['ana'], 'pbkdf2:sha256:500')
+    assert hash_depois_do_login(app, db, 'ana').startswith(ALVO + '$')
+
+
+def test_login_nao_enfraquece_hash_mais_forte(app, alunos, db):
+    forte = gravar_hash(db, alunos['ana'], 'scrypt:1024:8:1')
+    assert hash_depois_do_login(app, db, 'ana') == forte
+    forte = gravar_hash(db, alunos['bruno'], 'pbkdf2:sha256:2000')
+    assert hash_depois_do_login(app, db, 'bruno') == forte